@@ -0,0 +1,207 @@
+"""
+Gateway candidate ranking.
+
+This module provides a ranker that orders an interface's neighbours before
+they are probed, so that on shared segments with hundreds of ARP entries
+(cable, IX-style access) a working gateway is usually found with the first
+probe instead of after probing most of the segment:
+- The current gateway comes first, then the gateways that answered on the
+  interface before, most recent first
+- Next come the kernel's own next hop towards the check target through the
+  interface (a DHCP-learned or static route) and the first and last host
+  addresses of the interface's subnet, where routers conventionally sit
+- Other neighbours follow by NUD state, confirmed reachable before stale,
+  with neighbours whose MAC address changed recently last
+- Neighbours sharing a MAC address with a better-ranked one are pruned, as a
+  probe through the same MAC tests the same next hop
+
+Route and subnet hints are looked up at most once every HINT_TTL seconds per
+interface, and never for interfaces with a single neighbour.
+"""
+
+import fcntl
+import ipaddress
+import logging
+import socket
+import struct
+import threading
+from time import monotonic
+
+from pyroute2 import IPRoute
+from pyroute2.netlink import NetlinkError
+
+logger = logging.getLogger(__name__)
+
+# Gateways remembered per interface
+HISTORY_SIZE = 4
+
+# Seconds route and subnet hints are reused for
+HINT_TTL = 30
+
+# Seconds after a MAC address change during which a neighbour ranks last
+MAC_SETTLE_TIME = 300
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+
+# Kernel NUD states (see pyroute2.netlink.rtnl.ndmsg)
+NUD_REACHABLE = 0x02
+NUD_STALE = 0x04
+NUD_DELAY = 0x08
+NUD_PROBE = 0x10
+NUD_NOARP = 0x40
+NUD_PERMANENT = 0x80
+
+# States of neighbours whose link-layer address has been confirmed
+NUD_CONFIRMED = NUD_REACHABLE | NUD_PERMANENT | NUD_NOARP
+
+# Ranks of the signals, lowest probed first
+_CURRENT, _HISTORY, _ROUTE, _SUBNET_EDGE, _OTHER = range(5)
+
+
+def _state_rank(state) -> int:
+    """Rank of a NUD state, confirmed entries first (None when unknown)"""
+    if state is None:
+        return 2
+    if state & NUD_CONFIRMED:
+        return 0
+    if state & (NUD_DELAY | NUD_PROBE):
+        return 1
+    if state & NUD_STALE:
+        return 2
+    return 3
+
+
+class GatewayRanker:
+    """Orders gateway candidates by how likely they are to be routers.
+
+    Attributes:
+        neighbour_cache: NeighbourCache supplying NUD states and MAC changes
+                         (optional, neighbours are then ranked without them)
+    """
+
+    def __init__(self, neighbour_cache=None):
+        self.neighbour_cache = neighbour_cache
+        self._history = {}  # Interface name → gateway IPs, most recent first
+        self._hints = {}  # Interface name → (expiry, route gateway, edges)
+        self._lock = threading.Lock()
+        self._ipr = None
+        self._ipr_lock = threading.Lock()
+        self._ioctl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, interface_name: str, gateway_ip: str):
+        """Remember a gateway that passed a check on an interface"""
+        with self._lock:
+            history = self._history.setdefault(interface_name, [])
+            if history and history[0] == gateway_ip:
+                return
+            if gateway_ip in history:
+                history.remove(gateway_ip)
+            history.insert(0, gateway_ip)
+            del history[HISTORY_SIZE:]
+
+    def forget(self, interface_name: str):
+        """Drop what is known about an interface that is no longer monitored"""
+        with self._lock:
+            self._history.pop(interface_name, None)
+            self._hints.pop(interface_name, None)
+
+    def rank(self, interface, neighbours: list, target_ip: str | None = None) -> list:
+        """Neighbours (IP, MAC) in the order they should be probed, without
+        those sharing the MAC address of a better-ranked neighbour"""
+        if len(neighbours) < 2:
+            return neighbours
+
+        with self._lock:
+            history = list(self._history.get(interface.name, ()))
+        route_gateway, edges = self._get_hints(interface.name, target_ip)
+        details = {}
+        if self.neighbour_cache is not None:
+            details = {n.ip: n for n in self.neighbour_cache.get(interface.name)}
+        now = monotonic()
+
+        def key(item):
+            position, (neighbour_ip, _) = item
+            if neighbour_ip == interface.gateway:
+                signal = (_CURRENT, 0)
+            elif neighbour_ip in history:
+                signal = (_HISTORY, history.index(neighbour_ip))
+            elif neighbour_ip == route_gateway:
+                signal = (_ROUTE, 0)
+            elif neighbour_ip in edges:
+                signal = (_SUBNET_EDGE, 0)
+            else:
+                signal = (_OTHER, 0)
+            neighbour = details.get(neighbour_ip)
+            state = getattr(neighbour, "state", None)
+            changed = getattr(neighbour, "mac_changed", None)
+            settling = changed is not None and now - changed < MAC_SETTLE_TIME
+            return signal + (_state_rank(state), settling, position)
+
+        ranked = []
+        seen_macs = set()
+        for _, (neighbour_ip, mac) in sorted(enumerate(neighbours), key=key):
+            if mac.lower() in seen_macs:
+                continue
+            seen_macs.add(mac.lower())
+            ranked.append((neighbour_ip, mac))
+
+        if len(ranked) < len(neighbours):
+            logger.debug(
+                "Pruned %d of %d neighbour(s) on %s sharing a MAC address",
+                len(neighbours) - len(ranked),
+                len(neighbours),
+                interface.name,
+            )
+        return ranked
+
+    def _get_hints(self, name: str, target_ip: str) -> tuple:
+        """(route gateway, subnet edge addresses) of an interface"""
+        with self._lock:
+            cached = self._hints.get(name)
+        if cached is not None and cached[0] > monotonic():
+            return cached[1:]
+
+        route_gateway = self._route_gateway(name, target_ip) if target_ip else None
+        edges = self._subnet_edges(name)
+        with self._lock:
+            self._hints[name] = (monotonic() + HINT_TTL, route_gateway, edges)
+        return route_gateway, edges
+
+    def _route_gateway(self, name: str, target_ip: str):
+        """Next hop the kernel routes target_ip through the interface with,
+        or None without a route via a gateway"""
+        try:
+            with self._ipr_lock:
+                if self._ipr is None:
+                    self._ipr = IPRoute()
+                routes = self._ipr.route(
+                    "get", dst=target_ip, oif=socket.if_nametoindex(name)
+                )
+        except (OSError, NetlinkError) as e:
+            logger.debug("No route hint for %s: %s", name, e)
+            return None
+        for route in routes:
+            gateway = route.get_attr("RTA_GATEWAY")
+            if gateway:
+                return gateway
+        return None
+
+    def _subnet_edges(self, name: str) -> frozenset:
+        """First and last host address of the interface's primary subnet"""
+        request = struct.pack("256s", name[:15].encode())
+        try:
+            fd = self._ioctl_sock.fileno()
+            address = fcntl.ioctl(fd, SIOCGIFADDR, request)[20:24]
+            netmask = fcntl.ioctl(fd, SIOCGIFNETMASK, request)[20:24]
+        except OSError:
+            return frozenset()
+        interface = ipaddress.IPv4Interface(
+            (socket.inet_ntoa(address), socket.inet_ntoa(netmask))
+        )
+        network = interface.network
+        if network.prefixlen > 30:
+            return frozenset()
+        edges = {str(network[1]), str(network[-2])}
+        edges.discard(str(interface.ip))
+        return frozenset(edges)
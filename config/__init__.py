@@ -5,9 +5,13 @@
 # ]
 # ///
 
+import ipaddress
 import os
 import toml
-from .interfaces import Interface, get_system_interfaces
+from .interfaces import AutoInterfaces, Interface
+
+# Worker pool size cap when max_workers follows the interfaces
+DEFAULT_MAX_WORKERS = 32
 
 
 class Config:
@@ -15,17 +19,135 @@ class Config:
 
     Attributes:
         interfaces: List[Interface] - Network interfaces being monitored
-        min_check_interval: int - Smallest check interval from all interfaces
-                                  (automatically calculated)
-        routing_backend: str - Routing backend to use ("frr" or "kernel")
+        auto_interfaces: AutoInterfaces - Settings and filters of interfaces
+                                          monitored as their links appear
+                                          (None disables auto-discovery)
+        routing_backend: str - Routing backend to use ("frr", "kernel" or
+                               "nexthop")
         log_level: str - Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        jitter: float - Fraction of each check_interval used to randomise
+                        probe deadlines so interfaces do not fire in lockstep
+        max_workers: int - Maximum number of interface checks run concurrently
+                           (None for one per monitored interface, capped at
+                           32, see worker_count)
+        probe_backend: str - Health check prober ("native" or "scapy")
+        neighbour_probe_mode: str - "sequential" probes one neighbour at a time,
+                                    "concurrent" probes them in parallel waves
+        probe_wave_size: int - Neighbours probed per concurrent wave (0 = all)
+        gateway_head_start: float - Seconds the current gateway is probed ahead
+                                    of the other neighbours in concurrent mode
+        kernel_route_mode: str - Kernel backend routes: "metric" installs one
+                                 default route per interface, "multipath" one
+                                 weighted ECMP default route
+        multipath_metric: int - Metric of the multipath default route, or of
+                                the routes using the nexthop group
+                                (defaults to the lowest interface metric)
+        nexthop_group_id: int - Kernel id of the nexthop group; interface
+                                nexthops use the ids directly above it
+        route_prefixes: List[str] - Prefixes routed via the nexthop group
+        route_tables: List[int] - Routing tables the prefixes are installed in
+        reconcile_interval: float - Seconds between checks that installed
+                                    routes are still present (0 disables)
+        route_protocol: int - Kernel route protocol id (and FRR route tag)
+                              marking the routes this daemon owns
+        state_file: str - Path of the file keeping last known gateways across
+                          restarts (None disables it)
+        dynamic_weights: bool - Derive ECMP weights from measured RTT and loss
+                                instead of using the configured weights as is
+        stats_window: int - Probe results kept per path for RTT and loss stats
+        rtt_tolerance_ms: float - Median RTT above a path's base RTT that is
+                                  not treated as congestion
+        degraded_loss: float - Loss rate at which a path is demoted
+        degraded_rtt_ms: float - 95th percentile RTT at which a path is
+                                 demoted (0 disables it)
+        dampening_half_life: float - Half-life in seconds of the flap penalty
+                                     (0 disables flap dampening)
+        dampening_penalty: float - Penalty added each time an interface fails
+        dampening_suppress_limit: float - Penalty at which a route is suppressed
+        dampening_reuse_limit: float - Penalty below which it is allowed back
+        dampening_max_suppress: float - Longest suppression after the last flap
+                                        (defaults to four half-lives)
+        metrics_listen: tuple - (host, port) of the Prometheus metrics
+                                endpoint (None disables it)
+        conntrack_flush: bool - Delete the conntrack entries of an
+                                interface's flows when its route is withdrawn
     """
 
-    def __init__(self, interfaces, routing_backend="kernel", log_level="INFO"):
+    def __init__(
+        self,
+        interfaces,
+        routing_backend="kernel",
+        log_level="INFO",
+        jitter=0.1,
+        max_workers=None,
+        probe_backend="native",
+        neighbour_probe_mode="sequential",
+        probe_wave_size=0,
+        gateway_head_start=0.1,
+        kernel_route_mode="metric",
+        multipath_metric=None,
+        nexthop_group_id=1000,
+        route_prefixes=("0.0.0.0/0",),
+        route_tables=(254,),
+        reconcile_interval=60,
+        route_protocol=236,
+        state_file=None,
+        dynamic_weights=False,
+        stats_window=20,
+        rtt_tolerance_ms=10.0,
+        degraded_loss=0.2,
+        degraded_rtt_ms=0,
+        dampening_half_life=0,
+        dampening_penalty=1000,
+        dampening_suppress_limit=2000,
+        dampening_reuse_limit=750,
+        dampening_max_suppress=None,
+        metrics_listen=None,
+        auto_interfaces=None,
+        conntrack_flush=False,
+    ):
         self.interfaces = interfaces
+        self.auto_interfaces = auto_interfaces
         self.routing_backend = routing_backend
         self.log_level = log_level.upper()
-        self.min_check_interval = min(iface.check_interval for iface in interfaces)
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self.probe_backend = probe_backend
+        self.neighbour_probe_mode = neighbour_probe_mode
+        self.probe_wave_size = probe_wave_size
+        self.gateway_head_start = gateway_head_start
+        self.kernel_route_mode = kernel_route_mode
+        if multipath_metric is None:
+            metrics = [i.metric for i in interfaces]
+            if auto_interfaces is not None:
+                metrics.append(auto_interfaces.metric)
+            multipath_metric = min(metrics, default=0)
+        self.multipath_metric = multipath_metric
+        self.nexthop_group_id = nexthop_group_id
+        self.route_prefixes = list(route_prefixes)
+        self.route_tables = list(route_tables)
+        self.reconcile_interval = reconcile_interval
+        self.route_protocol = route_protocol
+        self.state_file = state_file
+        self.dynamic_weights = dynamic_weights
+        self.stats_window = stats_window
+        self.rtt_tolerance_ms = rtt_tolerance_ms
+        self.degraded_loss = degraded_loss
+        self.degraded_rtt_ms = degraded_rtt_ms
+        self.dampening_half_life = dampening_half_life
+        self.dampening_penalty = dampening_penalty
+        self.dampening_suppress_limit = dampening_suppress_limit
+        self.dampening_reuse_limit = dampening_reuse_limit
+        self.dampening_max_suppress = dampening_max_suppress
+        self.metrics_listen = metrics_listen
+        self.conntrack_flush = conntrack_flush
+
+    def worker_count(self) -> int:
+        """Interface checks to run concurrently: max_workers, or one per
+        monitored interface capped at DEFAULT_MAX_WORKERS"""
+        if self.max_workers is not None:
+            return self.max_workers
+        return max(1, min(len(self.interfaces), DEFAULT_MAX_WORKERS))
 
 
 def load_config():
@@ -40,14 +162,32 @@ def load_config():
     Raises:
         ValueError: For invalid configurations, including:
             - Invalid routing backend specified
-            - Missing required parameters in [interface.auto]
-            - No system interfaces found when using auto-config
-            - No valid interfaces configured
+            - Jitter outside the range 0 <= jitter < 1
+            - max_workers less than 1
+            - Invalid probe backend specified
+            - Invalid neighbour probe mode, wave size or gateway head start
+            - Invalid kernel route mode
+            - Invalid interface check_interval, weight, check_port, timeout_ms,
+              detect_multiplier or rise
+            - Interface without target_ip or targets, or with an invalid
+              target, quorum or targets_per_check
+            - Invalid nexthop group id, route prefix or route table
+            - Negative reconcile_interval
+            - route_protocol outside 1-255
+            - stats_window less than 1, negative rtt_tolerance_ms or
+              degraded_rtt_ms, or degraded_loss outside 0 < loss <= 1
+            - Negative dampening half-life, non-positive penalty or
+              max_suppress, or a reuse limit not below the suppress limit
+            - metrics_listen not in "host:port" form
+            - Missing required parameters in [interface.auto], or include,
+              exclude or kinds that are not lists of strings
+            - No interfaces configured and no [interface.auto]
         FileNotFoundError: If configuration file is missing
 
-    Processes both explicitly configured interfaces and auto-detected system
-    interfaces. Auto-configuration requires all interface parameters and will
-    add any system interfaces not explicitly configured.
+    Explicitly configured interfaces are returned as Interface objects.
+    [interface.auto] requires all interface parameters and is returned as an
+    AutoInterfaces template, which the daemon applies to every matching link
+    not explicitly configured as links appear and disappear.
     """
 
     config_path = os.getenv("ECMP_CONFIG_PATH", "config/config.toml")
@@ -57,10 +197,37 @@ def load_config():
     general_config = data.get("general", {})
     routing_backend = general_config.get("backend", "frr")
     log_level = general_config.get("log_level", "INFO")
+    jitter = general_config.get("jitter", 0.1)
+    max_workers = general_config.get("max_workers")
+    probe_backend = general_config.get("probe_backend", "native")
+    neighbour_probe_mode = general_config.get("neighbour_probe_mode", "sequential")
+    probe_wave_size = general_config.get("probe_wave_size", 0)
+    gateway_head_start = general_config.get("gateway_head_start", 0.1)
+    kernel_route_mode = general_config.get("kernel_route_mode", "metric")
+    multipath_metric = general_config.get("multipath_metric")
+    nexthop_group_id = general_config.get("nexthop_group_id", 1000)
+    route_prefixes = general_config.get("route_prefixes", ["0.0.0.0/0"])
+    route_tables = general_config.get("route_tables", [254])
+    reconcile_interval = general_config.get("reconcile_interval", 60)
+    route_protocol = general_config.get("route_protocol", 236)
+    state_file = general_config.get("state_file")
+    dynamic_weights = general_config.get("dynamic_weights", False)
+    stats_window = general_config.get("stats_window", 20)
+    rtt_tolerance_ms = general_config.get("rtt_tolerance_ms", 10.0)
+    degraded_loss = general_config.get("degraded_loss", 0.2)
+    degraded_rtt_ms = general_config.get("degraded_rtt_ms", 0)
+    dampening_half_life = general_config.get("dampening_half_life", 0)
+    dampening_penalty = general_config.get("dampening_penalty", 1000)
+    dampening_suppress_limit = general_config.get("dampening_suppress_limit", 2000)
+    dampening_reuse_limit = general_config.get("dampening_reuse_limit", 750)
+    dampening_max_suppress = general_config.get("dampening_max_suppress")
+    metrics_listen = general_config.get("metrics_listen")
+    conntrack_flush = general_config.get("conntrack_flush", False)
 
-    if routing_backend not in ("frr", "kernel"):
+    if routing_backend not in ("frr", "kernel", "nexthop"):
         raise ValueError(
-            f"Invalid routing backend '{routing_backend}'. Must be 'frr' or 'kernel'"
+            f"Invalid routing backend '{routing_backend}'. "
+            "Must be 'frr', 'kernel' or 'nexthop'"
         )
 
     # Validate log level
@@ -70,6 +237,109 @@ def load_config():
             f"Invalid log level '{log_level}'. Must be one of: {', '.join(valid_log_levels)}"
         )
 
+    if not 0 <= jitter < 1:
+        raise ValueError(f"Invalid jitter '{jitter}'. Must be between 0 and 1")
+
+    if max_workers is not None and max_workers < 1:
+        raise ValueError(f"Invalid max_workers '{max_workers}'. Must be at least 1")
+
+    if probe_backend not in ("native", "scapy"):
+        raise ValueError(
+            f"Invalid probe backend '{probe_backend}'. Must be 'native' or 'scapy'"
+        )
+
+    if neighbour_probe_mode not in ("sequential", "concurrent"):
+        raise ValueError(
+            f"Invalid neighbour probe mode '{neighbour_probe_mode}'. "
+            "Must be 'sequential' or 'concurrent'"
+        )
+
+    if probe_wave_size < 0:
+        raise ValueError(
+            f"Invalid probe_wave_size '{probe_wave_size}'. Must be 0 or more"
+        )
+
+    if gateway_head_start < 0:
+        raise ValueError(
+            f"Invalid gateway_head_start '{gateway_head_start}'. Must be 0 or more"
+        )
+
+    if kernel_route_mode not in ("metric", "multipath"):
+        raise ValueError(
+            f"Invalid kernel route mode '{kernel_route_mode}'. "
+            "Must be 'metric' or 'multipath'"
+        )
+
+    if not 1 <= nexthop_group_id < 2**32 - 4096:
+        raise ValueError(
+            f"Invalid nexthop_group_id '{nexthop_group_id}'. "
+            f"Must be between 1 and {2**32 - 4097}"
+        )
+
+    for prefix in route_prefixes:
+        try:
+            ipaddress.IPv4Network(prefix)
+        except ValueError as e:
+            raise ValueError(f"Invalid route prefix '{prefix}': {e}") from e
+
+    for table in route_tables:
+        if not isinstance(table, int) or not 1 <= table < 2**32:
+            raise ValueError(f"Invalid route table '{table}'. Must be a table id")
+
+    if reconcile_interval < 0:
+        raise ValueError(
+            f"Invalid reconcile_interval '{reconcile_interval}'. Must be 0 or more"
+        )
+
+    if not 1 <= route_protocol <= 255:
+        raise ValueError(
+            f"Invalid route_protocol '{route_protocol}'. Must be between 1 and 255"
+        )
+
+    if stats_window < 1:
+        raise ValueError(f"Invalid stats_window '{stats_window}'. Must be at least 1")
+
+    if rtt_tolerance_ms < 0:
+        raise ValueError(
+            f"Invalid rtt_tolerance_ms '{rtt_tolerance_ms}'. Must be 0 or more"
+        )
+
+    if not 0 < degraded_loss <= 1:
+        raise ValueError(
+            f"Invalid degraded_loss '{degraded_loss}'. Must be between 0 and 1"
+        )
+
+    if degraded_rtt_ms < 0:
+        raise ValueError(
+            f"Invalid degraded_rtt_ms '{degraded_rtt_ms}'. Must be 0 or more"
+        )
+
+    if dampening_half_life < 0:
+        raise ValueError(
+            f"Invalid dampening_half_life '{dampening_half_life}'. Must be 0 or more"
+        )
+
+    if dampening_penalty <= 0:
+        raise ValueError(
+            f"Invalid dampening_penalty '{dampening_penalty}'. Must be greater than 0"
+        )
+
+    if not 0 < dampening_reuse_limit < dampening_suppress_limit:
+        raise ValueError(
+            f"Invalid dampening limits (reuse {dampening_reuse_limit}, suppress "
+            f"{dampening_suppress_limit}). The reuse limit must be greater than 0 "
+            "and below the suppress limit"
+        )
+
+    if dampening_max_suppress is not None and dampening_max_suppress <= 0:
+        raise ValueError(
+            f"Invalid dampening_max_suppress '{dampening_max_suppress}'. "
+            "Must be greater than 0"
+        )
+
+    if metrics_listen is not None:
+        metrics_listen = _listen_address(metrics_listen)
+
     interfaces = []
     interface_data = data.get("interface", {})
     auto_params = None
@@ -80,11 +350,12 @@ def load_config():
 
         if interface_name == "auto":
             # Validate auto configuration has all required parameters
-            if not all(
-                k in iface_data for k in ("metric", "check_interval", "target_ip")
+            if not all(k in iface_data for k in ("metric", "check_interval")) or not (
+                "target_ip" in iface_data or "targets" in iface_data
             ):
                 raise ValueError(
-                    "Auto configuration requires metric, check_interval, and target_ip"
+                    "Auto configuration requires metric, check_interval, and "
+                    "target_ip or targets"
                 )
             auto_params = iface_data
         else:
@@ -94,31 +365,185 @@ def load_config():
                     name=interface_name,
                     metric=iface_data["metric"],
                     check_interval=iface_data["check_interval"],
-                    target_ip=iface_data["target_ip"],
+                    target_ip=iface_data.get("target_ip"),
+                    **_interface_options(interface_name, iface_data),
                 )
             )
 
-    # Add auto-detected interfaces if specified
+    # Template for links discovered at run time
+    auto_interfaces = None
     if auto_params is not None:
-        system_ifaces = get_system_interfaces()
-        if not system_ifaces:
+        filters = {}
+        for key in ("include", "exclude", "kinds"):
+            if key not in auto_params:
+                continue
+            value = auto_params[key]
+            if not isinstance(value, list) or not all(
+                isinstance(v, str) for v in value
+            ):
+                raise ValueError(
+                    f"Invalid {key} '{value}' in [interface.auto]. "
+                    "Must be a list of strings"
+                )
+            filters[key] = value
+        auto_interfaces = AutoInterfaces(
+            metric=auto_params["metric"],
+            check_interval=auto_params["check_interval"],
+            target_ip=auto_params.get("target_ip"),
+            options=_interface_options("auto", auto_params),
+            **filters,
+        )
+
+    if not interfaces and auto_interfaces is None:
+        raise ValueError(f"No interfaces defined in {config_path}")
+
+    return Config(
+        interfaces,
+        routing_backend,
+        log_level,
+        jitter,
+        max_workers,
+        probe_backend,
+        neighbour_probe_mode,
+        probe_wave_size,
+        gateway_head_start,
+        kernel_route_mode,
+        multipath_metric,
+        nexthop_group_id,
+        route_prefixes,
+        route_tables,
+        reconcile_interval,
+        route_protocol,
+        state_file,
+        dynamic_weights,
+        stats_window,
+        rtt_tolerance_ms,
+        degraded_loss,
+        degraded_rtt_ms,
+        dampening_half_life,
+        dampening_penalty,
+        dampening_suppress_limit,
+        dampening_reuse_limit,
+        dampening_max_suppress,
+        metrics_listen,
+        auto_interfaces,
+        conntrack_flush,
+    )
+
+
+def _listen_address(address: str) -> tuple:
+    """(host, port) of a "host:port" or "[ipv6]:port" listen address"""
+    host, _, port = str(address).rpartition(":")
+    host = host.strip("[]")
+    if not host or not port.isdigit() or not 1 <= int(port) <= 65535:
+        raise ValueError(
+            f"Invalid metrics_listen '{address}'. Must be host:port, "
+            "e.g. 127.0.0.1:9108"
+        )
+    return (host, int(port))
+
+
+def _interface_options(name, iface_data) -> dict:
+    """Validated optional health check and routing settings of an interface"""
+    check_interval = iface_data["check_interval"]
+    if check_interval <= 0:
+        raise ValueError(
+            f"Invalid check_interval '{check_interval}' for interface {name}. "
+            "Must be greater than 0"
+        )
+
+    # The kernel allows multipath weights of 1-256
+    weight = iface_data.get("weight", 1)
+    if not 1 <= weight <= 256:
+        raise ValueError(
+            f"Invalid weight '{weight}' for interface {name}. Must be 1-256"
+        )
+
+    check_port = iface_data.get("check_port", 80)
+    if not 1 <= check_port <= 65535:
+        raise ValueError(
+            f"Invalid check_port '{check_port}' for interface {name}. Must be 1-65535"
+        )
+
+    timeout_ms = iface_data.get("timeout_ms", 1000)
+    if timeout_ms <= 0:
+        raise ValueError(
+            f"Invalid timeout_ms '{timeout_ms}' for interface {name}. "
+            "Must be greater than 0"
+        )
+
+    detect_multiplier = iface_data.get("detect_multiplier", 1)
+    if detect_multiplier < 1:
+        raise ValueError(
+            f"Invalid detect_multiplier '{detect_multiplier}' for interface {name}. "
+            "Must be at least 1"
+        )
+
+    rise = iface_data.get("rise", 1)
+    if rise < 1:
+        raise ValueError(
+            f"Invalid rise '{rise}' for interface {name}. Must be at least 1"
+        )
+
+    suspect_interval = iface_data.get("suspect_interval", 0)
+    if suspect_interval < 0:
+        raise ValueError(
+            f"Invalid suspect_interval '{suspect_interval}' for interface {name}. "
+            "Must be 0 or more"
+        )
+
+    max_down_interval = iface_data.get("max_down_interval", 0)
+    if max_down_interval and max_down_interval < check_interval:
+        raise ValueError(
+            f"Invalid max_down_interval '{max_down_interval}' for interface "
+            f"{name}. Must be 0 (disabled) or at least check_interval"
+        )
+
+    # Targets are "ip" or "ip:port" strings, the port defaulting to check_port
+    targets = []
+    for target in iface_data.get("targets", []):
+        ip, _, port = target.partition(":")
+        try:
+            ipaddress.IPv4Address(ip)
+            port = int(port) if port else check_port
+        except ValueError as e:
+            raise ValueError(
+                f"Invalid target '{target}' for interface {name}: {e}"
+            ) from e
+        if not 1 <= port <= 65535:
             raise ValueError(
-                "Auto configuration specified but no system interfaces found"
+                f"Invalid target '{target}' for interface {name}. Port must be 1-65535"
             )
+        targets.append((ip, port))
+    if not targets:
+        if "target_ip" not in iface_data:
+            raise ValueError(f"Interface {name} requires target_ip or targets")
+        targets = [(iface_data["target_ip"], check_port)]
 
-        for iface_name in system_ifaces:
-            # Skip interfaces already explicitly configured
-            if not any(i.name == iface_name for i in interfaces):
-                interfaces.append(
-                    Interface(
-                        name=iface_name,
-                        metric=auto_params["metric"],
-                        check_interval=auto_params["check_interval"],
-                        target_ip=auto_params["target_ip"],
-                    )
-                )
+    targets_per_check = iface_data.get("targets_per_check", 0)
+    if not 0 <= targets_per_check <= len(targets):
+        raise ValueError(
+            f"Invalid targets_per_check '{targets_per_check}' for interface "
+            f"{name}. Must be 0 (all) to {len(targets)}"
+        )
 
-    if not interfaces:
-        raise ValueError(f"No interfaces defined in {config_path}")
+    quorum = iface_data.get("quorum", 1)
+    probed = targets_per_check or len(targets)
+    if not 1 <= quorum <= probed:
+        raise ValueError(
+            f"Invalid quorum '{quorum}' for interface {name}. "
+            f"Must be 1-{probed}, the number of targets probed per check"
+        )
 
-    return Config(interfaces, routing_backend, log_level)
+    return {
+        "weight": weight,
+        "check_port": check_port,
+        "timeout_ms": timeout_ms,
+        "detect_multiplier": detect_multiplier,
+        "rise": rise,
+        "suspect_interval": suspect_interval,
+        "max_down_interval": max_down_interval,
+        "targets": targets,
+        "quorum": quorum,
+        "targets_per_check": targets_per_check,
+    }
@@ -3,6 +3,8 @@ Network interface configuration models and utilities.
 
 This module provides:
 - Interface configuration class for representing monitored network interfaces
+- AutoInterfaces, the [interface.auto] template and the name and kind
+  filters selecting which links it applies to
 - System interface discovery functionality
 - Data structures for tracking interface properties and health check parameters
 
@@ -10,27 +12,221 @@ The Interface class encapsulates configuration settings needed for monitoring
 and route management, including metric values and health check targets.
 """
 
+import fnmatch
 import os
+import random
+import threading
 
 
 class Interface:
     """Represents a network interface configuration"""
 
-    def __init__(self, name: str, metric: int, check_interval: int, target_ip: str):
+    # Attributes set from the configuration file; everything else is state
+    # kept by the daemon
+    SETTINGS = (
+        "metric",
+        "weight",
+        "check_interval",
+        "target_ip",
+        "check_port",
+        "targets",
+        "quorum",
+        "targets_per_check",
+        "timeout_ms",
+        "detect_multiplier",
+        "rise",
+        "suspect_interval",
+        "max_down_interval",
+    )
+
+    # Settings that change when the next check is due
+    SCHEDULE_SETTINGS = frozenset(
+        ("check_interval", "suspect_interval", "max_down_interval")
+    )
+
+    def __init__(
+        self,
+        name: str,
+        metric: int,
+        check_interval: float,
+        target_ip: str,
+        weight: int = 1,
+        check_port: int = 80,
+        timeout_ms: int = 1000,
+        detect_multiplier: int = 1,
+        targets: list[tuple[str, int]] | None = None,
+        quorum: int = 1,
+        targets_per_check: int = 0,
+        rise: int = 1,
+        suspect_interval: float = 0,
+        max_down_interval: float = 0,
+    ):
+        if not targets:
+            targets = [(target_ip, check_port)]
         self.name = name
+        self.metric = metric
+        self.weight = weight  # Relative share of flows in multipath mode
+        self.effective_weight = weight  # Weight programmed, after path stats
+        self.check_interval = check_interval  # Seconds, fractions allowed
+        self.target_ip = target_ip or targets[0][0]
+        self.check_port = check_port
+        self.targets = list(targets)  # (ip, port) probed on every check
+        self.quorum = quorum  # Targets that must answer for a healthy check
+        self.targets_per_check = targets_per_check  # Rotating subset (0 = all)
+        # Start the rotation at a random target so interfaces sharing a
+        # target list do not all probe the same host at the same time
+        self._target_offset = random.randrange(len(self.targets))
+        self.timeout_ms = timeout_ms  # Probe timeout per neighbour
+        self.detect_multiplier = detect_multiplier  # Failed checks before down
+        self.rise = rise  # Passed checks before a down interface is up
+        # Seconds between checks of an up interface after a failed check
+        # (0 keeps check_interval)
+        self.suspect_interval = suspect_interval
+        # Longest backoff between checks of a down interface (0 disables it)
+        self.max_down_interval = max_down_interval
+        self.missed_checks = 0  # Consecutive failed checks
+        self.failed_at = None  # Monotonic start time of the first failed check
+        self.passed_checks = 0  # Consecutive passed checks
+        self.healthy = None  # Health after the rise/fall thresholds
+        self.last_check_passed = None  # Result of the latest single check
+        self.route_changes = 0  # Route installs and withdrawals made
+        self.unfiltered_route_changes = 0  # Same, had every check been acted on
+        self.gateway = None  # Dynamic gateway from health checks
+        self.link_up = None  # Last operational state seen in link events
+        self.link_generation = 0  # Bumped on every link state change
+        self.automatic = False  # Created from [interface.auto] for a link
+        self.lock = threading.Lock()  # Serialises route updates for this interface
+
+    @property
+    def avoided_route_changes(self) -> int:
+        """Route installs and withdrawals saved by hysteresis and dampening"""
+        return max(0, self.unfiltered_route_changes - self.route_changes)
+
+    def update_settings(self, other) -> set:
+        """Take over the configured settings of other, keeping all state.
+
+        Returns:
+            set: Names of the settings that changed
+        """
+        changed = {
+            name
+            for name in self.SETTINGS
+            if getattr(self, name) != getattr(other, name)
+        }
+        for name in changed:
+            setattr(self, name, getattr(other, name))
+        if "targets" in changed:
+            self._target_offset = random.randrange(len(self.targets))
+        return changed
+
+    def next_interval(self) -> float:
+        """Seconds until the next check, before jitter.
+
+        An up interface whose last check failed is re-checked every
+        suspect_interval until its failure is confirmed or it passes again.
+        A down interface backs off, doubling the interval with every further
+        failed check up to max_down_interval.
+        """
+        if self.healthy and self.missed_checks and self.suspect_interval:
+            return min(self.suspect_interval, self.check_interval)
+        if self.healthy is False and self.missed_checks and self.max_down_interval:
+            # Doubling starts after the failed check that took the interface
+            # down, which is the first one when detect_multiplier is 0
+            down_after = max(self.detect_multiplier, 1)
+            doublings = min(max(0, self.missed_checks - down_after), 32)
+            return max(
+                self.check_interval,
+                min(self.check_interval * 2**doublings, self.max_down_interval),
+            )
+        return self.check_interval
+
+    def next_targets(self) -> list[tuple[str, int]]:
+        """Targets to probe on the next check, rotating through the list when
+        only targets_per_check of them are probed at a time"""
+        count = len(self.targets)
+        if not self.targets_per_check or self.targets_per_check >= count:
+            return self.targets
+        start = self._target_offset
+        self._target_offset = (start + self.targets_per_check) % count
+        return [
+            self.targets[(start + i) % count] for i in range(self.targets_per_check)
+        ]
+
+
+class AutoInterfaces:
+    """Settings and filters of automatically monitored interfaces.
+
+    Attributes:
+        metric: int - Route metric of every automatic interface
+        check_interval: float - Seconds between health checks
+        target_ip: str - Health check target (None when targets are given)
+        options: dict - Validated optional Interface settings
+        include: List[str] - Shell-style name patterns of links to monitor
+        exclude: List[str] - Name patterns of links never monitored
+        kinds: List[str] - Link kinds to monitor, as reported by netlink
+                           ("vlan", "ppp", ...), "device" standing for links
+                           without a kind such as physical NICs (empty
+                           matches every kind)
+    """
+
+    # Kind matched by links netlink reports no kind for
+    DEVICE_KIND = "device"
+
+    def __init__(
+        self,
+        metric: int,
+        check_interval: float,
+        target_ip: str | None = None,
+        options: dict | None = None,
+        include=("*",),
+        exclude=("lo", "veth*"),
+        kinds=(),
+    ):
         self.metric = metric
         self.check_interval = check_interval
         self.target_ip = target_ip
-        self.gateway = None  # Dynamic gateway from health checks
+        self.options = dict(options or {})
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.kinds = list(kinds)
+
+    def matches(self, name: str, kind: str | None = None) -> bool:
+        """Whether a link of the given name and kind is monitored.
+
+        A kind of None means the kind is unknown, which only matches when no
+        kind filter is set.
+        """
+        if not any(fnmatch.fnmatchcase(name, p) for p in self.include):
+            return False
+        if any(fnmatch.fnmatchcase(name, p) for p in self.exclude):
+            return False
+        return not self.kinds or kind in self.kinds
+
+    def select(self, links: dict, configured) -> list:
+        """Names of the links in a name → kind map that match, leaving out
+        the explicitly configured interfaces"""
+        return sorted(
+            name
+            for name, kind in links.items()
+            if name not in configured and self.matches(name, kind)
+        )
+
+    def create(self, name: str) -> Interface:
+        """New Interface for a matching link"""
+        interface = Interface(
+            name=name,
+            metric=self.metric,
+            check_interval=self.check_interval,
+            target_ip=self.target_ip,
+            **self.options,
+        )
+        interface.automatic = True
+        return interface
 
 
 def get_system_interfaces():
-    """Get list of system network interfaces excluding loopback"""
+    """Names of all system network interfaces, loopback included"""
     net_dir = "/sys/class/net"
     if os.path.exists(net_dir):
-        return [
-            iface
-            for iface in os.listdir(net_dir)
-            if iface != "lo" and not iface.startswith("veth")
-        ]
+        return os.listdir(net_dir)
     return []
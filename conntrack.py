@@ -0,0 +1,287 @@
+"""
+Conntrack cleanup for withdrawn uplinks.
+
+This module provides a minimal ctnetlink client that:
+- Finds the conntrack entries of flows pinned to an uplink, those whose
+  original source or reply destination is the uplink's address (locally
+  originated and masqueraded flows), with dumps the kernel filters itself
+- Deletes them in batches of requests per system call, leaving every other
+  entry in the table alone
+- Reports how many entries were removed and how long it took
+
+Without cleanup, NAT entries keep steering a flow's packets out of the dead
+uplink's address after its route is withdrawn, and clients stall until their
+sessions time out. Messages are packed by hand, as only these two requests
+are needed.
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import socket
+import struct
+import threading
+from time import monotonic
+
+from metrics import CONNTRACK_FLUSH, CONNTRACK_REMOVED
+
+logger = logging.getLogger(__name__)
+
+NETLINK_NETFILTER = 12
+NFNL_SUBSYS_CTNETLINK = 1
+IPCTNL_MSG_CT_GET = 1
+IPCTNL_MSG_CT_DELETE = 2
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3FFF
+
+CTA_TUPLE_ORIG = 1
+CTA_TUPLE_REPLY = 2
+CTA_ID = 12
+CTA_FILTER = 25
+CTA_FILTER_ORIG_FLAGS = 1
+CTA_FILTER_REPLY_FLAGS = 2
+CTA_FILTER_FLAG_IP_SRC = 1 << 0
+CTA_FILTER_FLAG_IP_DST = 1 << 1
+CTA_TUPLE_IP = 1
+CTA_IP_V4_SRC = 1
+CTA_IP_V4_DST = 2
+
+SIOCGIFADDR = 0x8915
+
+_NLMSG_HEADER = struct.Struct("=IHHII")
+_NFGENMSG = struct.Struct("=BBH")
+_NLA_HEADER = struct.Struct("=HH")
+_ERROR = struct.Struct("=i")
+_HEADER_LEN = _NLMSG_HEADER.size + _NFGENMSG.size
+
+# Delete requests sent per system call
+DELETE_BATCH = 256
+RECV_BUFFER = 1 << 17
+
+
+def _nla(kind: int, payload: bytes) -> bytes:
+    """Netlink attribute padded to a 4 byte boundary"""
+    length = _NLA_HEADER.size + len(payload)
+    return _NLA_HEADER.pack(length, kind) + payload + bytes(-length % 4)
+
+
+def _attrs(data, start: int, end: int):
+    """(type, attribute start, payload start, attribute end) of each
+    attribute in data[start:end]"""
+    while start + _NLA_HEADER.size <= end:
+        length, kind = _NLA_HEADER.unpack_from(data, start)
+        if length < _NLA_HEADER.size:
+            return
+        yield kind & NLA_TYPE_MASK, start, start + _NLA_HEADER.size, start + length
+        start += (length + 3) & ~3
+
+
+def _find(data, start: int, end: int, *path):
+    """Payload bounds of the attribute at a path of nested types, or None"""
+    for kind in path:
+        for attr_kind, _, payload, attr_end in _attrs(data, start, end):
+            if attr_kind == kind:
+                start, end = payload, attr_end
+                break
+        else:
+            return None
+    return start, end
+
+
+class ConntrackFlusher:
+    """Deletes the conntrack entries of an uplink's flows through ctnetlink.
+
+    Raises:
+        RuntimeError: If ctnetlink cannot be opened (missing nf_conntrack
+                      netlink support or CAP_NET_ADMIN)
+    """
+
+    def __init__(self):
+        try:
+            self._sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_NETFILTER
+            )
+            self._sock.bind((0, 0))
+        except OSError as e:
+            raise RuntimeError(f"ctnetlink unavailable: {e}") from e
+        self._ioctl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def close(self):
+        self._sock.close()
+        self._ioctl_sock.close()
+
+    def flush(self, interface_name: str) -> int:
+        """Delete the conntrack entries pinned to an interface's address.
+
+        Returns:
+            int: Number of entries removed
+        """
+        started = monotonic()
+        try:
+            address = self._interface_address(interface_name)
+        except OSError:
+            # Without an address the kernel has already dropped its NAT
+            # entries, and there is nothing left to match
+            return 0
+        try:
+            with self._lock:
+                entries = self._dump(address, CTA_TUPLE_ORIG, CTA_IP_V4_SRC)
+                entries.update(self._dump(address, CTA_TUPLE_REPLY, CTA_IP_V4_DST))
+                removed, failed = self._delete(list(entries.values()))
+        except OSError as e:
+            logger.warning(
+                "Failed to flush conntrack entries of %s: %s", interface_name, e
+            )
+            return 0
+
+        elapsed = monotonic() - started
+        CONNTRACK_FLUSH.observe(elapsed, interface_name)
+        CONNTRACK_REMOVED.inc(interface_name, amount=removed)
+        logger.info(
+            "Removed %d conntrack entr%s of %s (%s) in %.1fms",
+            removed,
+            "y" if removed == 1 else "ies",
+            interface_name,
+            socket.inet_ntoa(address),
+            elapsed * 1000,
+        )
+        if failed:
+            logger.warning(
+                "Failed to remove %d conntrack entr%s of %s",
+                failed,
+                "y" if failed == 1 else "ies",
+                interface_name,
+            )
+        return removed
+
+    def _interface_address(self, name: str) -> bytes:
+        """Primary IPv4 address of an interface (raises OSError if none)"""
+        request = struct.pack("256s", name[:15].encode())
+        return fcntl.ioctl(self._ioctl_sock.fileno(), SIOCGIFADDR, request)[20:24]
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        return self._seq
+
+    def _message(self, msg_type: int, flags: int, payload: bytes) -> bytes:
+        header = _NLMSG_HEADER.pack(
+            _HEADER_LEN + len(payload),
+            NFNL_SUBSYS_CTNETLINK << 8 | msg_type,
+            flags,
+            self._next_seq(),
+            0,
+        )
+        return header + _NFGENMSG.pack(socket.AF_INET, 0, 0) + payload
+
+    def _dump(self, address: bytes, direction: int, field: int) -> dict:
+        """Entries whose tuple in one direction has address as its source
+        or destination, as CTA_ID → delete request payload"""
+        if direction == CTA_TUPLE_ORIG:
+            filter_attr = CTA_FILTER_ORIG_FLAGS
+        else:
+            filter_attr = CTA_FILTER_REPLY_FLAGS
+        if field == CTA_IP_V4_SRC:
+            flags = CTA_FILTER_FLAG_IP_SRC
+        else:
+            flags = CTA_FILTER_FLAG_IP_DST
+        tuple_ip = _nla(CTA_TUPLE_IP | NLA_F_NESTED, _nla(field, address))
+        payload = _nla(direction | NLA_F_NESTED, tuple_ip) + _nla(
+            CTA_FILTER | NLA_F_NESTED, _nla(filter_attr, struct.pack("=I", flags))
+        )
+        self._sock.send(
+            self._message(IPCTNL_MSG_CT_GET, NLM_F_REQUEST | NLM_F_DUMP, payload)
+        )
+
+        entries = {}
+        while True:
+            data = self._sock.recv(RECV_BUFFER)
+            offset = 0
+            while offset + _NLMSG_HEADER.size <= len(data):
+                length, msg_type = _NLMSG_HEADER.unpack_from(data, offset)[:2]
+                end = offset + length
+                if msg_type == NLMSG_DONE:
+                    return entries
+                if msg_type == NLMSG_ERROR:
+                    error = -_ERROR.unpack_from(data, offset + _NLMSG_HEADER.size)[0]
+                    raise OSError(error, os.strerror(error))
+                self._collect(data, offset + _HEADER_LEN, end, address, entries)
+                offset += (length + 3) & ~3
+
+    @staticmethod
+    def _collect(data, start: int, end: int, address: bytes, entries: dict):
+        """Add an entry from a dump reply if one of its tuples has the
+        address, so a kernel ignoring the filter never widens the flush"""
+        tuples = {}  # Direction → (attribute start, payload start, end)
+        entry_id = None
+        for kind, attr_start, payload, attr_end in _attrs(data, start, end):
+            if kind in (CTA_TUPLE_ORIG, CTA_TUPLE_REPLY):
+                tuples[kind] = (attr_start, payload, attr_end)
+            elif kind == CTA_ID:
+                entry_id = bytes(data[attr_start:attr_end])
+        if CTA_TUPLE_ORIG not in tuples or entry_id is None:
+            return
+
+        def tuple_address(direction, field):
+            if direction not in tuples:
+                return None
+            _, payload, attr_end = tuples[direction]
+            found = _find(data, payload, attr_end, CTA_TUPLE_IP, field)
+            return found and bytes(data[found[0] : found[1]])
+
+        if address in (
+            tuple_address(CTA_TUPLE_ORIG, CTA_IP_V4_SRC),
+            tuple_address(CTA_TUPLE_REPLY, CTA_IP_V4_DST),
+        ):
+            # The original tuple names the entry, and its id makes sure a
+            # new entry reusing the tuple is left alone
+            attr_start, _, attr_end = tuples[CTA_TUPLE_ORIG]
+            entries[entry_id] = bytes(data[attr_start:attr_end]) + entry_id
+
+    def _delete(self, payloads: list) -> tuple:
+        """Delete entries in batches, returning how many were removed and
+        how many failed (entries that expired meanwhile count as neither)"""
+        removed = failed = 0
+        for start in range(0, len(payloads), DELETE_BATCH):
+            batch = payloads[start : start + DELETE_BATCH]
+            first_seq = (self._seq + 1) & 0xFFFFFFFF
+            self._sock.send(
+                b"".join(
+                    self._message(
+                        IPCTNL_MSG_CT_DELETE, NLM_F_REQUEST | NLM_F_ACK, payload
+                    )
+                    for payload in batch
+                )
+            )
+            pending = len(batch)
+            while pending:
+                data = self._sock.recv(RECV_BUFFER)
+                offset = 0
+                while offset + _NLMSG_HEADER.size <= len(data):
+                    length, msg_type, _, seq, _ = _NLMSG_HEADER.unpack_from(
+                        data, offset
+                    )
+                    in_batch = (seq - first_seq) & 0xFFFFFFFF < len(batch)
+                    if msg_type == NLMSG_ERROR and in_batch:
+                        pending -= 1
+                        error = -_ERROR.unpack_from(data, offset + _NLMSG_HEADER.size)[
+                            0
+                        ]
+                    else:
+                        error = None
+                    offset += (length + 3) & ~3
+                    if error is None:
+                        continue
+                    if not error:
+                        removed += 1
+                    elif error != errno.ENOENT:
+                        failed += 1
+        return removed, failed
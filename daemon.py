@@ -5,23 +5,57 @@ This module implements the core control loop that:
 - Monitors network interface health status
 - Manages equal-cost multi-path (ECMP) routes via FRRouting
 - Dynamically updates routing tables based on interface availability
-- Handles configuration changes and service lifecycle events
+- Handles configuration changes and service lifecycle events, reloading
+  the configuration on SIGHUP
 
 The daemon continuously evaluates interface connectivity using health checks
 and adjusts the routing table to maintain optimal network paths.
 """
 
+import functools
 import logging
+import os
+import resource
+import signal
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep
+import threading
+from time import monotonic
 from frr import FRRClient
-from kernel import KernelRoutingClient
+from reconcile import RouteReconciler
+from conntrack import ConntrackFlusher
 from health_checks import is_interface_healthy
 from config import load_config
+from discovery import LinkDiscovery
+from scheduler import ProbeScheduler
+from engine import ProbeEngine
+from prober import create_prober
+from path_stats import MAX_WEIGHT, PathStats
+from dampening import FlapDampener
+from candidates import NUD_CONFIRMED, GatewayRanker
+from metrics import (
+    CHECKS,
+    CYCLE_DURATION,
+    FAILURE_TO_WITHDRAWAL,
+    FIRST_ROUTE,
+    REGISTRY,
+    SCHEDULER_LAG,
+    interface_collector,
+    start_http_server,
+)
+from netlink_monitor import NetlinkMonitor, NeighbourCache
+from reload import ConfigReloader
 
 
-def check_and_process_interface(interface, routing_client, logger):
+def check_and_process_interface(
+    interface,
+    routing_client,
+    logger,
+    prober=None,
+    config=None,
+    neighbour_cache=None,
+    dampener=None,
+    ranker=None,
+):
     """Check a single interface and process the result.
 
     This function is designed to be executed in parallel for multiple interfaces.
@@ -29,52 +63,401 @@ def check_and_process_interface(interface, routing_client, logger):
 
     Args:
         interface: Interface object to check
-        routing_client: Routing client instance (FRRClient or KernelRoutingClient)
+        routing_client: RouteReconciler in front of the routing backend
         logger: Logger instance for output
+        prober: Probe backend used for the TCP SYN checks
+        config: Config holding the neighbour probing and weighting options
+                (defaults apply when omitted)
+        neighbour_cache: NeighbourCache to read neighbours from instead of
+                         running `ip neigh`
+        dampener: FlapDampener suppressing interfaces that keep flapping
+                  (optional)
+        ranker: GatewayRanker ordering the neighbours to probe (optional)
 
     Returns:
         tuple: (interface, success, error_message) where success is True if check completed
     """
     try:
         logger.debug("Checking interface %s", interface.name)
+        started = monotonic()
+        link_generation = interface.link_generation
+        path_stats = None
+        probe_options = {}
+        if config is not None:
+            if config.dynamic_weights:
+                path_stats = getattr(prober, "stats", None)
+            probe_options = {
+                "concurrent": config.neighbour_probe_mode == "concurrent",
+                "wave_size": config.probe_wave_size,
+                "head_start": config.gateway_head_start,
+            }
         healthy, gateway_ip = is_interface_healthy(
             interface,
-            check_ip=interface.target_ip,
-            check_port=80,
-            timeout=1,
+            targets=interface.next_targets(),
+            quorum=interface.quorum,
+            timeout=interface.timeout_ms / 1000,
+            prober=prober,
+            neighbour_cache=neighbour_cache,
+            ranker=ranker,
+            **probe_options,
         )
+        CHECKS.inc(interface.name, "passed" if healthy and gateway_ip else "failed")
+        if ranker is not None and healthy and gateway_ip:
+            ranker.record(interface.name, gateway_ip)
 
-        if healthy and gateway_ip:
-            # Update interface's gateway if it changed
-            if interface.gateway != gateway_ip:
-                logger.info(
-                    "Gateway for %s changed from %s to %s",
+        with interface.lock:
+            if interface.link_generation != link_generation:
+                # A link event or a reload already acted on this interface
+                # mid-check
+                logger.debug(
+                    "Discarding check result for %s after link or config change",
                     interface.name,
-                    interface.gateway or "None",
-                    gateway_ip,
                 )
-                interface.gateway = gateway_ip
+                return (interface, True, None)
+            return _apply_check_result(
+                interface,
+                routing_client,
+                logger,
+                healthy,
+                gateway_ip,
+                path_stats,
+                dampener,
+                started,
+            )
+    except Exception as e:
+        CHECKS.inc(interface.name, "error")
+        logger.error("Interface check failed for %s: %s", interface.name, str(e))
+        return (interface, False, str(e))
+
+
+def _apply_check_result(
+    interface,
+    routing_client,
+    logger,
+    healthy,
+    gateway_ip,
+    path_stats=None,
+    dampener=None,
+    started=None,
+):
+    """Install or withdraw the route of an interface after a health check.
+
+    A down interface only comes up after rise consecutive passed checks and
+    an up one only goes down after detect_multiplier consecutive failed
+    checks, so a single lost or lucky probe does not change the routes. With
+    a dampener, an interface that keeps flapping stays withdrawn until its
+    flap penalty has decayed. With path_stats given, the route's ECMP weight
+    follows the measured RTT and loss of the path.
+
+    started is the monotonic time the check began, used to measure the time
+    from the first failed check to the withdrawal of the route.
+    """
+    passed = bool(healthy and gateway_ip)
+    if passed != bool(interface.last_check_passed):
+        # Acting on every single check would have changed the route here
+        interface.unfiltered_route_changes += 1
+    interface.last_check_passed = passed
+
+    if not passed:
+        # Interface is unhealthy or no gateway found
+        interface.passed_checks = 0
+        interface.missed_checks += 1
+        if interface.missed_checks == 1:
+            interface.failed_at = started
+        if interface.healthy and interface.missed_checks < interface.detect_multiplier:
+            logger.debug(
+                "Check of %s failed (%d/%d), keeping route via gateway %s",
+                interface.name,
+                interface.missed_checks,
+                interface.detect_multiplier,
+                interface.gateway,
+            )
+            return (interface, True, None)
+        _mark_down(interface, dampener)
+        if interface.gateway:
+            logger.info(
+                "Interface %s became unhealthy, removing route via gateway %s",
+                interface.name,
+                interface.gateway,
+            )
+            routing_client.remove_route(interface)
+            interface.gateway = None
+            interface.route_changes += 1
+            if interface.failed_at is not None:
+                FAILURE_TO_WITHDRAWAL.observe(
+                    monotonic() - interface.failed_at, interface.name
+                )
+        return (interface, True, None)
+
+    interface.missed_checks = 0
+    interface.passed_checks += 1
+    if not interface.healthy:
+        if interface.passed_checks < interface.rise:
+            logger.debug(
+                "Check of %s passed (%d/%d), waiting before installing route",
+                interface.name,
+                interface.passed_checks,
+                interface.rise,
+            )
+            return (interface, True, None)
+        interface.healthy = True
+    if dampener is not None and dampener.is_suppressed(interface.name):
+        logger.debug(
+            "Route for %s is suppressed by flap dampening (penalty %.0f)",
+            interface.name,
+            dampener.current_penalty(interface.name),
+        )
+        return (interface, True, None)
+
+    if path_stats is not None:
+        weight = path_stats.weight(interface, gateway_ip)
+        if weight != interface.effective_weight:
+            logger.info(
+                "Weight of %s via %s changed from %d to %d",
+                interface.name,
+                gateway_ip,
+                interface.effective_weight,
+                weight,
+            )
+            interface.effective_weight = weight
+    # Update interface's gateway if it changed
+    if interface.gateway != gateway_ip:
+        logger.info(
+            "Gateway for %s changed from %s to %s",
+            interface.name,
+            interface.gateway or "None",
+            gateway_ip,
+        )
+        if interface.gateway is None:
+            interface.route_changes += 1
+        interface.gateway = gateway_ip
+
+    try:
+        routing_client.add_route(interface, gateway_ip)
+    except Exception as e:
+        logger.error("Route add failed for %s: %s", interface.name, str(e))
+        return (interface, False, f"Route add failed: {str(e)}")
+    return (interface, True, None)
+
+
+def _mark_down(interface, dampener=None):
+    """Record that an interface went down, penalising it if it was up"""
+    if interface.healthy and dampener is not None:
+        dampener.record_flap(interface.name)
+    interface.healthy = False
+    interface.passed_checks = 0
+
+
+def handle_link_event(
+    msg, interfaces, routing_client, scheduler, logger, dampener=None
+):
+    """React to an RTM_NEWLINK/RTM_DELLINK event for a monitored interface.
+
+    Runs on the netlink monitor thread. When an interface loses its
+    operational state its route is withdrawn immediately instead of waiting
+    for the next check; when it comes back an immediate check is scheduled.
 
-            try:
-                routing_client.add_route(interface, gateway_ip)
-            except Exception as e:
-                logger.error("Route add failed for %s: %s", interface.name, str(e))
-                return (interface, False, f"Route add failed: {str(e)}")
+    Args:
+        msg: Netlink link message
+        interfaces: Dict of interface name → Interface being monitored
+        routing_client: RouteReconciler in front of the routing backend
+        scheduler: ProbeScheduler used to wake recovered interfaces
+        logger: Logger instance for output
+        dampener: FlapDampener penalising the link loss (optional)
+    """
+    interface = interfaces.get(msg.get_attr("IFLA_IFNAME"))
+    if interface is None:
+        return
+    started = monotonic()
+
+    if msg["event"] == "RTM_DELLINK":
+        link_up = False
+    else:
+        link_up = msg.get_attr("IFLA_OPERSTATE") == "UP"
+
+    with interface.lock:
+        if link_up == interface.link_up:
+            return
+        interface.link_up = link_up
+        interface.link_generation += 1
+
+        if link_up:
+            logger.info("Link up on %s, checking now", interface.name)
         else:
-            # Interface is unhealthy or no gateway found
+            logger.info("Link down on %s", interface.name)
+            _mark_down(interface, dampener)
             if interface.gateway:
                 logger.info(
-                    "Interface %s became unhealthy, removing route via gateway %s",
+                    "Withdrawing route for %s via gateway %s",
                     interface.name,
                     interface.gateway,
                 )
-                routing_client.remove_route(interface)
+                try:
+                    routing_client.remove_route(interface)
+                    routing_client.flush()
+                except Exception:
+                    # Backends report their own route errors, so anything
+                    # raised here is unexpected
+                    logger.exception("Route removal failed for %s", interface.name)
                 interface.gateway = None
+                interface.route_changes += 1
+                FAILURE_TO_WITHDRAWAL.observe(monotonic() - started, interface.name)
 
-        return (interface, True, None)
-    except Exception as e:
-        logger.error("Interface check failed for %s: %s", interface.name, str(e))
-        return (interface, False, str(e))
+    if link_up:
+        scheduler.wake(interface)
+
+
+def handle_neighbour_event(msg, monitor, interfaces, scheduler):
+    """React to an RTM_NEWNEIGH event on a monitored interface.
+
+    Runs on the netlink monitor thread. A down interface whose checks have
+    backed off is checked straight away once a neighbour on it is confirmed
+    reachable, as its gateway may be back.
+
+    Args:
+        msg: Netlink neighbour message
+        monitor: NetlinkMonitor resolving the message's ifindex
+        interfaces: Dict of interface name → Interface being monitored
+        scheduler: ProbeScheduler used to wake backed-off interfaces
+    """
+    if not msg["state"] & NUD_CONFIRMED:
+        return
+    interface = interfaces.get(monitor.ifname(msg["ifindex"]))
+    if interface is None or interface.healthy is not False:
+        return
+    # Interfaces checked at their normal interval are left alone, so
+    # neighbour churn never adds checks
+    scheduler.hasten(interface, interface.check_interval)
+
+
+class CheckCycle:
+    """Interface checks dispatched together by one scheduler batch.
+
+    Route changes made by the checks are queued in the routing client and
+    flushed once the last check of the cycle has finished, so the whole
+    cycle reaches the routing backend as one batch.
+    """
+
+    def __init__(self, size: int, routing_client, logger, first_route=None):
+        self._remaining = size
+        self._routing_client = routing_client
+        self._logger = logger
+        self._first_route = first_route  # Event set once a route is installed
+        self._lock = threading.Lock()
+        self._started = monotonic()
+
+    def check_done(self):
+        """Record a finished check, flushing route changes after the last one"""
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining:
+                return
+        try:
+            self._routing_client.flush()
+        except Exception:
+            self._logger.exception("Route flush failed")
+        CYCLE_DURATION.observe(monotonic() - self._started)
+        if (
+            self._first_route is not None
+            and not self._first_route.is_set()
+            and self._routing_client.backend.installed_routes
+        ):
+            self._first_route.set()
+            elapsed = _seconds_since_start()
+            FIRST_ROUTE.set(round(elapsed, 3))
+            self._logger.info(
+                "First route installed %.0fms after start", elapsed * 1000
+            )
+
+
+def run_interface_check(
+    interface,
+    routing_client,
+    scheduler,
+    logger,
+    prober,
+    config,
+    neighbour_cache,
+    cycle,
+    dampener=None,
+    ranker=None,
+):
+    """Run one interface check on a worker and schedule the next one.
+
+    Args:
+        interface: Interface object to check
+        routing_client: RouteReconciler in front of the routing backend
+        scheduler: ProbeScheduler the interface is rescheduled on
+        logger: Logger instance for output
+        prober: Probe backend used for the TCP SYN checks
+        config: Config holding the neighbour probing options
+        neighbour_cache: NeighbourCache shared by all checks (or None)
+        cycle: CheckCycle the check belongs to
+        dampener: FlapDampener shared by all checks (or None)
+        ranker: GatewayRanker shared by all checks (or None)
+    """
+    try:
+        _, success, error_msg = check_and_process_interface(
+            interface,
+            routing_client,
+            logger,
+            prober,
+            config,
+            neighbour_cache,
+            dampener,
+            ranker,
+        )
+        if not success and error_msg:
+            logger.debug(
+                "Interface %s check completed with issues: %s",
+                interface.name,
+                error_msg,
+            )
+    except Exception:
+        logger.exception("Unexpected error processing interface %s", interface.name)
+    finally:
+        cycle.check_done()
+        scheduler.schedule(interface)
+
+
+def _seconds_since_start() -> float:
+    """Seconds since this process was started, interpreter startup included"""
+    with open("/proc/self/stat") as f:
+        started = int(f.read().rsplit(")", 1)[1].split()[19])
+    with open("/proc/uptime") as f:
+        uptime = float(f.read().split()[0])
+    return max(uptime - started / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+# File descriptors kept free for netlink, metrics, logging and vtysh pipes
+SPARE_FILE_DESCRIPTORS = 256
+
+
+def _raise_open_file_limit(interface_count: int, logger):
+    """Raise the soft open file limit to fit one probe socket per interface.
+
+    The default soft limit of 1024 is too low for the native prober on hosts
+    with hundreds of VLAN or PPPoE uplinks; the hard limit is left alone.
+    """
+    wanted = interface_count + SPARE_FILE_DESCRIPTORS
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= wanted:
+        return
+    limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    except (ValueError, OSError) as e:
+        logger.warning("Failed to raise the open file limit: %s", e)
+        return
+    if limit < wanted:
+        logger.warning(
+            "Open file limit %d is low for %d interfaces, raise it to at least %d",
+            limit,
+            interface_count,
+            wanted,
+        )
+    else:
+        logger.debug("Raised the open file limit from %d to %d", soft, limit)
 
 
 def main_loop() -> None:
@@ -82,19 +465,22 @@ def main_loop() -> None:
 
     Responsibilities:
     - Loads routing configuration from config.toml
-    - Initializes routing client connection (FRRouting or Linux kernel)
+    - Initializes routing client connection (FRRouting, Linux kernel or
+      kernel nexthop groups)
     - Continuously monitors interface health using parallel execution:
-      - Performs TCP connectivity checks concurrently for all interfaces
+      - Performs TCP connectivity checks concurrently for all due interfaces
       - Maintains ECMP routes via configured routing backend
       - Adjusts routes based on interface status changes
-    - Handles graceful shutdown on interrupt signals
+    - Withdraws routes as soon as netlink reports an interface going down
+    - Reloads the configuration on SIGHUP, applying only what changed
+    - Handles graceful shutdown on SIGINT and SIGTERM
 
-    The loop runs indefinitely with sleep intervals determined by the
-    smallest check_interval from all configured interfaces.
+    Each interface is checked on its own check_interval by a deadline
+    scheduler, with jitter applied so probes are spread out over time.
 
     Note:
-        Interface checks are executed in parallel using ThreadPoolExecutor to
-        minimize total check time and improve failure detection speed.
+        Checks run on a long-lived pool of max_workers threads, so due
+        interfaces are checked in parallel without spawning threads per cycle.
 
     Raises:
         SystemExit: On unrecoverable configuration or routing errors
@@ -110,18 +496,37 @@ def main_loop() -> None:
     logger = logging.getLogger(__name__)
     logger.info("Starting ECMP Manager daemon")
 
-    # Initialize the appropriate routing client based on configuration
+    # Initialize the appropriate routing client based on configuration. The
+    # kernel backends are imported only when chosen, as they load pyroute2's
+    # netlink message definitions
     try:
         if config.routing_backend == "kernel":
+            from kernel import KernelRoutingClient
+
             logger.info("Using Linux kernel routing backend")
-            routing_client = KernelRoutingClient()
+            backend = KernelRoutingClient(
+                config.kernel_route_mode,
+                config.multipath_metric,
+                config.route_protocol,
+            )
+        elif config.routing_backend == "nexthop":
+            from nexthop import NexthopRoutingClient
+
+            logger.info("Using Linux kernel nexthop group backend")
+            backend = NexthopRoutingClient(
+                config.nexthop_group_id,
+                config.route_prefixes,
+                config.route_tables,
+                config.multipath_metric,
+                config.route_protocol,
+            )
         else:  # frr
             logger.info("Using FRRouting backend")
-            routing_client = FRRClient()
-    except RuntimeError as e:
+            backend = FRRClient(config.route_protocol)
+    except (ImportError, RuntimeError) as e:
         logger.critical(
             "%s service unavailable: %s",
-            "Kernel routing" if config.routing_backend == "kernel" else "FRRouting",
+            "FRRouting" if config.routing_backend == "frr" else "Kernel routing",
             e,
         )
         if config.routing_backend == "frr":
@@ -132,43 +537,241 @@ def main_loop() -> None:
             )
         sys.exit(1)
 
+    # Clear the NAT state of flows pinned to an uplink once it is withdrawn
+    conntrack = None
+    if config.conntrack_flush:
+        try:
+            conntrack = ConntrackFlusher()
+            logger.info("Flushing conntrack entries of withdrawn interfaces")
+        except RuntimeError as e:
+            logger.warning("Conntrack flushing disabled: %s", e)
+
+    # Only pass real route changes on to the backend
+    routing_client = RouteReconciler(
+        backend, config.reconcile_interval, config.state_file, conntrack
+    )
+
+    # Keep the neighbour table in memory instead of forking `ip neigh`, and
+    # follow the links [interface.auto] applies to as they come and go
+    discovery = LinkDiscovery()
+    try:
+        monitor = NetlinkMonitor()
+        neighbour_cache = NeighbourCache(monitor)
+        discovery.follow(monitor)
+        monitor.start()
+        logger.info("Neighbour table cached from netlink")
+    except RuntimeError as e:
+        logger.warning("Netlink monitor unavailable, using 'ip neigh': %s", e)
+        neighbour_cache = None
+        discovery.scan()
+        if config.auto_interfaces is not None and config.auto_interfaces.kinds:
+            logger.warning(
+                "Link kinds are unknown without netlink, [interface.auto] kinds "
+                "match no link"
+            )
+    discovery.take_changed()
+
+    auto = config.auto_interfaces
+    if auto is not None:
+        for name in auto.select(discovery.links(), {i.name for i in config.interfaces}):
+            config.interfaces.append(auto.create(name))
+        logger.info(
+            "Monitoring %d interface(s), %d of them discovered automatically",
+            len(config.interfaces),
+            sum(i.automatic for i in config.interfaces),
+        )
+        if not config.interfaces:
+            logger.warning("No interfaces match [interface.auto] yet")
+    _raise_open_file_limit(len(config.interfaces), logger)
+
+    weight_scale = 1
+    if config.dynamic_weights:
+        # Scale weights up so a reduced weight keeps some resolution. The
+        # auto template counts too, as its interfaces may appear later
+        weights = [i.weight for i in config.interfaces]
+        if auto is not None:
+            weights.append(auto.options.get("weight", 1))
+        weight_scale = MAX_WEIGHT // max(weights)
+        for interface in config.interfaces:
+            interface.effective_weight = interface.weight * weight_scale
+
+    # Keep serving the routes a previous run installed while they are
+    # re-checked, and probe each interface's last known gateway first
+    last_known = routing_client.load_state()
+    adopted = routing_client.adopt(config.interfaces)
+    for interface in config.interfaces:
+        interface.gateway = adopted.get(interface.name) or last_known.get(
+            interface.name
+        )
+        if interface.name in adopted:
+            # Adopted routes are up, so they need the fall threshold to go
+            interface.healthy = interface.last_check_passed = True
+    # Set once the first check installs a route, to report startup time
+    first_route = threading.Event()
+    if adopted:
+        logger.info("Adopted %d existing route(s) at startup", len(adopted))
+        first_route.set()
+
+    path_stats = PathStats(
+        config.stats_window,
+        config.rtt_tolerance_ms,
+        config.degraded_loss,
+        config.degraded_rtt_ms,
+        weight_scale,
+    )
+    try:
+        prober = create_prober(config.probe_backend, path_stats)
+    except RuntimeError as e:
+        logger.critical(
+            "%s health check prober unavailable: %s", config.probe_backend, e
+        )
+        sys.exit(1)
+    logger.info("Using %s health check prober", prober.name)
+
+    dampener = None
+    if config.dampening_half_life:
+        dampener = FlapDampener(
+            config.dampening_half_life,
+            config.dampening_penalty,
+            config.dampening_suppress_limit,
+            config.dampening_reuse_limit,
+            config.dampening_max_suppress,
+        )
+        logger.info(
+            "Flap dampening enabled with a %gs half-life", config.dampening_half_life
+        )
+
+    # Probe the neighbours most likely to be routers first
+    ranker = GatewayRanker(neighbour_cache)
+
+    scheduler = ProbeScheduler(jitter=config.jitter)
+    for interface in config.interfaces:
+        scheduler.add(interface)
+    # Links changed while the scheduler waits are handled right away
+    discovery.on_change = scheduler.interrupt
+
+    # Monitored interfaces by name, kept up to date across reloads
+    interfaces = {interface.name: interface for interface in config.interfaces}
+
+    # Withdraw routes on carrier loss without waiting for the next check
+    if neighbour_cache is not None:
+        link_handler = functools.partial(
+            handle_link_event,
+            interfaces=interfaces,
+            routing_client=routing_client,
+            scheduler=scheduler,
+            logger=logger,
+            dampener=dampener,
+        )
+        if config.routing_backend in ("kernel", "nexthop"):
+            # Invalidate cached ifindexes before the link handler uses them
+            monitor.subscribe("RTM_NEWLINK", backend.handle_link_event)
+            monitor.subscribe("RTM_DELLINK", backend.handle_link_event)
+        monitor.subscribe("RTM_NEWLINK", link_handler)
+        monitor.subscribe("RTM_DELLINK", link_handler)
+        # Cut the backoff of down interfaces short when a neighbour answers
+        monitor.subscribe(
+            "RTM_NEWNEIGH",
+            functools.partial(
+                handle_neighbour_event,
+                monitor=monitor,
+                interfaces=interfaces,
+                scheduler=scheduler,
+            ),
+        )
+
+    if config.metrics_listen:
+        host, port = config.metrics_listen
+        REGISTRY.add_collector(
+            interface_collector(config.interfaces, path_stats, dampener)
+        )
+        try:
+            start_http_server(host, port)
+            logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        except OSError as e:
+            logger.error("Failed to start metrics endpoint on %s:%d: %s", host, port, e)
+
+    engine = ProbeEngine(config.worker_count())
+    logger.info("Checking interfaces with up to %d worker(s)", engine.max_workers)
+
+    reloader = ConfigReloader(
+        config,
+        interfaces,
+        scheduler,
+        routing_client,
+        weight_scale,
+        path_stats,
+        dampener,
+        discovery,
+        ranker,
+        engine,
+        prober,
+    )
+    signal.signal(signal.SIGHUP, reloader.request)
+
+    def request_stop(*_):
+        logger.info("Received termination signal")
+        scheduler.stop()
+
+    # Without a handler, SIGTERM is ignored when running as a container's
+    # PID 1, and otherwise kills the daemon without cleaning up
+    signal.signal(signal.SIGTERM, request_stop)
+
     try:
         while True:
-            # Use ThreadPoolExecutor to check all interfaces in parallel
-            with ThreadPoolExecutor(max_workers=len(config.interfaces)) as executor:
-                # Submit all interface checks
-                future_to_interface = {
-                    executor.submit(
-                        check_and_process_interface, interface, routing_client, logger
-                    ): interface
-                    for interface in config.interfaces
-                }
-
-                # Process results as they complete
-                for future in as_completed(future_to_interface):
-                    interface = future_to_interface[future]
-                    try:
-                        interface_obj, success, error_msg = future.result()
-                        if not success and error_msg:
-                            logger.debug(
-                                "Interface %s check completed with issues: %s",
-                                interface.name,
-                                error_msg,
-                            )
-                    except Exception as e:
-                        logger.error(
-                            "Unexpected error processing interface %s: %s",
-                            interface.name,
-                            str(e),
-                            exc_info=True,
-                        )
-
-            sleep(config.min_check_interval)
+            # Reloads and link changes are applied here, between batches,
+            # never in the signal handler or on the netlink thread
+            count = len(config.interfaces)
+            reloader.reload_if_requested()
+            if discovery.take_changed():
+                reloader.sync_links()
+            if len(config.interfaces) > count:
+                _raise_open_file_limit(len(config.interfaces), logger)
+            due = scheduler.pop_due()
+            if not due:
+                if scheduler.stopped:
+                    break
+                continue
+            SCHEDULER_LAG.observe(scheduler.last_lag)
+            if scheduler.last_lag > 1:
+                logger.warning(
+                    "Interface checks running %.1fs behind schedule",
+                    scheduler.last_lag,
+                )
+
+            # Hand due interfaces to the long-lived worker pool
+            cycle = CheckCycle(len(due), routing_client, logger, first_route)
+            for interface in due:
+                engine.submit(
+                    run_interface_check,
+                    interface,
+                    routing_client,
+                    scheduler,
+                    logger,
+                    prober,
+                    config,
+                    neighbour_cache,
+                    cycle,
+                    dampener,
+                    ranker,
+                )
     except KeyboardInterrupt:
         logger.info("Received shutdown signal")
     except Exception as e:
         logger.critical("Fatal error: %s", str(e), exc_info=True)
         raise
+    finally:
+        scheduler.stop()
+        # Lets running checks finish before their prober goes away
+        engine.shutdown()
+        prober.close()
+        if conntrack is not None:
+            conntrack.close()
+        avoided = sum(i.avoided_route_changes for i in config.interfaces)
+        if avoided:
+            logger.info(
+                "Hysteresis and flap dampening avoided %d route change(s)", avoided
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+Route flap dampening for monitored interfaces.
+
+This module keeps a flap penalty per interface, in the style of BGP route flap
+dampening (RFC 2439), that:
+- Adds a fixed penalty every time an interface goes from healthy to unhealthy
+- Decays the penalty exponentially with a configurable half-life
+- Suppresses the interface's route once the penalty passes the suppress limit,
+  and allows it back only after the penalty has decayed below the reuse limit
+
+The penalty is capped so that an interface is never suppressed for longer
+than max_suppress seconds after its last flap.
+"""
+
+import logging
+import math
+import threading
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+class FlapDampener:
+    """Exponentially decaying flap penalty per interface.
+
+    Attributes:
+        half_life: float - Seconds for a penalty to decay to half its value
+        penalty: float - Penalty added for each flap
+        suppress_limit: float - Penalty at which an interface is suppressed
+        reuse_limit: float - Penalty below which it is allowed back
+        max_penalty: float - Ceiling of the penalty, derived from max_suppress
+    """
+
+    def __init__(
+        self,
+        half_life: float = 60,
+        penalty: float = 1000,
+        suppress_limit: float = 2000,
+        reuse_limit: float = 750,
+        max_suppress: float | None = None,
+    ):
+        if max_suppress is None:
+            max_suppress = 4 * half_life
+        self.half_life = half_life
+        self.penalty = penalty
+        self.suppress_limit = suppress_limit
+        self.reuse_limit = reuse_limit
+        self.max_penalty = reuse_limit * 2 ** (max_suppress / half_life)
+        self._state = {}  # Interface name → [penalty, updated_at, suppressed]
+        self._lock = threading.Lock()
+
+    def _current(self, name: str) -> list:
+        """Penalty state of an interface, decayed to the current time"""
+        now = monotonic()
+        state = self._state.get(name)
+        if state is None:
+            state = self._state[name] = [0.0, now, False]
+        else:
+            state[0] *= 0.5 ** ((now - state[1]) / self.half_life)
+            state[1] = now
+        return state
+
+    def record_flap(self, name: str):
+        """Add the flap penalty of an interface that just became unhealthy"""
+        with self._lock:
+            state = self._current(name)
+            state[0] = min(self.max_penalty, state[0] + self.penalty)
+            if state[2] or state[0] < self.suppress_limit:
+                logger.debug("Flap penalty of %s is now %.0f", name, state[0])
+                return
+            state[2] = True
+            logger.warning(
+                "Interface %s is flapping (penalty %.0f), suppressing its route "
+                "for at least %.0fs",
+                name,
+                state[0],
+                self.half_life * math.log2(state[0] / self.reuse_limit),
+            )
+
+    def is_suppressed(self, name: str) -> bool:
+        """Whether the route of an interface is currently suppressed"""
+        with self._lock:
+            state = self._current(name)
+            if state[2] and state[0] < self.reuse_limit:
+                state[2] = False
+                logger.info(
+                    "Interface %s is stable again (penalty %.0f), "
+                    "no longer suppressing its route",
+                    name,
+                    state[0],
+                )
+            return state[2]
+
+    def current_penalty(self, name: str) -> float:
+        """Flap penalty of an interface, decayed to the current time"""
+        with self._lock:
+            return self._current(name)[0]
+
+    def forget(self, name: str):
+        """Drop the penalty of an interface that is no longer monitored"""
+        with self._lock:
+            self._state.pop(name, None)
@@ -0,0 +1,103 @@
+"""
+Link discovery for automatically monitored interfaces.
+
+This module keeps the set of links present on the system, with their kind,
+for [interface.auto]:
+- Filled from the netlink monitor's link dump at startup and after a resync
+- Kept current from RTM_NEWLINK and RTM_DELLINK events, so links that appear
+  or vanish later (PPPoE, LTE, VLANs) are seen at once without rescanning
+- Falls back to a one-time listing of /sys/class/net without netlink, in
+  which case link kinds are unknown
+
+Whenever the set of links changes, a callback wakes the daemon's main loop,
+which applies the [interface.auto] filters and starts or stops probing the
+affected interfaces.
+"""
+
+import logging
+import threading
+
+from config.interfaces import AutoInterfaces, get_system_interfaces
+
+logger = logging.getLogger(__name__)
+
+
+class LinkDiscovery:
+    """Live name → kind map of the system's links.
+
+    Attributes:
+        on_change: Callable run on the netlink thread after the links change
+    """
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self._links = {}  # ifindex → (name, kind)
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+
+    def follow(self, monitor):
+        """Track links through a NetlinkMonitor that has not started yet"""
+        monitor.on_resync(self._load)
+        monitor.subscribe("RTM_NEWLINK", self._update)
+        monitor.subscribe("RTM_DELLINK", self._update)
+
+    def scan(self):
+        """Load link names once from /sys/class/net, with unknown kinds"""
+        links = {-i: (name, None) for i, name in enumerate(get_system_interfaces())}
+        with self._lock:
+            self._links = links
+        self._notify()
+
+    def links(self) -> dict:
+        """Interface name → kind of every link present"""
+        with self._lock:
+            return dict(self._links.values())
+
+    def take_changed(self) -> bool:
+        """Whether the links changed since the last call"""
+        if not self._changed.is_set():
+            return False
+        self._changed.clear()
+        return True
+
+    @staticmethod
+    def _kind(msg) -> str:
+        kind = msg.get_nested("IFLA_LINKINFO", "IFLA_INFO_KIND")
+        return kind or AutoInterfaces.DEVICE_KIND
+
+    def _load(self, ipr):
+        links = {
+            msg["index"]: (msg.get_attr("IFLA_IFNAME"), self._kind(msg))
+            for msg in ipr.get_links()
+        }
+        with self._lock:
+            changed = links != self._links
+            self._links = links
+        if changed:
+            self._notify()
+
+    def _update(self, msg):
+        index = msg["index"]
+        if msg["event"] == "RTM_DELLINK":
+            link = None
+        else:
+            link = (msg.get_attr("IFLA_IFNAME"), self._kind(msg))
+        with self._lock:
+            old = self._links.get(index)
+            # Most RTM_NEWLINK events are state changes of a known link
+            if old == link:
+                return
+            if link is None:
+                del self._links[index]
+            else:
+                self._links[index] = link
+        if old is not None:
+            logger.debug("Link %s (%s) vanished", *old)
+        if link is not None:
+            logger.debug("Link %s (%s) appeared", *link)
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        if self.on_change is not None:
+            self.on_change()
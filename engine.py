@@ -0,0 +1,99 @@
+"""
+Long-lived worker engine for interface checks.
+
+This module provides a bounded pool of worker threads that:
+- Lives for the whole life of the daemon instead of being rebuilt every cycle
+- Caps the number of concurrent interface checks at a configurable limit,
+  which can be raised or lowered while it runs
+- Exports its queue depth and how long submitted work waits before it
+  starts as metrics
+"""
+
+import itertools
+import logging
+import queue
+import threading
+from time import monotonic
+
+from metrics import ENGINE_QUEUE_DEPTH, ENGINE_START_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeEngine:
+    """Bounded worker pool running interface check work items.
+
+    Attributes:
+        max_workers: int - Number of worker threads (concurrency limit)
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._queue = queue.SimpleQueue()
+        self._workers = []
+        self._worker_ids = itertools.count()
+        for _ in range(max_workers):
+            self._start_worker()
+        logger.debug("Started probe engine with %d worker(s)", max_workers)
+
+    def _start_worker(self):
+        worker = threading.Thread(
+            target=self._run,
+            name=f"probe-worker-{next(self._worker_ids)}",
+            daemon=True,
+        )
+        worker.start()
+        self._workers.append(worker)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) to run on the next free worker"""
+        self._queue.put((monotonic(), fn, args))
+        ENGINE_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def resize(self, max_workers: int):
+        """Change the number of workers. Surplus workers exit once the work
+        queued before the resize has been picked up"""
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        for _ in range(max_workers - self.max_workers):
+            self._start_worker()
+        for _ in range(self.max_workers - max_workers):
+            self._queue.put(None)
+        logger.debug(
+            "Resized probe engine from %d to %d worker(s)",
+            self.max_workers,
+            max_workers,
+        )
+        self.max_workers = max_workers
+
+    def shutdown(self):
+        """Stop all workers once their running work has finished, dropping
+        the work still queued"""
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        ENGINE_QUEUE_DEPTH.set(0)
+        # One each, as the sentinels of workers retired by resize() may
+        # have been dropped with the queue
+        for worker in self._workers:
+            if worker.is_alive():
+                self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        logger.debug("Probe engine stopped")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            enqueued_at, fn, args = item
+            ENGINE_QUEUE_DEPTH.set(self._queue.qsize())
+            ENGINE_START_WAIT.observe(monotonic() - enqueued_at)
+            try:
+                fn(*args)
+            except Exception:
+                # A failing work item must not take its worker down
+                logger.exception("Unhandled error in probe worker")
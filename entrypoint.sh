@@ -1,4 +1,5 @@
 #!/bin/bash
 source /usr/lib/frr/frrcommon.sh
 /usr/lib/frr/watchfrr $(daemon_list) &
-/usr/bin/python3 -u daemon.py
+# exec so the daemon receives SIGHUP (reload) and SIGTERM directly
+exec /usr/bin/python3 -u daemon.py
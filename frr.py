@@ -7,18 +7,29 @@ This module provides a client interface to the FRRouting daemon for:
 - Validating connection to the FRR service
 
 Commands are executed through the vtysh shell interface to make route changes
-persistent within the FRR routing daemon.
+persistent within the FRR routing daemon. Route changes are queued and applied
+together in a single vtysh session when the daemon flushes the client at the
+end of each check cycle, and routes FRR already holds are not sent again.
+Routes can carry a route tag so that a restarted daemon can recognise and
+adopt the routes an earlier run configured.
 """
 
+import json
 import logging
 import subprocess
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class FRRClient:
-    def __init__(self):
+    name = "frr"
+
+    def __init__(self, tag: int | None = None):
+        self.tag = tag  # Route tag marking the static routes we own
         self.installed_routes = {}  # Interface → (gateway_ip, metric)
+        self._lock = threading.Lock()
+        self._pending = []  # Queued (action, interface name, (gateway_ip, metric))
         if not self.check_frr_running():
             raise RuntimeError("Failed to connect to FRRouting service")
 
@@ -51,47 +62,180 @@ class FRRClient:
             )
             raise
 
-    def add_route(self, interface, gateway_ip: str):
-        """Add or update route, removing old route if gateway changed"""
-        logger.debug(
-            "Attempting to add route for %s (GW: %s, Metric: %s)",
-            interface.name,
-            gateway_ip,
-            interface.metric,
+    def _query_vty_command(self, command) -> str:
+        """Run a vtysh show command and return its output"""
+        logger.debug("Executing FRR command: %r", command)
+        result = subprocess.run(
+            ["vtysh", "-c", command],
+            check=True,
+            capture_output=True,
+            text=True,
         )
+        return result.stdout
 
-        # Check if route exists with different gateway
-        existing_route = self.installed_routes.get(interface.name)
-        if existing_route:
-            existing_gateway, existing_metric = existing_route
-            if existing_gateway != gateway_ip:
+    def add_route(self, interface, gateway_ip: str):
+        """Queue a route add or update, removing old route if gateway changed"""
+        route = (gateway_ip, interface.metric)
+        with self._lock:
+            existing_route = self.installed_routes.get(interface.name)
+            if existing_route == route:
+                # FRR keeps static routes configured, nothing to resend
+                return
+
+            logger.debug(
+                "Attempting to add route for %s (GW: %s, Metric: %s)",
+                interface.name,
+                gateway_ip,
+                interface.metric,
+            )
+            # Add the new route before removing the old one so the prefix
+            # is never left without a route
+            self._pending.append(("add", interface.name, route))
+            if existing_route:
                 logger.info(
                     "Gateway changed for %s from %s to %s, updating route",
                     interface.name,
-                    existing_gateway,
+                    existing_route[0],
                     gateway_ip,
                 )
-                # Remove old route first
-                self._execute_vty_command(
-                    f"configure terminal\nno ip route 0.0.0.0/0 {existing_gateway} {existing_metric}"
-                )
-
-        # Add new route
-        self._execute_vty_command(
-            f"configure terminal\nip route 0.0.0.0/0 {gateway_ip} {interface.metric}"
-        )
-        self.installed_routes[interface.name] = (gateway_ip, interface.metric)
-        logger.debug("Route successfully added for %s", interface.name)
+                self._pending.append(("del", interface.name, existing_route))
+            self.installed_routes[interface.name] = route
 
     def remove_route(self, interface):
         """Only remove routes we actually added"""
-        route_info = self.installed_routes.pop(interface.name, None)
-        if not route_info:
-            logger.debug("No route present for %s", interface.name)
-            return
-
-        gateway_ip, metric = route_info
-        self._execute_vty_command(
-            f"configure terminal\nno ip route 0.0.0.0/0 {gateway_ip} {metric}"
-        )
-        logger.debug("Route successfully removed for %s", interface.name)
+        with self._lock:
+            route_info = self.installed_routes.pop(interface.name, None)
+            if not route_info:
+                logger.debug("No route present for %s", interface.name)
+                return
+
+            self._pending.append(("del", interface.name, route_info))
+
+    def forget(self, name: str):
+        """Stop tracking a route so the next add_route installs it again"""
+        with self._lock:
+            self.installed_routes.pop(name, None)
+
+    def adopt(self, interfaces) -> dict:
+        """Take over tagged static default routes a previous run configured.
+
+        Routes whose nexthop resolves to a configured interface and whose
+        distance matches its metric are tracked as installed; other routes
+        with our tag are removed. Without a tag nothing can be told apart
+        from the operator's own routes, so nothing is adopted.
+
+        Returns:
+            dict: Interface name → gateway IP of each adopted route
+        """
+        if self.tag is None:
+            return {}
+        configured = {interface.name: interface for interface in interfaces}
+        adopted = {}
+        with self._lock:
+            for route, nexthop in self._static_default_routes():
+                if route.get("tag") != self.tag:
+                    continue
+                gateway_ip = nexthop.get("ip")
+                distance = route.get("distance")
+                interface = configured.get(nexthop.get("interfaceName"))
+                if (
+                    interface is not None
+                    and interface.metric == distance
+                    and interface.name not in adopted
+                ):
+                    adopted[interface.name] = gateway_ip
+                    self.installed_routes[interface.name] = (gateway_ip, distance)
+                    logger.info(
+                        "Adopted existing route for %s via %s",
+                        interface.name,
+                        gateway_ip,
+                    )
+                elif nexthop.get("interfaceName"):
+                    logger.info(
+                        "Removing stale route via %s (distance %s)",
+                        gateway_ip,
+                        distance,
+                    )
+                    self._pending.append(("del", "stale route", (gateway_ip, distance)))
+        self.flush()
+        return adopted
+
+    def _route_command(self, action, route) -> str:
+        """vtysh command adding or removing one of our default routes"""
+        gateway_ip, metric = route
+        command = f"ip route 0.0.0.0/0 {gateway_ip} {metric}"
+        if self.tag is not None:
+            command += f" tag {self.tag}"
+        return command if action == "add" else "no " + command
+
+    def _static_default_routes(self):
+        """(route, nexthop) pairs of the static default routes in FRR's RIB"""
+        routes = json.loads(self._query_vty_command("show ip route static json"))
+        return [
+            (route, nexthop)
+            for route in routes.get("0.0.0.0/0", [])
+            if route.get("protocol") == "static"
+            for nexthop in route.get("nexthops", [])
+        ]
+
+    def actual_routes(self) -> dict:
+        """Gateways of the static default routes in FRR's RIB, per interface.
+
+        Returns:
+            dict: Interface name → set of (gateway IP, metric) routes, in the
+                  form of installed_routes
+        """
+        gateways = {
+            (nexthop.get("ip"), route.get("distance"))
+            for route, nexthop in self._static_default_routes()
+        }
+        with self._lock:
+            return {
+                name: {route}
+                for name, route in self.installed_routes.items()
+                if route in gateways
+            }
+
+    def flush(self):
+        """Apply every queued route change in one vtysh session.
+
+        vtysh carries on past a failing command and only fails at the end,
+        so after a failed session the routes in FRR are read back once:
+        changes already in place are done, and only the others are replayed
+        one at a time so the failing ones can be logged and their routes
+        dropped from tracking.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            commands = "\n".join(
+                self._route_command(action, route) for action, _, route in pending
+            )
+            try:
+                self._execute_vty_command(f"configure terminal\n{commands}")
+                logger.debug("Applied %d route change(s) via vtysh", len(pending))
+                return
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                logger.debug("vtysh batch failed, checking what was applied: %s", e)
+
+            try:
+                present = {
+                    (nexthop.get("ip"), route.get("distance"))
+                    for route, nexthop in self._static_default_routes()
+                }
+            except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+                logger.debug("Failed to read FRR routes, replaying all: %s", e)
+                present = None
+
+            for action, name, route in pending:
+                if present is not None and (route in present) == (action == "add"):
+                    continue
+                command = self._route_command(action, route)
+                try:
+                    self._execute_vty_command(f"configure terminal\n{command}")
+                except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                    logger.error("Failed to apply %r for %s: %s", command, name, e)
+                    if action == "add" and self.installed_routes.get(name) == route:
+                        del self.installed_routes[name]
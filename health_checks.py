@@ -2,29 +2,57 @@
 Network interface health checking functionality.
 
 This module provides utilities for checking interface connectivity and health by:
-- Detecting gateway IP and MAC addresses from system neighbour tables
+- Detecting gateway IP and MAC addresses from system neighbour tables, read
+  from the netlink neighbour cache when available or from `ip neigh`, and
+  optionally ranked so likely routers are probed first
 - Performing TCP connectivity checks to verify end-to-end connectivity
 - Validating interface operational status
 
-The health check implementation uses scapy to send targeted TCP SYN packets
-through specific interfaces and gateways to verify route viability.
+The health check implementation sends targeted TCP SYN packets through
+specific interfaces and gateways to verify route viability, using one of the
+probe backends from the prober module (native raw sockets or scapy).
 """
 
 import json
 import logging
 import os
-import random
 import subprocess
+import threading
 from typing import Optional
 import ipaddress
-import scapy.all as scapy
-from scapy.error import Scapy_Exception
+from prober import create_prober
+from metrics import NEIGHBOURS_TESTED
 
 logger = logging.getLogger(__name__)
 
+_default_prober = None
+_default_prober_lock = threading.Lock()
+
+
+def get_default_prober():
+    """Return a shared native prober for callers that do not supply one"""
+    global _default_prober
+    with _default_prober_lock:
+        if _default_prober is None:
+            _default_prober = create_prober("native")
+        return _default_prober
+
+
+def get_all_neighbours(interface, neighbour_cache=None) -> list[tuple[str, str]]:
+    """Get all IPv4 neighbours (IP, MAC) from the neighbour table.
+
+    Reads the netlink-backed neighbour cache when one is supplied, otherwise
+    falls back to running the ip command.
+    """
+    if neighbour_cache is not None:
+        neighbours = [(n.ip, n.mac) for n in neighbour_cache.get(interface.name)]
+        logger.debug(
+            "Found %d IPv4 neighbour(s) on %s in cache",
+            len(neighbours),
+            interface.name,
+        )
+        return neighbours
 
-def get_all_neighbours(interface) -> list[tuple[str, str]]:
-    """Get all IPv4 neighbours (IP, MAC) from neighbour table using ip command"""
     logger.debug("Querying neighbour table for interface %s", interface.name)
     try:
         result = subprocess.run(
@@ -73,64 +101,65 @@ def test_connectivity_via_neighbour(
     interface,
     neighbour_ip: str,
     dest_mac: str,
-    check_ip: str,
-    check_port: int = 80,
-    timeout: int = 1,
+    targets: list[tuple[str, int]],
+    timeout: float = 1,
+    prober=None,
+    quorum: int = 1,
 ) -> bool:
-    """Test connectivity through a specific neighbour by sending a TCP SYN packet"""
+    """Test connectivity through a specific neighbour by sending a TCP SYN
+    packet to every target at once, passing when quorum targets answer"""
     logger.debug(
-        "Testing connectivity via neighbour %s (MAC: %s) on %s to %s:%d",
+        "Testing connectivity via neighbour %s (MAC: %s) on %s to %s",
         neighbour_ip,
         dest_mac,
         interface.name,
-        check_ip,
-        check_port,
+        _format_targets(targets),
     )
-    try:
-        syn_packet = (
-            scapy.Ether(dst=dest_mac)
-            / scapy.IP(dst=check_ip)
-            / scapy.TCP(sport=random.randint(1024, 65535), dport=check_port, flags="S")
-        )
-        response = scapy.srp1(
-            syn_packet, timeout=timeout, verbose=0, iface=interface.name, nofilter=True
-        )
-
-        if response:
-            logger.debug("TCP response flags: %#04x", int(response[scapy.TCP].flags))
-            # Check for SYN-ACK (flags = 0x12)
-            if (
-                response.haslayer(scapy.TCP)
-                and response[scapy.TCP].flags & 0x12 == 0x12
-            ):
-                logger.info(
-                    "Neighbour %s on %s successfully passed connectivity test",
-                    neighbour_ip,
-                    interface.name,
-                )
-                return True
-        else:
-            logger.debug("No TCP response received from neighbour %s", neighbour_ip)
-        return False
+    if prober is None:
+        prober = get_default_prober()
 
-    except (Scapy_Exception, AttributeError, IndexError) as e:
-        logger.debug(
-            "Connectivity test failed via neighbour %s: %s",
+    if prober.probe_targets(
+        interface, neighbour_ip, dest_mac, targets, timeout, quorum
+    ):
+        logger.info(
+            "Neighbour %s on %s successfully passed connectivity test",
             neighbour_ip,
-            str(e),
-            exc_info=True,
+            interface.name,
         )
-        return False
+        return True
+    return False
 
 
 def is_interface_healthy(
-    interface, check_ip: str = None, check_port: int = 80, timeout: int = 1
+    interface,
+    check_ip: str | None = None,
+    check_port: int = 80,
+    timeout: float = 1,
+    prober=None,
+    neighbour_cache=None,
+    concurrent: bool = False,
+    wave_size: int = 0,
+    head_start: float = 0.1,
+    targets: list[tuple[str, int]] | None = None,
+    quorum: int = 1,
+    ranker=None,
 ) -> tuple[bool, Optional[str]]:
     """
     Test interface health by attempting connectivity through each neighbour.
 
     Returns the first gateway that successfully passes the connectivity test.
     If the interface already has a gateway assigned, test that gateway first.
+
+    A neighbour passes when quorum of the (ip, port) targets answer; all
+    targets are probed at once. Without targets, check_ip and check_port
+    form the only target.
+
+    With concurrent set, neighbours are probed in waves of wave_size (all at
+    once when 0) and the first SYN-ACK wins; the existing gateway is probed
+    head_start seconds ahead of the others so it is kept while it works.
+
+    With a GatewayRanker, neighbours are probed in its order, and those
+    sharing a MAC address with a better candidate are skipped.
     """
     # Check interface state first
     if not os.path.exists(f"/sys/class/net/{interface.name}/operstate"):
@@ -143,30 +172,54 @@ def is_interface_healthy(
             return (False, None)
 
     # Get all neighbours
-    neighbours = get_all_neighbours(interface)
+    neighbours = get_all_neighbours(interface, neighbour_cache)
 
     if not neighbours:
         logger.debug("No neighbours for %s", interface.name)
         return (False, None)
 
-    if check_ip is None:
-        check_ip = interface.target_ip
+    if targets is None:
+        targets = [(check_ip or interface.target_ip, check_port)]
+
+    if ranker is not None:
+        neighbours = ranker.rank(interface, neighbours, targets[0][0])
 
     logger.debug(
-        "TCP check parameters - IP: %s, Port: %d, Timeout: %ds",
-        check_ip,
-        check_port,
+        "TCP check parameters - Targets: %s, Quorum: %d, Timeout: %.3fs",
+        _format_targets(targets),
+        quorum,
         timeout,
     )
 
+    if concurrent:
+        return _probe_neighbours_concurrently(
+            interface,
+            neighbours,
+            targets,
+            quorum,
+            timeout,
+            prober or get_default_prober(),
+            wave_size,
+            head_start,
+        )
+
     # If interface already has a gateway, test it first
+    tested = 0
     if interface.gateway:
         logger.debug("Testing existing gateway %s first", interface.gateway)
         for neighbour_ip, dest_mac in neighbours:
             if neighbour_ip == interface.gateway:
+                tested += 1
                 if test_connectivity_via_neighbour(
-                    interface, neighbour_ip, dest_mac, check_ip, check_port, timeout
+                    interface,
+                    neighbour_ip,
+                    dest_mac,
+                    targets,
+                    timeout,
+                    prober,
+                    quorum,
                 ):
+                    NEIGHBOURS_TESTED.observe(tested, interface.name)
                     return (True, neighbour_ip)
                 logger.info(
                     "Existing gateway %s failed connectivity test, trying other neighbours",
@@ -180,9 +233,11 @@ def is_interface_healthy(
         if interface.gateway and neighbour_ip == interface.gateway:
             continue
 
+        tested += 1
         if test_connectivity_via_neighbour(
-            interface, neighbour_ip, dest_mac, check_ip, check_port, timeout
+            interface, neighbour_ip, dest_mac, targets, timeout, prober, quorum
         ):
+            NEIGHBOURS_TESTED.observe(tested, interface.name)
             # Found a working gateway
             if interface.gateway != neighbour_ip:
                 logger.info(
@@ -192,9 +247,62 @@ def is_interface_healthy(
                 )
             return (True, neighbour_ip)
 
+    NEIGHBOURS_TESTED.observe(tested, interface.name)
+    logger.debug(
+        "No working gateway found for %s (tested %d neighbour(s))",
+        interface.name,
+        tested,
+    )
+    return (False, None)
+
+
+def _probe_neighbours_concurrently(
+    interface,
+    neighbours: list[tuple[str, str]],
+    targets: list[tuple[str, int]],
+    quorum: int,
+    timeout: float,
+    prober,
+    wave_size: int,
+    head_start: float,
+) -> tuple[bool, str | None]:
+    """Probe neighbours in bounded waves, stopping at the first SYN-ACK"""
+    # Put the existing gateway at the front so it lands in the first wave
+    ordered = sorted(neighbours, key=lambda n: n[0] != interface.gateway)
+    wave_size = wave_size or len(ordered)
+
+    for start in range(0, len(ordered), wave_size):
+        wave = ordered[start : start + wave_size]
+        logger.debug(
+            "Probing %d neighbour(s) on %s concurrently", len(wave), interface.name
+        )
+        gateway_ip = prober.probe_many(
+            interface,
+            wave,
+            targets,
+            timeout,
+            quorum,
+            preferred=interface.gateway if start == 0 else None,
+            head_start=head_start,
+        )
+        if gateway_ip:
+            NEIGHBOURS_TESTED.observe(start + len(wave), interface.name)
+            if interface.gateway != gateway_ip:
+                logger.info(
+                    "Selected new gateway %s for interface %s",
+                    gateway_ip,
+                    interface.name,
+                )
+            return (True, gateway_ip)
+
+    NEIGHBOURS_TESTED.observe(len(ordered), interface.name)
     logger.debug(
         "No working gateway found for %s (tested %d neighbour(s))",
         interface.name,
         len(neighbours),
     )
     return (False, None)
+
+
+def _format_targets(targets: list[tuple[str, int]]) -> str:
+    return ", ".join(f"{ip}:{port}" for ip, port in targets)
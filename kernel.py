@@ -8,130 +8,472 @@ This module provides a client interface to the Linux kernel routing table for:
 
 Commands are executed through the PyRoute2 library to make route changes
 directly in the kernel routing table without requiring an external routing daemon.
+A single long-lived netlink session is shared by all callers; route changes are
+queued and sent to the kernel together as one batch of netlink messages when
+the daemon flushes the client at the end of each check cycle.
+
+Two route modes are supported:
+- metric: one default route per interface, each with the interface's metric
+- multipath: a single default route with one weighted nexthop per healthy
+  interface, so the kernel hashes flows across all of them
+Neither mode leaves a window without a default route: multipath mode changes
+its route with an atomic replace, and metric mode adds an interface's new
+route before deleting its old one. Metric mode appends rather than replaces,
+as the kernel treats routes with the same metric as one route to replace
+whatever their gateway, and interfaces may share a metric.
+
+Routes are installed with a dedicated routing protocol id so that a restarted
+daemon can recognise and adopt the routes an earlier run left in place.
 """
 
+import errno
 import logging
-from pyroute2 import IPRoute
+import socket
+
+from pyroute2.netlink import (
+    NLM_F_ACK,
+    NLM_F_APPEND,
+    NLM_F_CREATE,
+    NLM_F_REQUEST,
+    NetlinkError,
+)
+from pyroute2.netlink.rtnl import RTM_DELROUTE, RTM_NEWROUTE, rt_proto, rt_type
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+from netlink_client import MAIN_TABLE, NetlinkClient
 
 logger = logging.getLogger(__name__)
 
 
-class KernelRoutingClient:
-    def __init__(self):
+class KernelRoutingClient(NetlinkClient):
+    name = "kernel"
+
+    def __init__(
+        self,
+        mode: str = "metric",
+        multipath_metric: int = 0,
+        protocol: int = rt_proto["static"],
+    ):
+        super().__init__()
+        self.mode = mode
+        self.multipath_metric = multipath_metric
+        self.protocol = protocol  # rtm_protocol marking the routes we own
         self.installed_routes = {}  # Interface → (gateway_ip, metric)
+        self._weights = {}  # Interface → ECMP weight (multipath mode)
+        self._multipath = ()  # Installed multipath nexthops, None if unknown
+        self._pending = []  # Queued (action, interface name, gateway, metric)
         if not self.check_kernel_routing():
             raise RuntimeError("Failed to initialize kernel routing client")
 
     def check_kernel_routing(self) -> bool:
         """Verify kernel routing is operational by testing IPRoute connection"""
         try:
-            with IPRoute() as ipr:
+            with self._lock:
                 # Test basic connectivity by listing routes
-                list(ipr.get_routes())
+                list(self._session().get_routes())
             logger.info("Kernel routing connection validated")
             return True
         except Exception as e:
             logger.error("Kernel routing connection failed - Error: %s", str(e))
+            self._reset_session()
             return False
 
     def add_route(self, interface, gateway_ip: str):
-        """Add or update route, removing old route if gateway changed"""
-        logger.debug(
-            "Attempting to add route for %s (GW: %s, Metric: %s)",
-            interface.name,
-            gateway_ip,
-            interface.metric,
-        )
-
-        # Check if route exists with different gateway
-        existing_route = self.installed_routes.get(interface.name)
-        if existing_route:
-            existing_gateway, existing_metric = existing_route
-            if existing_gateway != gateway_ip:
+        """Queue a route add or update, removing the old route once the new
+        one is in place"""
+        route = (gateway_ip, interface.metric)
+        weight = getattr(interface, "effective_weight", 1)
+        with self._lock:
+            existing_route = self.installed_routes.get(interface.name)
+            if existing_route == route and (
+                self.mode != "multipath" or self._weights.get(interface.name) == weight
+            ):
+                return
+
+            logger.debug(
+                "Attempting to add route for %s (GW: %s, Metric: %s)",
+                interface.name,
+                gateway_ip,
+                interface.metric,
+            )
+            self.installed_routes[interface.name] = route
+            self._weights[interface.name] = weight
+            if self.mode == "multipath":
+                # The nexthop set is rebuilt from installed_routes on flush()
+                return
+
+            if existing_route and existing_route[0] != gateway_ip:
                 logger.info(
                     "Gateway changed for %s from %s to %s, updating route",
                     interface.name,
-                    existing_gateway,
+                    existing_route[0],
                     gateway_ip,
                 )
-                # Remove old route first
-                try:
-                    with IPRoute() as ipr:
-                        idx = ipr.link_lookup(ifname=interface.name)
-                        if idx:
-                            ipr.route(
-                                "del",
-                                dst="0.0.0.0",
-                                mask=0,
-                                gateway=existing_gateway,
-                                oif=idx[0],
-                                priority=existing_metric,
-                            )
-                except Exception as e:
-                    logger.debug(
-                        "Failed to remove old route (may not exist): %s", str(e)
-                    )
+            # The new route goes in first, so there is never a window
+            # without one
+            self._pending.append(("add", interface.name, *route))
+            if existing_route:
+                self._pending.append(("del", interface.name, *existing_route))
+
+    def forget(self, name: str):
+        """Stop tracking a route so the next add_route installs it again"""
+        with self._lock:
+            self.installed_routes.pop(name, None)
+            self._multipath = ()
+
+    def actual_routes(self) -> dict:
+        """Our default routes in the kernel, per interface.
+
+        Returns:
+            dict: Interface name → set of (gateway IP, metric) routes, in the
+                  form of installed_routes
+        """
+        with self._lock:
+            names = {index: name for name, index in self._ifindex.items()}
+            actual = {}
+            for route in self._own_default_routes():
+                priority = route.get_attr("RTA_PRIORITY") or 0
+                if self.mode == "multipath" and priority != self.multipath_metric:
+                    continue
+                for index, gateway_ip, _ in self._route_hops(route):
+                    if index not in names:
+                        continue
+                    name = names[index]
+                    metric = priority
+                    if self.mode == "multipath":
+                        # Nexthops of the shared route have no metric of
+                        # their own
+                        metric = self.installed_routes.get(name, (None, priority))[1]
+                    actual.setdefault(name, set()).add((gateway_ip, metric))
+            return actual
+
+    def adopt(self, interfaces) -> dict:
+        """Take over default routes a previous run installed.
 
+        Routes with our protocol that match a configured interface in the
+        current route mode are tracked as installed and left untouched; any
+        other route with our protocol is stale and removed.
+
+        Returns:
+            dict: Interface name → gateway IP of each adopted route
+        """
+        with self._lock:
+            configured = {}
+            for interface in interfaces:
+                index = self._link_index(interface.name)
+                if index is not None:
+                    configured[index] = interface
+
+            adopted = {}
+            multipath = {}
+            rewrite = False  # Multipath route has nexthops we do not track
+            stale = []
+            for route in self._own_default_routes():
+                priority = route.get_attr("RTA_PRIORITY") or 0
+                hops = self._route_hops(route)
+                if self.mode == "multipath" and priority == self.multipath_metric:
+                    for index, gateway_ip, weight in hops:
+                        interface = configured.get(index)
+                        if interface is None or interface.name in adopted:
+                            rewrite = True
+                            continue
+                        adopted[interface.name] = gateway_ip
+                        multipath[interface.name] = (gateway_ip, index, weight)
+                        self.installed_routes[interface.name] = (
+                            gateway_ip,
+                            interface.metric,
+                        )
+                        self._weights[interface.name] = interface.effective_weight
+                    continue
+
+                if self.mode == "metric" and len(hops) == 1:
+                    index, gateway_ip, _ = hops[0]
+                    interface = configured.get(index)
+                    if (
+                        interface is not None
+                        and interface.metric == priority
+                        and interface.name not in adopted
+                    ):
+                        adopted[interface.name] = gateway_ip
+                        self.installed_routes[interface.name] = (gateway_ip, priority)
+                        continue
+                stale.append((priority, hops))
+
+            # Unless it has nexthops we do not track, the first flush leaves
+            # the adopted multipath route alone
+            self._multipath = (
+                None
+                if rewrite
+                else tuple(multipath[name] for name in sorted(multipath))
+            )
+
+            for priority, hops in stale:
+                self._remove_stale(priority, hops)
+            for name, gateway_ip in adopted.items():
+                logger.info("Adopted existing route for %s via %s", name, gateway_ip)
+            return adopted
+
+    def _own_default_routes(self) -> list:
+        """Dump the IPv4 default routes in the main table marked as ours"""
         try:
-            with IPRoute() as ipr:
-                # Get the interface index
-                idx = ipr.link_lookup(ifname=interface.name)
-                if not idx:
-                    raise RuntimeError(f"Interface {interface.name} not found")
-
-                # Add default route (0.0.0.0/0)
-                ipr.route(
-                    "add",
-                    dst="0.0.0.0",
-                    mask=0,
-                    gateway=gateway_ip,
-                    oif=idx[0],
-                    priority=interface.metric,
-                )
+            routes = self._session().get_routes(
+                family=socket.AF_INET, table=MAIN_TABLE, dst_len=0
+            )
+            return [route for route in routes if route["proto"] == self.protocol]
+        except Exception:
+            self._reset_session()
+            raise
 
-            self.installed_routes[interface.name] = (gateway_ip, interface.metric)
-            logger.debug("Route successfully added for %s", interface.name)
-        except Exception as e:
-            # Route might already exist, check if we need to replace it
-            if "File exists" in str(e):
-                logger.debug(
-                    "Route already exists for %s, updating tracking", interface.name
-                )
-                self.installed_routes[interface.name] = (gateway_ip, interface.metric)
-            else:
-                logger.error("Failed to add route for %s: %s", interface.name, str(e))
-                raise
+    @staticmethod
+    def _route_hops(route) -> list:
+        """(ifindex, gateway, weight) of every nexthop of a dumped route"""
+        hops = route.get_attr("RTA_MULTIPATH")
+        if hops:
+            return [
+                (hop["oif"], hop.get_attr("RTA_GATEWAY"), hop["hops"] + 1)
+                for hop in hops
+            ]
+        return [(route.get_attr("RTA_OIF"), route.get_attr("RTA_GATEWAY"), 1)]
+
+    def _remove_stale(self, priority, hops):
+        """Delete a default route of ours that no interface accounts for"""
+        gateways = ", ".join(str(gateway_ip) for _, gateway_ip, _ in hops)
+        logger.info("Removing stale route via %s (metric %d)", gateways, priority)
+        options = {}
+        if len(hops) == 1:
+            options = {"oif": hops[0][0], "gateway": hops[0][1]}
+        try:
+            self._session().route(
+                "del",
+                dst="0.0.0.0/0",
+                table=MAIN_TABLE,
+                proto=self.protocol,
+                priority=priority,
+                **options,
+            )
+        except NetlinkError as e:
+            if e.code not in (errno.ESRCH, errno.ENOENT):
+                logger.error("Failed to remove stale route via %s: %s", gateways, e)
 
     def remove_route(self, interface):
-        """Remove a default route from the kernel routing table"""
-        route_info = self.installed_routes.pop(interface.name, None)
-        if not route_info:
-            logger.debug("No route present for %s", interface.name)
-            return
+        """Queue removal of a default route from the kernel routing table"""
+        with self._lock:
+            route_info = self.installed_routes.pop(interface.name, None)
+            self._weights.pop(interface.name, None)
+            if not route_info:
+                logger.debug("No route present for %s", interface.name)
+                return
+            if self.mode == "multipath":
+                return
 
-        gateway_ip, metric = route_info
+            gateway_ip, metric = route_info
+            self._pending.append(("del", interface.name, gateway_ip, metric))
 
-        try:
-            with IPRoute() as ipr:
-                # Get the interface index
-                idx = ipr.link_lookup(ifname=interface.name)
-                if not idx:
-                    logger.warning(
-                        "Interface %s not found, cannot remove route", interface.name
+    def flush(self):
+        """Send every queued route change to the kernel in one netlink batch.
+
+        Operations missing from the batch acknowledgements are checked
+        against a single dump of the default routes: added routes that are
+        present and removals of routes that are already gone count as done,
+        anything else is retried on its own so its error can be logged.
+        """
+        with self._lock:
+            if self.mode == "multipath":
+                self._flush_multipath()
+                return
+
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            try:
+                messages = []
+                operations = []
+                for operation in pending:
+                    msg = self._route_message(*operation)
+                    if msg is not None:
+                        messages.append(msg)
+                        operations.append(operation)
+                acked = {
+                    response["header"]["sequence_number"]
+                    for response in self._session().nlm_request_batch(
+                        messages, noraise=True
                     )
-                    return
+                }
+                failed = [
+                    operation
+                    for msg, operation in zip(messages, operations)
+                    if msg["header"]["sequence_number"] not in acked
+                ]
+            except (OSError, NetlinkError) as e:
+                logger.debug("Route batch failed, applying one by one: %s", e)
+                self._reset_session()
+                operations, acked, failed = pending, set(), pending
+
+            existing = self._default_routes() if failed else set()
+            for action, name, gateway_ip, metric in failed:
+                present = (gateway_ip, self._ifindex.get(name), metric) in existing
+                if action == "add" and present:
+                    logger.debug("Route already present for %s", name)
+                elif action == "del" and not present:
+                    logger.debug("Route for %s already gone", name)
+                else:
+                    self._apply_single(action, name, gateway_ip, metric)
 
-                # Remove default route (0.0.0.0/0)
-                ipr.route(
+            logger.debug(
+                "Flushed %d route change(s), %d acknowledged in batch",
+                len(operations),
+                len(acked),
+            )
+
+    def _flush_multipath(self):
+        """Replace the multipath default route if its nexthop set changed"""
+        nexthops = []
+        for name, (gateway_ip, _) in sorted(self.installed_routes.items()):
+            if self._missing_link_index("replace", name):
+                continue
+            nexthops.append((gateway_ip, self._ifindex[name], self._weights[name]))
+        nexthops = tuple(nexthops)
+        if nexthops == self._multipath:
+            return
+
+        try:
+            if nexthops:
+                self._session().route(
+                    "replace",
+                    dst="0.0.0.0/0",
+                    table=MAIN_TABLE,
+                    proto=self.protocol,
+                    priority=self.multipath_metric,
+                    multipath=[
+                        {"gateway": gateway_ip, "oif": index, "hops": weight - 1}
+                        for gateway_ip, index, weight in nexthops
+                    ],
+                )
+                logger.info(
+                    "Multipath default route set to %s",
+                    ", ".join(
+                        f"{gateway_ip} (weight {weight})"
+                        for gateway_ip, _, weight in nexthops
+                    ),
+                )
+            else:
+                self._session().route(
                     "del",
-                    dst="0.0.0.0",
-                    mask=0,
-                    gateway=gateway_ip,
-                    oif=idx[0],
-                    priority=metric,
+                    dst="0.0.0.0/0",
+                    table=MAIN_TABLE,
+                    proto=self.protocol,
+                    priority=self.multipath_metric,
+                )
+                logger.info("Multipath default route removed, no healthy nexthops")
+        except NetlinkError as e:
+            if nexthops or e.code not in (errno.ESRCH, errno.ENOENT):
+                logger.error("Failed to update multipath default route: %s", e)
+                return
+        except OSError as e:
+            logger.error("Failed to update multipath default route: %s", e)
+            self._reset_session()
+            return
+        self._multipath = nexthops
+
+    def _default_routes(self) -> set:
+        """(gateway, ifindex, metric) of every IPv4 default route in the main table"""
+        try:
+            routes = self._session().get_routes(
+                family=socket.AF_INET, table=MAIN_TABLE, dst_len=0
+            )
+            return {
+                (
+                    route.get_attr("RTA_GATEWAY"),
+                    route.get_attr("RTA_OIF"),
+                    route.get_attr("RTA_PRIORITY") or 0,
                 )
+                for route in routes
+            }
+        except (OSError, NetlinkError) as e:
+            logger.debug("Failed to dump default routes: %s", e)
+            self._reset_session()
+            return set()
 
-            logger.debug("Route successfully removed for %s", interface.name)
+    def _missing_link_index(self, action, name) -> bool:
+        """Look up an interface for a route change, logging if it has vanished"""
+        if self._link_index(name) is not None:
+            return False
+        if action != "del":
+            logger.error("Failed to add route for %s: interface not found", name)
+            self.installed_routes.pop(name, None)
+        else:
+            logger.warning("Interface %s not found, cannot remove route", name)
+        return True
+
+    def _route_message(self, action, name, gateway_ip, metric):
+        """Build the netlink message for a queued default route change"""
+        if self._missing_link_index(action, name):
+            return None
+        index = self._ifindex[name]
+
+        msg = rtmsg()
+        msg["family"] = socket.AF_INET
+        msg["table"] = MAIN_TABLE
+        msg["proto"] = self.protocol
+        msg["type"] = rt_type["unicast"]
+        msg["attrs"] = [
+            ("RTA_TABLE", MAIN_TABLE),
+            ("RTA_GATEWAY", gateway_ip),
+            ("RTA_OIF", index),
+            ("RTA_PRIORITY", metric),
+        ]
+        if action == "add":
+            # Appended, so a route of another interface with the same
+            # metric is left in place
+            msg["header"]["type"] = RTM_NEWROUTE
+            msg["header"]["flags"] = (
+                NLM_F_REQUEST | NLM_F_ACK | NLM_F_CREATE | NLM_F_APPEND
+            )
+        else:
+            msg["header"]["type"] = RTM_DELROUTE
+            msg["header"]["flags"] = NLM_F_REQUEST | NLM_F_ACK
+        return msg
+
+    def _apply_single(self, action, name, gateway_ip, metric):
+        """Apply one route change on its own to report its error"""
+        try:
+            if self._missing_link_index(action, name):
+                return
+            index = self._ifindex[name]
+            self._session().route(
+                "append" if action == "add" else action,
+                dst="0.0.0.0",
+                mask=0,
+                gateway=gateway_ip,
+                oif=index,
+                priority=metric,
+                proto=self.protocol,
+            )
+            logger.debug(
+                "Route successfully %s for %s",
+                "removed" if action == "del" else "added",
+                name,
+            )
+        except NetlinkError as e:
+            if action != "del":
+                logger.error("Failed to add route for %s: %s", name, str(e))
+                if self.installed_routes.get(name) == (gateway_ip, metric):
+                    del self.installed_routes[name]
+            elif e.code in (errno.ESRCH, errno.ENOENT):
+                logger.debug("Route for %s already gone", name)
+            else:
+                logger.error("Failed to remove route for %s: %s", name, str(e))
         except Exception as e:
-            logger.error("Failed to remove route for %s: %s", interface.name, str(e))
-            # Don't raise - route might already be gone
+            logger.error(
+                "Failed to %s route for %s: %s",
+                "remove" if action == "del" else "add",
+                name,
+                str(e),
+            )
+            if action != "del" and self.installed_routes.get(name) == (
+                gateway_ip,
+                metric,
+            ):
+                del self.installed_routes[name]
+            self._reset_session()
@@ -0,0 +1,412 @@
+"""
+Prometheus metrics for the control loop.
+
+This module provides a small in-process metrics registry that:
+- Keeps counters, gauges and histograms as plain numbers updated under a
+  short lock, so instrumenting the probe path costs almost nothing
+- Collects state that already lives elsewhere (interface health, path stats)
+  only when the endpoint is scraped, through registered collector callbacks
+- Serves everything in the Prometheus text exposition format from a
+  background HTTP server that never touches the probe or routing threads
+
+Instrumented modules update the module-level metrics below whether or not the
+endpoint is enabled.
+"""
+
+import bisect
+import logging
+import math
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket bounds in seconds, from sub-millisecond LAN RTTs to multi-second
+# vtysh runs
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra="") -> str:
+    pairs = [
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class of a metric family with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}  # Label values → value
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def expose(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        lines = self._header()
+        for label_values, value in values:
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            state[0][index] += 1
+            state[1] += value
+
+    def expose(self) -> list:
+        with self._lock:
+            values = [
+                (label_values, list(counts), total)
+                for label_values, (counts, total) in self._values.items()
+            ]
+        lines = self._header()
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names, label_values, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metric families plus collectors evaluated at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable returning metric families to expose.
+
+        Collectors run on the HTTP server thread for every scrape and should
+        only read state that is already kept in memory.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                metrics.extend(collector())
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e, exc_info=True)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PROBE_RTT = REGISTRY.register(
+    Histogram(
+        "ecmp_probe_rtt_seconds",
+        "Round-trip time from SYN to SYN-ACK or RST of answered probes",
+        ("interface",),
+    )
+)
+PROBES = REGISTRY.register(
+    Counter(
+        "ecmp_probes_total",
+        "Probe results per neighbour (answered, or lost to the timeout)",
+        ("interface", "outcome"),
+    )
+)
+CHECKS = REGISTRY.register(
+    Counter(
+        "ecmp_checks_total",
+        "Interface health checks by result (passed, failed or error)",
+        ("interface", "result"),
+    )
+)
+NEIGHBOURS_TESTED = REGISTRY.register(
+    Histogram(
+        "ecmp_check_neighbours_tested",
+        "Neighbours probed per interface health check",
+        ("interface",),
+        COUNT_BUCKETS,
+    )
+)
+BACKEND_OPERATION = REGISTRY.register(
+    Histogram(
+        "ecmp_backend_operation_seconds",
+        "Duration of routing backend operations (netlink or vtysh)",
+        ("backend", "operation"),
+    )
+)
+CYCLE_DURATION = REGISTRY.register(
+    Histogram(
+        "ecmp_check_cycle_seconds",
+        "Time from dispatching a batch of due checks to flushing its routes",
+    )
+)
+SCHEDULER_LAG = REGISTRY.register(
+    Histogram(
+        "ecmp_scheduler_lag_seconds",
+        "How far past its deadline each batch of checks was dispatched",
+    )
+)
+ENGINE_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "ecmp_engine_queue_depth",
+        "Interface checks waiting for a free probe worker",
+    )
+)
+ENGINE_START_WAIT = REGISTRY.register(
+    Histogram(
+        "ecmp_engine_start_wait_seconds",
+        "Time interface checks waited in the queue before a worker started them",
+    )
+)
+FIRST_ROUTE = REGISTRY.register(
+    Gauge(
+        "ecmp_startup_first_route_seconds",
+        "Time from process start to the first route installed by a check",
+    )
+)
+CONFIG_RELOADS = REGISTRY.register(
+    Counter(
+        "ecmp_config_reloads_total",
+        "Configuration reloads by result (applied, or failed to load)",
+        ("result",),
+    )
+)
+CONNTRACK_FLUSH = REGISTRY.register(
+    Histogram(
+        "ecmp_conntrack_flush_seconds",
+        "Time taken to find and delete the conntrack entries of a withdrawn interface",
+        ("interface",),
+    )
+)
+CONNTRACK_REMOVED = REGISTRY.register(
+    Counter(
+        "ecmp_conntrack_entries_removed_total",
+        "Conntrack entries deleted after the interface's route was withdrawn",
+        ("interface",),
+    )
+)
+FAILURE_TO_WITHDRAWAL = REGISTRY.register(
+    Histogram(
+        "ecmp_failure_to_withdrawal_seconds",
+        "Time from the start of the first failed check (or carrier loss) to "
+        "the withdrawal of the interface's route",
+        ("interface",),
+    )
+)
+
+
+def interface_collector(interfaces, path_stats=None, dampener=None):
+    """Collector exposing the current state of the monitored interfaces.
+
+    Everything is read from attributes the control loop already keeps, so a
+    scrape takes no lock the probe path waits on for longer than a copy.
+    """
+
+    def collect():
+        healthy = Gauge(
+            "ecmp_interface_healthy",
+            "Whether the interface is up after the rise/fall thresholds",
+            ("interface",),
+        )
+        routed = Gauge(
+            "ecmp_interface_routed",
+            "Whether a route via the interface is installed",
+            ("interface", "gateway"),
+        )
+        weight = Gauge(
+            "ecmp_interface_weight",
+            "ECMP weight programmed for the interface",
+            ("interface",),
+        )
+        route_changes = Counter(
+            "ecmp_route_changes_total",
+            "Route installs and withdrawals made for the interface",
+            ("interface",),
+        )
+        avoided = Counter(
+            "ecmp_route_changes_avoided_total",
+            "Route installs and withdrawals avoided by hysteresis and dampening",
+            ("interface",),
+        )
+        families = [healthy, routed, weight, route_changes, avoided]
+        for interface in interfaces:
+            name = interface.name
+            healthy.set(int(bool(interface.healthy)), name)
+            routed.set(
+                int(interface.gateway is not None), name, interface.gateway or ""
+            )
+            weight.set(interface.effective_weight, name)
+            route_changes.inc(name, amount=interface.route_changes)
+            avoided.inc(name, amount=interface.avoided_route_changes)
+
+        if dampener is not None:
+            penalty = Gauge(
+                "ecmp_flap_penalty",
+                "Current flap dampening penalty of the interface",
+                ("interface",),
+            )
+            for interface in interfaces:
+                penalty.set(dampener.current_penalty(interface.name), interface.name)
+            families.append(penalty)
+
+        if path_stats is not None:
+            loss = Gauge(
+                "ecmp_path_loss_ratio",
+                "Probe loss over the path stats window",
+                ("interface", "gateway"),
+            )
+            rtt = Gauge(
+                "ecmp_path_rtt_seconds",
+                "RTT percentiles over the path stats window",
+                ("interface", "gateway", "quantile"),
+            )
+            for interface_name, gateway_ip in path_stats.paths():
+                summary = path_stats.summary(interface_name, gateway_ip)
+                if summary is None:
+                    continue
+                loss.set(summary.loss, interface_name, gateway_ip)
+                if summary.rtt_p50 is not None:
+                    rtt.set(summary.rtt_p50 / 1000, interface_name, gateway_ip, "0.5")
+                    rtt.set(summary.rtt_p95 / 1000, interface_name, gateway_ip, "0.95")
+            families.extend((loss, rtt))
+        return families
+
+    return collect
+
+
+def start_http_server(host: str, port: int, registry: Registry = REGISTRY):
+    """Serve the registry on http://host:port/metrics from a daemon thread.
+
+    Raises:
+        OSError: If the address cannot be bound
+    """
+    # Imported here so the daemon only pays for the HTTP stack when the
+    # endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.expose().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(
+                "Metrics request from %s: %s", self.client_address[0], format % args
+            )
+
+    server_class = ThreadingHTTPServer
+    if ":" in host:
+        server_class = type(
+            "MetricsServer6",
+            (ThreadingHTTPServer,),
+            {"address_family": socket.AF_INET6},
+        )
+    server = server_class((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    )
+    thread.start()
+    return server
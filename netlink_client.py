@@ -0,0 +1,68 @@
+"""
+Shared netlink session for the kernel routing backends.
+
+This module provides a base class for the kernel and nexthop backends that:
+- Keeps one long-lived rtnetlink session shared by all callers, opened on
+  first use and reopened after a failure
+- Caches interface indexes, dropping entries invalidated by RTM_NEWLINK and
+  RTM_DELLINK events
+"""
+
+import logging
+import threading
+
+from pyroute2 import IPRoute
+
+logger = logging.getLogger(__name__)
+
+MAIN_TABLE = 254
+
+
+class NetlinkClient:
+    """Netlink session and ifindex cache of a kernel routing backend.
+
+    Subclasses hold self._lock around every use of the session and the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ipr = None  # Long-lived netlink session, opened on first use
+        self._ifindex = {}  # Interface name → ifindex
+
+    def handle_link_event(self, msg):
+        """Drop cached ifindexes invalidated by an RTM_NEWLINK/RTM_DELLINK event"""
+        name = msg.get_attr("IFLA_IFNAME")
+        with self._lock:
+            if msg["event"] == "RTM_DELLINK" or self._ifindex.get(name) != msg["index"]:
+                self._ifindex.pop(name, None)
+
+    def _open_session(self) -> IPRoute:
+        """Open a new netlink session"""
+        return IPRoute()
+
+    def _session(self) -> IPRoute:
+        """Return the shared netlink session, opening it if needed"""
+        if self._ipr is None:
+            self._ipr = self._open_session()
+        return self._ipr
+
+    def _reset_session(self):
+        """Close the netlink session so the next call opens a fresh one"""
+        with self._lock:
+            if self._ipr is not None:
+                try:
+                    self._ipr.close()
+                except OSError as e:
+                    logger.debug("Failed to close netlink session: %s", e)
+            self._ipr = None
+            self._ifindex.clear()
+
+    def _link_index(self, name: str):
+        """Return the cached ifindex of an interface, looking it up on a miss"""
+        index = self._ifindex.get(name)
+        if index is None:
+            idx = self._session().link_lookup(ifname=name)
+            if not idx:
+                return None
+            index = self._ifindex[name] = idx[0]
+        return index
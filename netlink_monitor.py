@@ -0,0 +1,218 @@
+"""
+Netlink event monitoring and neighbour table caching.
+
+This module provides:
+- NetlinkMonitor: one background thread subscribed to rtnetlink link and
+  neighbour events that dispatches them to registered handlers
+- NeighbourCache: an interface-indexed copy of the IPv4 neighbour table,
+  filled once from an rtnetlink dump and kept current from RTM_NEWNEIGH and
+  RTM_DELNEIGH events, so health checks never fork `ip neigh`
+
+If the event socket overflows or fails, the monitor reconnects and asks every
+subscriber to reload its state from a fresh dump.
+"""
+
+import logging
+import socket
+import threading
+from collections import namedtuple
+from time import monotonic, sleep
+
+from pyroute2 import IPRoute
+from pyroute2.netlink import NetlinkError
+from pyroute2.netlink.rtnl import RTMGRP_LINK, RTMGRP_NEIGH
+
+logger = logging.getLogger(__name__)
+
+# mac_changed is the monotonic time the MAC address last changed (or None)
+Neighbour = namedtuple(
+    "Neighbour", ("ip", "mac", "state", "mac_changed"), defaults=(None,)
+)
+
+
+class NetlinkMonitor:
+    """Background rtnetlink event listener shared by the daemon's caches.
+
+    pyroute2 sockets only deliver events to the thread that created them, so
+    the event and dump sockets are both owned by the monitor thread. The
+    monitor also tracks the ifindex ↔ interface name mapping that other
+    subscribers need to interpret events.
+    """
+
+    def __init__(self, groups: int = RTMGRP_LINK | RTMGRP_NEIGH):
+        self.groups = groups
+        self._handlers = {}  # Event name → [callback(msg)]
+        self._resync_handlers = []  # callback(ipr) run after every full dump
+        self._lock = threading.Lock()
+        self._names = {}  # ifindex → interface name
+        self._indexes = {}  # Interface name → ifindex
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="netlink-monitor", daemon=True
+        )
+
+    def subscribe(self, event: str, callback):
+        """Call callback(msg) for every netlink message of the given event"""
+        self._handlers.setdefault(event, []).append(callback)
+
+    def on_resync(self, callback):
+        """Call callback(ipr) with a dump socket at startup and after overflows"""
+        self._resync_handlers.append(callback)
+
+    def start(self, timeout: float = 5):
+        """Start the monitor thread and wait for the initial dump.
+
+        Raises:
+            RuntimeError: If netlink could not be opened or dumped in time
+        """
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError(
+                f"Netlink monitor failed to start: {self._error or 'timed out'}"
+            )
+
+    def ifname(self, index: int):
+        """Interface name for an ifindex, or None if unknown"""
+        return self._names.get(index)
+
+    def ifindex(self, name: str):
+        """ifindex for an interface name, or None if unknown"""
+        return self._indexes.get(name)
+
+    def _run(self):
+        while True:
+            events = dump = None
+            try:
+                events = IPRoute()
+                events.bind(groups=self.groups)
+                dump = IPRoute()
+                self._resync(dump)
+                self._ready.set()
+                while True:
+                    for msg in events.get():
+                        self._dispatch(msg)
+            except (OSError, NetlinkError) as e:
+                self._error = e
+                logger.warning("Netlink event stream failed, resyncing: %s", e)
+            except Exception as e:
+                # A failing resync handler must not stop the monitor thread
+                self._error = e
+                logger.exception("Netlink resync failed, retrying")
+            finally:
+                for ipr in (events, dump):
+                    if ipr is not None:
+                        try:
+                            ipr.close()
+                        except OSError as e:
+                            logger.debug("Failed to close netlink socket: %s", e)
+            sleep(1)
+
+    def _resync(self, ipr):
+        """Reload link names and every subscriber's state from a full dump"""
+        names = {}
+        for msg in ipr.get_links():
+            names[msg["index"]] = msg.get_attr("IFLA_IFNAME")
+        with self._lock:
+            self._names = names
+            self._indexes = {name: index for index, name in names.items()}
+        for callback in self._resync_handlers:
+            callback(ipr)
+        logger.debug("Netlink state loaded for %d link(s)", len(names))
+
+    def _dispatch(self, msg):
+        event = msg.get("event")
+        if event == "RTM_NEWLINK":
+            self._track_link(msg["index"], msg.get_attr("IFLA_IFNAME"))
+        elif event == "RTM_DELLINK":
+            self._track_link(msg["index"], None)
+
+        for callback in self._handlers.get(event, ()):
+            try:
+                callback(msg)
+            except Exception:
+                logger.exception("Netlink %s handler failed", event)
+
+    def _track_link(self, index: int, name):
+        with self._lock:
+            old_name = self._names.pop(index, None)
+            if old_name is not None and self._indexes.get(old_name) == index:
+                del self._indexes[old_name]
+            if name is not None:
+                self._names[index] = name
+                self._indexes[name] = index
+
+
+class NeighbourCache:
+    """IPv4 neighbour table indexed by interface, kept live from netlink.
+
+    Entries keep the kernel NUD state (see pyroute2.netlink.rtnl.ndmsg) so
+    callers can tell reachable neighbours from stale or failed ones.
+    """
+
+    def __init__(self, monitor: NetlinkMonitor):
+        self._monitor = monitor
+        self._lock = threading.Lock()
+        self._tables = {}  # ifindex → {neighbour ip: Neighbour}
+        monitor.subscribe("RTM_NEWNEIGH", self._update)
+        monitor.subscribe("RTM_DELNEIGH", self._delete)
+        monitor.subscribe("RTM_DELLINK", self._drop_link)
+        monitor.on_resync(self._load)
+
+    def get(self, name: str) -> list[Neighbour]:
+        """All IPv4 neighbours with a link-layer address on an interface"""
+        index = self._monitor.ifindex(name)
+        with self._lock:
+            table = self._tables.get(index)
+            return list(table.values()) if table else []
+
+    def _load(self, ipr):
+        tables = {}
+        for msg in ipr.get_neighbours(family=socket.AF_INET):
+            neighbour = self._parse(msg)
+            if neighbour is not None:
+                tables.setdefault(msg["ifindex"], {})[neighbour.ip] = neighbour
+        with self._lock:
+            self._tables = tables
+        logger.debug(
+            "Loaded %d IPv4 neighbour(s) from netlink",
+            sum(len(table) for table in tables.values()),
+        )
+
+    def _update(self, msg):
+        if msg["family"] != socket.AF_INET:
+            return
+        neighbour = self._parse(msg)
+        with self._lock:
+            table = self._tables.setdefault(msg["ifindex"], {})
+            if neighbour is None:
+                table.pop(msg.get_attr("NDA_DST"), None)
+                return
+            old = table.get(neighbour.ip)
+            if old is not None:
+                if old.mac != neighbour.mac:
+                    neighbour = neighbour._replace(mac_changed=monotonic())
+                else:
+                    neighbour = neighbour._replace(mac_changed=old.mac_changed)
+            table[neighbour.ip] = neighbour
+
+    def _delete(self, msg):
+        if msg["family"] != socket.AF_INET:
+            return
+        with self._lock:
+            table = self._tables.get(msg["ifindex"])
+            if table is not None:
+                table.pop(msg.get_attr("NDA_DST"), None)
+
+    def _drop_link(self, msg):
+        with self._lock:
+            self._tables.pop(msg["index"], None)
+
+    @staticmethod
+    def _parse(msg):
+        """Neighbour from an RTM_NEWNEIGH message, None without an lladdr"""
+        dst_ip = msg.get_attr("NDA_DST")
+        lladdr = msg.get_attr("NDA_LLADDR")
+        if not dst_ip or not lladdr:
+            return None
+        return Neighbour(dst_ip, lladdr, msg["state"])
@@ -0,0 +1,503 @@
+"""
+Linux kernel nexthop group integration for managing dynamic routes.
+
+This module provides a client interface to kernel nexthop objects for:
+- Keeping one nexthop object per interface and its current gateway
+- Grouping the healthy nexthops into a single weighted ECMP nexthop group
+- Pointing the default route, and any extra prefixes or tables, at the group
+
+A health change only rewrites the group (or one member nexthop), however many
+routes share the uplinks, so FIB churn stays constant as routes are added.
+Requires a kernel with nexthop object support (Linux 5.3 or later).
+
+pyroute2 has no nexthop message class, so the nhmsg layout from
+linux/nexthop.h is declared here and sent through the same batched netlink
+requests as the kernel backend.
+"""
+
+import errno
+import ipaddress
+import logging
+import socket
+import struct
+
+from pyroute2 import IPRoute
+from pyroute2.netlink import (
+    NLM_F_ACK,
+    NLM_F_CREATE,
+    NLM_F_REPLACE,
+    NLM_F_REQUEST,
+    NetlinkError,
+    nlmsg,
+)
+from pyroute2.netlink.rtnl import RTM_NEWROUTE, rt_proto, rt_type
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+from netlink_client import MAIN_TABLE, NetlinkClient
+
+logger = logging.getLogger(__name__)
+
+RTM_NEWNEXTHOP = 104
+RTM_DELNEXTHOP = 105
+RTM_GETNEXTHOP = 106
+
+
+class nhmsg(nlmsg):
+    """struct nhmsg and its NHA_* attributes"""
+
+    prefix = "NHA_"
+    fields = (
+        ("family", "B"),
+        ("scope", "B"),
+        ("protocol", "B"),
+        ("resvd", "B"),
+        ("flags", "I"),
+    )
+    nla_map = (
+        (0, "NHA_UNSPEC", "none"),
+        (1, "NHA_ID", "uint32"),
+        (2, "NHA_GROUP", "cdata"),  # Array of struct nexthop_grp
+        (3, "NHA_GROUP_TYPE", "uint16"),
+        (4, "NHA_BLACKHOLE", "flag"),
+        (5, "NHA_OIF", "uint32"),
+        (6, "NHA_GATEWAY", "ip4addr"),
+    )
+
+
+class nhrtmsg(rtmsg):
+    """rtmsg with the RTA_NH_ID attribute pyroute2 does not know about"""
+
+    nla_map = (
+        *((index, name, kind) for index, (name, kind) in enumerate(rtmsg.nla_map)),
+        (30, "RTA_NH_ID", "uint32"),
+    )
+
+
+class NexthopRoutingClient(NetlinkClient):
+    name = "nexthop"
+
+    def __init__(
+        self,
+        group_id: int = 1000,
+        route_prefixes=("0.0.0.0/0",),
+        route_tables=(MAIN_TABLE,),
+        metric: int = 0,
+        protocol: int = rt_proto["static"],
+    ):
+        super().__init__()
+        self.group_id = group_id
+        self.protocol = protocol  # Protocol id marking nexthops and routes we own
+        self.route_prefixes = [ipaddress.IPv4Network(p) for p in route_prefixes]
+        self.route_tables = list(route_tables)
+        self.metric = metric
+        self.installed_routes = {}  # Interface → (gateway_ip, metric)
+        self._weights = {}  # Interface → ECMP weight
+        self._nexthop_ids = {}  # Interface → id of its nexthop object
+        self._nexthops = {}  # Nexthop id → (gateway_ip, ifindex) in the kernel
+        self._group = None  # ((nexthop id, weight), ...) in the kernel
+        self._routes_installed = False
+        if not self.check_nexthop_support():
+            raise RuntimeError("Failed to initialize nexthop routing client")
+
+    def check_nexthop_support(self) -> bool:
+        """Verify the kernel supports nexthop objects by looking up the group"""
+        try:
+            with self._lock:
+                self._request(self._nexthop_message(RTM_GETNEXTHOP, self.group_id))
+                self._group = ()  # Present with unknown members, replaced on flush
+            logger.info(
+                "Nexthop group %d already exists, taking it over", self.group_id
+            )
+            return True
+        except NetlinkError as e:
+            if e.code == errno.ENOENT:
+                logger.info("Kernel nexthop support validated")
+                return True
+            logger.error("Kernel nexthop objects unavailable - Error: %s", str(e))
+        except OSError as e:
+            logger.error("Kernel routing connection failed - Error: %s", str(e))
+        self._reset_session()
+        return False
+
+    def add_route(self, interface, gateway_ip: str):
+        """Add or update the interface's member of the nexthop group"""
+        logger.debug(
+            "Attempting to add nexthop for %s (GW: %s, Weight: %s)",
+            interface.name,
+            gateway_ip,
+            getattr(interface, "effective_weight", 1),
+        )
+        with self._lock:
+            existing_route = self.installed_routes.get(interface.name)
+            if existing_route and existing_route[0] != gateway_ip:
+                logger.info(
+                    "Gateway changed for %s from %s to %s, updating nexthop",
+                    interface.name,
+                    existing_route[0],
+                    gateway_ip,
+                )
+            self.installed_routes[interface.name] = (gateway_ip, interface.metric)
+            self._weights[interface.name] = getattr(interface, "effective_weight", 1)
+
+    def remove_route(self, interface):
+        """Drop the interface from the nexthop group"""
+        with self._lock:
+            if self.installed_routes.pop(interface.name, None) is None:
+                logger.debug("No route present for %s", interface.name)
+            self._weights.pop(interface.name, None)
+
+    def flush(self):
+        """Bring the kernel nexthops, group and routes in line with the
+        tracked interfaces in one netlink batch.
+
+        Nothing is sent when the healthy set is unchanged. When no interface
+        is healthy the group is deleted, which also removes every route that
+        points at it.
+        """
+        with self._lock:
+            members = []
+            nexthops = {}
+            for name, (gateway_ip, _) in sorted(self.installed_routes.items()):
+                index = self._link_index(name)
+                if index is None:
+                    logger.error(
+                        "Failed to add nexthop for %s: interface not found", name
+                    )
+                    continue
+                nexthop_id = self._nexthop_id(name)
+                nexthops[nexthop_id] = (gateway_ip, index)
+                members.append((nexthop_id, self._weights[name]))
+            members = tuple(members)
+
+            messages = []
+            for nexthop_id, (gateway_ip, index) in nexthops.items():
+                if self._nexthops.get(nexthop_id) != (gateway_ip, index):
+                    messages.append(
+                        self._nexthop_message(
+                            RTM_NEWNEXTHOP, nexthop_id, gateway=gateway_ip, oif=index
+                        )
+                    )
+            if members:
+                if members != self._group:
+                    messages.append(
+                        self._nexthop_message(
+                            RTM_NEWNEXTHOP, self.group_id, group=members
+                        )
+                    )
+                if not self._routes_installed:
+                    messages.extend(self._route_messages())
+            elif self._group is not None:
+                messages.append(self._nexthop_message(RTM_DELNEXTHOP, self.group_id))
+            # Retire nexthops no longer in the group once it has been updated
+            stale = [i for i in self._nexthops if i not in nexthops]
+            messages.extend(self._nexthop_message(RTM_DELNEXTHOP, i) for i in stale)
+            if not messages:
+                return
+
+            try:
+                acked = {
+                    response["header"]["sequence_number"]
+                    for response in self._session().nlm_request_batch(
+                        messages, noraise=True
+                    )
+                }
+                failed = [
+                    msg
+                    for msg in messages
+                    if msg["header"]["sequence_number"] not in acked
+                ]
+            except (OSError, NetlinkError) as e:
+                logger.error("Failed to update nexthop group: %s", e)
+                self._reset_session()
+                self._forget_kernel_state()
+                return
+
+            errors = [self._retry(msg) for msg in failed]
+            if any(errors):
+                # Resend everything as a replace on the next flush
+                self._forget_kernel_state()
+                return
+
+            changed = members != self._group or nexthops != self._nexthops
+            self._nexthops = nexthops
+            self._group = members or None
+            self._routes_installed = bool(members)
+            if changed:
+                self._log_group(members)
+            logger.debug("Flushed %d nexthop change(s)", len(messages))
+
+    def _log_group(self, members):
+        if not members:
+            logger.info("Nexthop group %d removed, no healthy nexthops", self.group_id)
+            return
+        names = {nexthop_id: name for name, nexthop_id in self._nexthop_ids.items()}
+        logger.info(
+            "Nexthop group %d set to %s",
+            self.group_id,
+            ", ".join(
+                f"{names[nexthop_id]} via {self._nexthops[nexthop_id][0]} "
+                f"(weight {weight})"
+                for nexthop_id, weight in members
+            ),
+        )
+
+    def forget(self, name: str):
+        """Stop tracking a nexthop so the next flush installs everything again"""
+        with self._lock:
+            self.installed_routes.pop(name, None)
+            self._forget_kernel_state()
+
+    def actual_routes(self) -> dict:
+        """Gateways of the group members in the kernel, per interface.
+
+        The group and member nexthops are looked up in one batch. If any
+        configured route no longer points at the group, nothing counts as
+        installed.
+
+        Returns:
+            dict: Interface name → set of (gateway IP, metric) routes, in the
+                  form of installed_routes
+        """
+        with self._lock:
+            names = {nexthop_id: name for name, nexthop_id in self._nexthop_ids.items()}
+            ids = [self.group_id, *names]
+            try:
+                replies = {
+                    reply.get_attr("NHA_ID"): reply
+                    for reply in self._session().nlm_request_batch(
+                        [self._nexthop_message(RTM_GETNEXTHOP, i) for i in ids],
+                        noraise=True,
+                    )
+                }
+                if not self._routes_present():
+                    return {}
+            except Exception:
+                self._reset_session()
+                raise
+
+            group = replies.get(self.group_id)
+            members = set()
+            if group is not None:
+                members = {
+                    member_id
+                    for member_id, _, _, _ in struct.iter_unpack(
+                        "=IBBH", group.get_attr("NHA_GROUP") or b""
+                    )
+                }
+            # Members share the group's routes, so each keeps its tracked
+            # metric
+            return {
+                names[nexthop_id]: {
+                    (
+                        replies[nexthop_id].get_attr("NHA_GATEWAY"),
+                        self.installed_routes.get(names[nexthop_id], (None, None))[1],
+                    )
+                }
+                for nexthop_id in members
+                if nexthop_id in names and nexthop_id in replies
+            }
+
+    def adopt(self, interfaces) -> dict:
+        """Take over the nexthop group and members a previous run installed.
+
+        Members on configured interfaces keep their nexthop ids and are
+        tracked as installed. Members on other interfaces are dropped from
+        the group and deleted on the first flush.
+
+        Returns:
+            dict: Interface name → gateway IP of each adopted member
+        """
+        with self._lock:
+            configured = {}
+            for interface in interfaces:
+                index = self._link_index(interface.name)
+                if index is not None:
+                    configured[index] = interface
+
+            try:
+                (group,) = self._request(
+                    self._nexthop_message(RTM_GETNEXTHOP, self.group_id)
+                )
+            except NetlinkError as e:
+                if e.code == errno.ENOENT:
+                    return {}
+                raise
+            members = [
+                (member_id, weight + 1)
+                for member_id, weight, _, _ in struct.iter_unpack(
+                    "=IBBH", group.get_attr("NHA_GROUP") or b""
+                )
+            ]
+            replies = {
+                reply.get_attr("NHA_ID"): reply
+                for reply in self._session().nlm_request_batch(
+                    [
+                        self._nexthop_message(RTM_GETNEXTHOP, member_id)
+                        for member_id, _ in members
+                    ],
+                    noraise=True,
+                )
+            }
+
+            adopted = {}
+            kept = {}
+            unknown = False
+            for member_id, weight in members:
+                reply = replies.get(member_id)
+                interface = configured.get(reply.get_attr("NHA_OIF")) if reply else None
+                if interface is None or interface.name in adopted:
+                    unknown = True
+                    if reply is not None:
+                        self._nexthops[member_id] = None  # Deleted on first flush
+                    continue
+                gateway_ip = reply.get_attr("NHA_GATEWAY")
+                adopted[interface.name] = gateway_ip
+                kept[interface.name] = (member_id, weight)
+                self._nexthop_ids[interface.name] = member_id
+                self._nexthops[member_id] = (gateway_ip, reply.get_attr("NHA_OIF"))
+                self.installed_routes[interface.name] = (gateway_ip, interface.metric)
+                self._weights[interface.name] = interface.effective_weight
+
+            # flush() orders members by interface name
+            self._group = () if unknown else tuple(kept[name] for name in sorted(kept))
+            self._routes_installed = self._routes_present()
+            for name, gateway_ip in adopted.items():
+                logger.info("Adopted existing nexthop for %s via %s", name, gateway_ip)
+            return adopted
+
+    def _routes_present(self) -> bool:
+        """Whether every configured prefix and table has a route of ours"""
+        for table in self.route_tables:
+            present = {
+                (route.get_attr("RTA_DST") or "0.0.0.0", route["dst_len"])
+                for route in self._session().get_routes(
+                    family=socket.AF_INET, table=table
+                )
+                if route["proto"] == self.protocol
+                and (route.get_attr("RTA_PRIORITY") or 0) == self.metric
+            }
+            for prefix in self.route_prefixes:
+                if (str(prefix.network_address), prefix.prefixlen) not in present:
+                    return False
+        return True
+
+    def handle_link_event(self, msg):
+        """Forget kernel state invalidated by an RTM_NEWLINK/RTM_DELLINK event.
+
+        The kernel deletes nexthops on links that go down, shrinking or
+        removing the group (and its routes) with them, so the next flush
+        replaces everything.
+        """
+        super().handle_link_event(msg)
+        name = msg.get_attr("IFLA_IFNAME")
+        with self._lock:
+            if name in self._nexthop_ids and (
+                msg["event"] == "RTM_DELLINK" or msg.get_attr("IFLA_OPERSTATE") != "UP"
+            ):
+                self._forget_kernel_state()
+
+    def _forget_kernel_state(self):
+        self._nexthops = {}
+        self._group = None
+        self._routes_installed = False
+
+    def _nexthop_id(self, name: str) -> int:
+        """Stable nexthop object id of an interface, allocated above the group"""
+        nexthop_id = self._nexthop_ids.get(name)
+        if nexthop_id is None:
+            nexthop_id = (
+                max([self.group_id, *self._nexthops, *self._nexthop_ids.values()]) + 1
+            )
+            self._nexthop_ids[name] = nexthop_id
+        return nexthop_id
+
+    def _nexthop_message(self, msg_type, nexthop_id, gateway=None, oif=None, group=()):
+        """Build an RTM_*NEXTHOP message for a nexthop object or group"""
+        msg = nhmsg()
+        msg["family"] = socket.AF_INET if gateway else socket.AF_UNSPEC
+        msg["attrs"] = [("NHA_ID", nexthop_id)]
+        if gateway:
+            msg["attrs"] += [("NHA_OIF", oif), ("NHA_GATEWAY", gateway)]
+        if group:
+            # struct nexthop_grp { u32 id; u8 weight; u8 weight_high; u16 resvd2 }
+            # weight holds weight - 1, as for RTA_MULTIPATH hops
+            msg["attrs"].append(
+                (
+                    "NHA_GROUP",
+                    b"".join(
+                        struct.pack("=IBBH", member_id, weight - 1, 0, 0)
+                        for member_id, weight in group
+                    ),
+                )
+            )
+        msg["header"]["type"] = msg_type
+        msg["header"]["flags"] = NLM_F_REQUEST | NLM_F_ACK
+        if msg_type == RTM_NEWNEXTHOP:
+            # Get and delete requests must leave the header fields zeroed
+            msg["protocol"] = self.protocol
+            msg["header"]["flags"] |= NLM_F_CREATE | NLM_F_REPLACE
+        return msg
+
+    def _route_messages(self):
+        """Route replace messages pointing every prefix and table at the group"""
+        messages = []
+        for table in self.route_tables:
+            for prefix in self.route_prefixes:
+                msg = nhrtmsg()
+                msg["family"] = socket.AF_INET
+                msg["dst_len"] = prefix.prefixlen
+                msg["table"] = table if table < 256 else 252  # RT_TABLE_COMPAT
+                msg["proto"] = self.protocol
+                msg["type"] = rt_type["unicast"]
+                msg["attrs"] = [
+                    ("RTA_TABLE", table),
+                    ("RTA_PRIORITY", self.metric),
+                    ("RTA_NH_ID", self.group_id),
+                ]
+                if prefix.prefixlen:
+                    msg["attrs"].append(("RTA_DST", str(prefix.network_address)))
+                msg["header"]["type"] = RTM_NEWROUTE
+                msg["header"]["flags"] = (
+                    NLM_F_REQUEST | NLM_F_ACK | NLM_F_CREATE | NLM_F_REPLACE
+                )
+                messages.append(msg)
+        return messages
+
+    def _retry(self, msg) -> bool:
+        """Resend a message missing from the batch acks to report its error.
+
+        Returns:
+            bool: True if the message still failed
+        """
+        try:
+            self._request(msg)
+            return False
+        except NetlinkError as e:
+            if msg["header"]["type"] == RTM_DELNEXTHOP and e.code == errno.ENOENT:
+                # Already removed, e.g. by the kernel when its link went down
+                return False
+            if msg["header"]["type"] == RTM_NEWROUTE:
+                logger.error(
+                    "Failed to point route at nexthop group %d: %s",
+                    self.group_id,
+                    str(e),
+                )
+            else:
+                logger.error(
+                    "Failed to update nexthop %d: %s", msg.get_attr("NHA_ID"), str(e)
+                )
+        except OSError as e:
+            logger.error("Failed to update nexthop group: %s", str(e))
+            self._reset_session()
+        return True
+
+    def _request(self, msg):
+        """Send one message and wait for its reply, raising NetlinkError"""
+        return self._session().nlm_request_batch([msg])
+
+    def _open_session(self) -> IPRoute:
+        """Open a netlink session that parses nexthop replies"""
+        ipr = super()._open_session()
+        # Parse nexthop replies instead of returning bare headers
+        ipr.marshal.msg_map[RTM_NEWNEXTHOP] = nhmsg
+        return ipr
@@ -0,0 +1,190 @@
+"""
+Round-trip time and loss statistics of probed paths.
+
+This module keeps a rolling window of probe results for every path (an
+interface and the gateway probed through it) that:
+- Records the SYN to SYN-ACK round-trip time of each answered probe, and every
+  probe that went unanswered as a loss
+- Reports the loss rate and RTT percentiles over the window
+- Turns the quality of a path into an ECMP weight, so traffic moves away from
+  a congested uplink before it fails completely
+
+The base RTT of a path is the lowest RTT it has shown since it was first
+probed. Median RTT beyond the base plus a tolerance is treated as queueing
+delay and lowers the path's weight, as does loss. A path whose loss or 95th
+percentile RTT crosses the degraded thresholds is demoted to the minimum
+weight while it stays up, and only recovers once its loss has fallen to half
+the threshold, so a path hovering around the threshold does not flap.
+"""
+
+import logging
+import math
+import threading
+from collections import deque, namedtuple
+
+from metrics import PROBE_RTT, PROBES
+
+logger = logging.getLogger(__name__)
+
+# Largest weight of a nexthop in a Linux multipath route or nexthop group
+MAX_WEIGHT = 256
+
+# Weights are computed from the path quality rounded to this many steps, so
+# ordinary RTT jitter does not rewrite the routes on every check
+QUALITY_STEPS = 8
+
+PathSummary = namedtuple(
+    "PathSummary", ("samples", "loss", "base_rtt", "rtt_p50", "rtt_p95")
+)
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class PathStats:
+    """Rolling probe results per (interface, gateway) path.
+
+    RTTs are kept in milliseconds. Paths with fewer than min_samples results
+    keep their configured weight.
+
+    Attributes:
+        window: int - Number of most recent probe results kept per path
+        rtt_tolerance_ms: float - Median RTT above the base RTT that is not
+                                  counted as congestion
+        degraded_loss: float - Loss rate at which a path is demoted
+        degraded_rtt_ms: float - 95th percentile RTT at which a path is
+                                 demoted (0 disables the RTT threshold)
+        weight_scale: int - Factor applied to configured weights so reduced
+                            weights keep some resolution
+        min_samples: int - Results needed before the weight of a path changes
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        rtt_tolerance_ms: float = 10.0,
+        degraded_loss: float = 0.2,
+        degraded_rtt_ms: float = 0,
+        weight_scale: int = 1,
+        min_samples: int = 5,
+    ):
+        self.window = window
+        self.rtt_tolerance_ms = rtt_tolerance_ms
+        self.degraded_loss = degraded_loss
+        self.degraded_rtt_ms = degraded_rtt_ms
+        self.weight_scale = weight_scale
+        self.min_samples = min_samples
+        self._samples = {}  # (interface, gateway) → deque of RTT ms or None
+        self._base_rtt = {}  # (interface, gateway) → lowest RTT ms seen
+        self._demoted = set()  # Paths currently demoted as degraded
+        self._lock = threading.Lock()
+
+    def record(self, interface_name: str, gateway_ip: str, rtt: float | None = None):
+        """Record one probe result, rtt in seconds or None if it was lost"""
+        path = (interface_name, gateway_ip)
+        if rtt is None:
+            PROBES.inc(interface_name, "lost")
+        else:
+            PROBES.inc(interface_name, "answered")
+            PROBE_RTT.observe(rtt, interface_name)
+        with self._lock:
+            samples = self._samples.get(path)
+            if samples is None:
+                samples = self._samples[path] = deque(maxlen=self.window)
+            if rtt is None:
+                samples.append(None)
+                return
+            rtt_ms = rtt * 1000
+            samples.append(rtt_ms)
+            if rtt_ms < self._base_rtt.get(path, math.inf):
+                self._base_rtt[path] = rtt_ms
+
+    def summary(self, interface_name: str, gateway_ip: str):
+        """PathSummary of a path's window, or None if it was never probed"""
+        path = (interface_name, gateway_ip)
+        with self._lock:
+            samples = self._samples.get(path)
+            if not samples:
+                return None
+            rtts = sorted(rtt for rtt in samples if rtt is not None)
+            base_rtt = self._base_rtt.get(path)
+            count = len(samples)
+
+        loss = (count - len(rtts)) / count
+        if not rtts:
+            return PathSummary(count, loss, base_rtt, None, None)
+        return PathSummary(
+            count, loss, base_rtt, _percentile(rtts, 0.5), _percentile(rtts, 0.95)
+        )
+
+    def paths(self) -> list:
+        """(interface, gateway) of every path with recorded results"""
+        with self._lock:
+            return list(self._samples)
+
+    def forget(self, interface_name: str):
+        """Drop the results of every path of an interface no longer monitored"""
+        with self._lock:
+            for path in [p for p in self._samples if p[0] == interface_name]:
+                del self._samples[path]
+                self._base_rtt.pop(path, None)
+                self._demoted.discard(path)
+
+    def weight(self, interface, gateway_ip: str) -> int:
+        """ECMP weight of an interface's path via gateway_ip.
+
+        The configured weight, multiplied by weight_scale, is reduced in
+        proportion to the path's loss and queueing delay. Degraded paths get
+        the minimum weight of 1.
+        """
+        full_weight = min(MAX_WEIGHT, interface.weight * self.weight_scale)
+        summary = self.summary(interface.name, gateway_ip)
+        if summary is None or summary.samples < self.min_samples:
+            return full_weight
+
+        path = (interface.name, gateway_ip)
+        with self._lock:
+            was_degraded = path in self._demoted
+            loss_limit = self.degraded_loss / 2 if was_degraded else self.degraded_loss
+            degraded = summary.loss >= loss_limit or (
+                self.degraded_rtt_ms > 0
+                and summary.rtt_p95 is not None
+                and summary.rtt_p95 >= self.degraded_rtt_ms
+            )
+            if degraded:
+                self._demoted.add(path)
+            else:
+                self._demoted.discard(path)
+
+        if degraded:
+            if not was_degraded:
+                logger.warning(
+                    "Path via %s on %s is degraded (loss %.0f%%, p95 RTT %s), "
+                    "demoting it",
+                    gateway_ip,
+                    interface.name,
+                    summary.loss * 100,
+                    _format_rtt(summary.rtt_p95),
+                )
+            return 1
+        if was_degraded:
+            logger.info(
+                "Path via %s on %s recovered (loss %.0f%%, p95 RTT %s)",
+                gateway_ip,
+                interface.name,
+                summary.loss * 100,
+                _format_rtt(summary.rtt_p95),
+            )
+
+        quality = 1 - summary.loss
+        if summary.rtt_p50 is not None:
+            allowed = summary.base_rtt + self.rtt_tolerance_ms
+            quality *= min(1.0, allowed / summary.rtt_p50)
+        quality = round(quality * QUALITY_STEPS) / QUALITY_STEPS
+        return max(1, round(full_weight * quality))
+
+
+def _format_rtt(rtt_ms) -> str:
+    return "n/a" if rtt_ms is None else f"{rtt_ms:.1f}ms"
@@ -0,0 +1,748 @@
+"""
+TCP SYN probers used by the interface health checks.
+
+This module provides two interchangeable probe backends:
+- NativeProber: keeps one filtered AF_PACKET socket per interface and sends
+  prebuilt SYN frame templates, patching only the source port, sequence
+  number and TCP checksum for each probe
+- ScapyProber: builds and sends each probe with scapy (fallback backend),
+  which is only imported once this backend is chosen
+
+Both backends send TCP SYNs to one or more check targets through a specific
+neighbour MAC address at once and report whether enough of them (the quorum)
+answered with a SYN-ACK within the timeout. When given a PathStats, they also
+record the round-trip time of every answered probe, and a loss for every
+neighbour that missed the quorum.
+"""
+
+import ctypes
+import fcntl
+import itertools
+import logging
+import random
+import selectors
+import socket
+import struct
+import threading
+from time import monotonic
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+PROBE_BACKENDS = ("native", "scapy")
+
+# The scapy names ScapyProber uses, loaded by _load_scapy()
+scapy = None
+
+# Source ports used by native probes. Kept above the default Linux ephemeral
+# range (32768-60999) so replies never collide with local sockets.
+PORT_MIN = 61000
+PORT_MAX = 65535
+
+ETH_P_IP = 0x0800
+SIOCGIFADDR = 0x8915
+SO_ATTACH_FILTER = 26
+SOL_PACKET = 263
+PACKET_IGNORE_OUTGOING = 23
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_SYN_ACK = 0x12
+
+# Offsets within an untagged Ethernet + 20 byte IPv4 header SYN frame
+_TCP_OFFSET = 14 + 20
+_SPORT_OFFSET = _TCP_OFFSET
+_SEQ_OFFSET = _TCP_OFFSET + 4
+_TCP_CSUM_OFFSET = _TCP_OFFSET + 16
+_TCP_HEADER_LEN = 24  # 20 byte header + MSS option
+
+
+def _checksum_words(data: bytes) -> int:
+    """Unfolded one's complement sum of the 16-bit words in data"""
+    if len(data) % 2:
+        data += b"\x00"
+    return sum(struct.unpack(f"!{len(data) // 2}H", data))
+
+
+def _fold(total: int) -> int:
+    """Fold a one's complement sum to 16 bits and return its complement"""
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _attach_port_filter(sock: socket.socket, port_min: int, port_max: int):
+    """Attach a classic BPF filter accepting only TCP/IPv4 replies to our ports.
+
+    Equivalent to the tcpdump expression
+    "ip and tcp and not ip[6:2] & 0x1fff != 0 and dst portrange MIN-MAX",
+    so the kernel drops every other frame before it reaches userspace.
+    """
+    program = (
+        (0x28, 0, 0, 12),  # ldh [12]               ethertype
+        (0x15, 0, 9, ETH_P_IP),  # jeq #0x800       else drop
+        (0x30, 0, 0, 23),  # ldb [23]               IP protocol
+        (0x15, 0, 7, socket.IPPROTO_TCP),  # jeq #6 else drop
+        (0x28, 0, 0, 20),  # ldh [20]               fragment offset
+        (0x45, 5, 0, 0x1FFF),  # jset #0x1fff       drop fragments
+        (0xB1, 0, 0, 14),  # ldxb 4*([14]&0xf)      IP header length
+        (0x48, 0, 0, 16),  # ldh [x+16]             TCP destination port
+        (0x35, 0, 2, port_min),  # jge #min         else drop
+        (0x25, 1, 0, port_max),  # jgt #max         drop
+        (0x06, 0, 0, 0x40000),  # ret #262144       accept
+        (0x06, 0, 0, 0),  # ret #0                  drop
+    )
+    code = b"".join(struct.pack("HBBI", *insn) for insn in program)
+    # struct sock_fprog holds a pointer to the instructions, so keep them in
+    # a ctypes buffer that outlives the setsockopt() call
+    buffer = ctypes.create_string_buffer(code)
+    fprog = struct.pack("HL", len(program), ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+class _SynTemplate:
+    """Prebuilt Ethernet/IPv4/TCP SYN frame for one neighbour and target.
+
+    Only the source port, sequence number and TCP checksum change between
+    probes; the TCP checksum is finished incrementally from a precomputed
+    partial sum of every other covered field.
+    """
+
+    __slots__ = ("frame", "partial_sum")
+
+    def __init__(self, src_mac, dst_mac, src_ip, dst_ip, dst_port):
+        ip_header = struct.pack(
+            "!BBHHHBBH4s4s",
+            0x45,  # version 4, 20 byte header
+            0,
+            20 + _TCP_HEADER_LEN,
+            random.getrandbits(16),
+            0x4000,  # don't fragment
+            64,
+            socket.IPPROTO_TCP,
+            0,
+            src_ip,
+            dst_ip,
+        )
+        ip_header = (
+            ip_header[:10]
+            + struct.pack("!H", _fold(_checksum_words(ip_header)))
+            + ip_header[12:]
+        )
+        tcp_header = struct.pack(
+            "!HHIIBBHHH4s",
+            0,  # source port, patched per probe
+            dst_port,
+            0,  # sequence number, patched per probe
+            0,
+            (_TCP_HEADER_LEN // 4) << 4,
+            TCP_SYN,
+            64240,
+            0,  # checksum, patched per probe
+            0,
+            b"\x02\x04\x05\xb4",  # MSS 1460
+        )
+        pseudo_header = struct.pack(
+            "!4s4sBBH", src_ip, dst_ip, 0, socket.IPPROTO_TCP, _TCP_HEADER_LEN
+        )
+        self.partial_sum = _checksum_words(pseudo_header + tcp_header)
+        self.frame = bytes(
+            dst_mac + src_mac + struct.pack("!H", ETH_P_IP) + ip_header + tcp_header
+        )
+
+    def build(self, sport: int, seq: int) -> bytearray:
+        """Return a copy of the frame with the given source port and sequence"""
+        frame = bytearray(self.frame)
+        struct.pack_into("!H", frame, _SPORT_OFFSET, sport)
+        struct.pack_into("!I", frame, _SEQ_OFFSET, seq)
+        checksum = _fold(self.partial_sum + sport + (seq >> 16) + (seq & 0xFFFF))
+        struct.pack_into("!H", frame, _TCP_CSUM_OFFSET, checksum)
+        return frame
+
+
+class _PendingProbe:
+    """An outstanding SYN waiting for its SYN-ACK or RST"""
+
+    __slots__ = (
+        "done",
+        "flags",
+        "notify",
+        "received_at",
+        "sent_at",
+        "seq",
+        "target_ip",
+        "target_port",
+    )
+
+    def __init__(self, target_ip: bytes, target_port: int, seq: int, notify=None):
+        self.target_ip = target_ip
+        self.target_port = target_port
+        self.seq = seq
+        self.sent_at = 0.0
+        self.received_at = 0.0
+        self.flags = None
+        self.done = threading.Event()
+        self.notify = notify  # Shared event set when any probe of a group ends
+
+
+class _Channel:
+    """Filtered AF_PACKET socket bound to a single interface"""
+
+    __slots__ = ("mac", "name", "sock")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sock = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_IP)
+        )
+        try:
+            _attach_port_filter(self.sock, PORT_MIN, PORT_MAX)
+            try:
+                self.sock.setsockopt(SOL_PACKET, PACKET_IGNORE_OUTGOING, 1)
+            except OSError:
+                pass  # Kernel older than 4.20, the filter still drops our SYNs
+            self.sock.bind((name, ETH_P_IP))
+            self.sock.setblocking(False)
+            # Discard anything queued before the filter was attached
+            while True:
+                self.sock.recv(65535)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.sock.close()
+            raise
+        self.mac = self.sock.getsockname()[4]
+
+
+class NativeProber:
+    """Raw socket SYN prober with one long-lived socket per interface.
+
+    Replies are read by a single background thread and matched to the
+    outstanding probe by destination port, source address/port and the
+    acknowledged sequence number, so probes on any number of interfaces
+    can run concurrently.
+    """
+
+    name = "native"
+
+    def __init__(self, stats=None):
+        self.stats = stats  # PathStats receiving RTT and loss, if any
+        self._lock = threading.Lock()
+        self._channels = {}  # Interface name → _Channel
+        self._templates = {}  # (interface, src ip, mac, target, port) → _SynTemplate
+        self._pending = {}  # Source port → _PendingProbe
+        # Start at a random port so a restarted daemon does not reuse the
+        # ports of its previous run while the targets may still track them
+        ports = list(range(PORT_MIN, PORT_MAX + 1))
+        offset = random.randrange(len(ports))
+        self._ports = itertools.cycle(ports[offset:] + ports[:offset])
+        self._ioctl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._selector = selectors.DefaultSelector()
+        self._reader = threading.Thread(
+            target=self._read_replies, name="probe-reader", daemon=True
+        )
+        self._reader.start()
+
+    def probe(
+        self,
+        interface,
+        neighbour_ip: str,
+        dest_mac: str,
+        check_ip: str,
+        check_port: int = 80,
+        timeout: float = 1,
+    ) -> bool:
+        """Send one SYN via dest_mac and wait for a SYN-ACK from check_ip"""
+        return self.probe_targets(
+            interface, neighbour_ip, dest_mac, [(check_ip, check_port)], timeout
+        )
+
+    def probe_targets(
+        self,
+        interface,
+        neighbour_ip: str,
+        dest_mac: str,
+        targets: list[tuple[str, int]],
+        timeout: float = 1,
+        quorum: int = 1,
+    ) -> bool:
+        """Send a SYN to every (ip, port) target via dest_mac at once.
+
+        Returns True as soon as quorum targets have answered with a SYN-ACK,
+        or False if that did not happen within the timeout.
+        """
+        return (
+            self.probe_many(
+                interface, [(neighbour_ip, dest_mac)], targets, timeout, quorum
+            )
+            is not None
+        )
+
+    def probe_many(
+        self,
+        interface,
+        neighbours: list[tuple[str, str]],
+        targets: list[tuple[str, int]],
+        timeout: float = 1,
+        quorum: int = 1,
+        preferred: str | None = None,
+        head_start: float = 0.0,
+    ) -> str | None:
+        """Probe every target via several neighbours at once.
+
+        The preferred neighbour (usually the current gateway) is probed
+        head_start seconds before the others so it wins whenever it is
+        still working. Returns the IP of the first neighbour through which
+        quorum targets answered with a SYN-ACK, or None if there was none
+        within the timeout.
+        """
+        notify = threading.Event()
+        outstanding = {}  # Source port → (neighbour_ip, _PendingProbe)
+        deadline = monotonic() + timeout
+        winner = None
+
+        def send(neighbour_ip, dest_mac):
+            for check_ip, check_port in targets:
+                sent = self._send(
+                    interface, neighbour_ip, dest_mac, check_ip, check_port, notify
+                )
+                if sent is not None:
+                    outstanding[sent[0]] = (neighbour_ip, sent[1])
+
+        try:
+            others = neighbours
+            if preferred is not None and head_start > 0:
+                for neighbour_ip, dest_mac in neighbours:
+                    if neighbour_ip == preferred:
+                        send(neighbour_ip, dest_mac)
+                        winner = self._await_quorum(
+                            outstanding, notify, monotonic() + head_start, quorum
+                        )
+                        if winner:
+                            return winner
+                        others = [n for n in neighbours if n[0] != preferred]
+                        break
+
+            for neighbour_ip, dest_mac in others:
+                send(neighbour_ip, dest_mac)
+            winner = self._await_quorum(outstanding, notify, deadline, quorum)
+            return winner
+        finally:
+            for sport in outstanding:
+                self._release(sport)
+            self._record(interface, outstanding, winner, monotonic() >= deadline)
+            self._log_results(outstanding)
+
+    def _record(self, interface, outstanding, winner, expired: bool):
+        """Pass probe RTTs to the path stats, and a loss per failed neighbour.
+
+        A neighbour that missed the quorum counts one loss once the timeout
+        expired, however many targets it was probed with, so a single dead
+        target does not multiply the loss of every path. Neighbours still
+        outstanding when another one won are not counted either way.
+        """
+        if self.stats is None:
+            return
+        failed = set()
+        for neighbour_ip, pending in outstanding.values():
+            if pending.done.is_set():
+                rtt = pending.received_at - pending.sent_at
+                self.stats.record(interface.name, neighbour_ip, rtt)
+            if neighbour_ip != winner:
+                failed.add(neighbour_ip)
+        if expired:
+            for neighbour_ip in failed:
+                self.stats.record(interface.name, neighbour_ip, None)
+
+    @staticmethod
+    def _log_results(outstanding):
+        for neighbour_ip, pending in outstanding.values():
+            if pending.done.is_set():
+                logger.debug(
+                    "TCP response flags from %s via %s: %#04x after %.1fms",
+                    socket.inet_ntoa(pending.target_ip),
+                    neighbour_ip,
+                    pending.flags,
+                    (pending.received_at - pending.sent_at) * 1000,
+                )
+            else:
+                logger.debug(
+                    "No TCP response from %s via neighbour %s",
+                    socket.inet_ntoa(pending.target_ip),
+                    neighbour_ip,
+                )
+
+    def _await_quorum(self, outstanding, notify, deadline, quorum) -> str | None:
+        """Wait until quorum probes via one neighbour get a SYN-ACK, or until
+        every outstanding probe is answered"""
+        while True:
+            answered = 0
+            passed = {}  # Neighbour IP → SYN-ACKs received
+            for neighbour_ip, pending in outstanding.values():
+                if pending.done.is_set():
+                    answered += 1
+                    if pending.flags & TCP_SYN_ACK == TCP_SYN_ACK:
+                        passed[neighbour_ip] = passed.get(neighbour_ip, 0) + 1
+                        if passed[neighbour_ip] >= quorum:
+                            return neighbour_ip
+            if answered == len(outstanding):
+                return None
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return None
+            notify.wait(remaining)
+            notify.clear()
+
+    def _send(
+        self, interface, neighbour_ip, dest_mac, check_ip, check_port, notify=None
+    ):
+        """Send a SYN and register it, returning (source port, pending probe)"""
+        try:
+            channel = self._channel(interface.name)
+            src_ip = self._interface_address(interface.name)
+        except OSError as e:
+            logger.debug(
+                "Cannot probe via %s on %s: %s", neighbour_ip, interface.name, e
+            )
+            return None
+
+        target_ip = socket.inet_aton(check_ip)
+        template = self._template(
+            channel, src_ip, dest_mac, target_ip, check_ip, check_port
+        )
+        seq = random.getrandbits(32)
+        pending = _PendingProbe(target_ip, check_port, seq, notify)
+        sport = self._register(pending)
+        if sport is None:
+            logger.warning("No free probe source ports, skipping %s", neighbour_ip)
+            return None
+
+        try:
+            pending.sent_at = monotonic()
+            channel.sock.send(template.build(sport, seq))
+        except OSError as e:
+            logger.debug(
+                "Sending probe on %s failed, reopening socket: %s", interface.name, e
+            )
+            self._release(sport)
+            self._drop_channel(interface.name)
+            return None
+        return sport, pending
+
+    def _release(self, sport: int):
+        with self._lock:
+            self._pending.pop(sport, None)
+
+    def forget(self, name: str):
+        """Close the socket of an interface that is no longer monitored, so
+        a link re-created under its name gets a fresh one"""
+        self._drop_channel(name)
+
+    def close(self):
+        """Close every interface socket"""
+        with self._lock:
+            for name in list(self._channels):
+                self._drop_channel_locked(name)
+
+    def _channel(self, name: str) -> _Channel:
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = _Channel(name)
+                self._channels[name] = channel
+                self._selector.register(channel.sock, selectors.EVENT_READ, channel)
+                logger.debug("Opened probe socket on %s", name)
+            return channel
+
+    def _drop_channel(self, name: str):
+        with self._lock:
+            self._drop_channel_locked(name)
+
+    def _drop_channel_locked(self, name: str):
+        channel = self._channels.pop(name, None)
+        if channel is None:
+            return
+        self._templates = {
+            key: value for key, value in self._templates.items() if key[0] != name
+        }
+        try:
+            self._selector.unregister(channel.sock)
+        except (KeyError, ValueError):
+            pass
+        channel.sock.close()
+
+    def _interface_address(self, name: str) -> bytes:
+        """Primary IPv4 address of an interface (raises OSError if none)"""
+        request = struct.pack("256s", name[:15].encode())
+        return fcntl.ioctl(self._ioctl_sock.fileno(), SIOCGIFADDR, request)[20:24]
+
+    def _template(self, channel, src_ip, dest_mac, target_ip, check_ip, check_port):
+        key = (channel.name, src_ip, dest_mac, target_ip, check_port)
+        template = self._templates.get(key)
+        if template is None:
+            template = _SynTemplate(
+                channel.mac,
+                bytes.fromhex(dest_mac.replace(":", "")),
+                src_ip,
+                target_ip,
+                check_port,
+            )
+            with self._lock:
+                if len(self._templates) > 4096:
+                    self._templates.clear()
+                self._templates[key] = template
+            logger.debug(
+                "Built SYN template for %s via %s to %s:%d",
+                channel.name,
+                dest_mac,
+                check_ip,
+                check_port,
+            )
+        return template
+
+    def _register(self, pending: _PendingProbe) -> int | None:
+        """Reserve a free source port for a probe"""
+        with self._lock:
+            for _ in range(PORT_MAX - PORT_MIN + 1):
+                port = next(self._ports)
+                if port not in self._pending:
+                    self._pending[port] = pending
+                    return port
+        return None
+
+    def _read_replies(self):
+        buffer = bytearray(2048)
+        while True:
+            try:
+                events = self._selector.select(timeout=1)
+            except OSError:
+                continue
+            for key, _ in events:
+                self._drain(key.data, buffer)
+
+    def _drain(self, channel: _Channel, buffer: bytearray):
+        """Read every queued frame on a channel and complete matching probes"""
+        while True:
+            try:
+                length = channel.sock.recv_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return  # Socket closed while dropping the channel
+
+            if length < _TCP_OFFSET + 20:
+                continue
+            tcp_offset = 14 + (buffer[14] & 0x0F) * 4
+            if length < tcp_offset + 14:
+                continue
+
+            sport, dport, _, ack = struct.unpack_from("!HHII", buffer, tcp_offset)
+            pending = self._pending.get(dport)
+            if (
+                pending is None
+                or pending.done.is_set()
+                or pending.target_port != sport
+                or pending.target_ip != bytes(buffer[26:30])
+                or ack != (pending.seq + 1) & 0xFFFFFFFF
+            ):
+                continue
+
+            pending.flags = buffer[tcp_offset + 13]
+            if pending.flags & (TCP_SYN_ACK | TCP_RST):
+                pending.received_at = monotonic()
+                pending.done.set()
+                if pending.notify is not None:
+                    pending.notify.set()
+
+
+def _load_scapy():
+    """Import the parts of scapy a SYN probe needs.
+
+    scapy.all loads every protocol layer scapy knows, which takes about a
+    second and tens of MB, so only Ethernet, IP and TCP are loaded.
+
+    Raises:
+        RuntimeError: If scapy is not installed
+    """
+    global scapy
+    if scapy is not None:
+        return
+    try:
+        from scapy.arch import get_if_addr
+        from scapy.error import Scapy_Exception
+        from scapy.layers.inet import IP, TCP
+        from scapy.layers.l2 import Ether
+        from scapy.sendrecv import srp
+    except ImportError as e:
+        raise RuntimeError(f"scapy is not available: {e}") from e
+    scapy = SimpleNamespace(
+        Ether=Ether,
+        IP=IP,
+        TCP=TCP,
+        Scapy_Exception=Scapy_Exception,
+        get_if_addr=get_if_addr,
+        srp=srp,
+    )
+
+
+class ScapyProber:
+    """Fallback prober building and sending each SYN with scapy"""
+
+    name = "scapy"
+
+    def __init__(self, stats=None):
+        _load_scapy()
+        self.stats = stats  # PathStats receiving RTT and loss, if any
+
+    def probe(
+        self,
+        interface,
+        neighbour_ip: str,
+        dest_mac: str,
+        check_ip: str,
+        check_port: int = 80,
+        timeout: float = 1,
+    ) -> bool:
+        """Send one SYN via dest_mac and wait for a SYN-ACK from check_ip"""
+        return self.probe_targets(
+            interface, neighbour_ip, dest_mac, [(check_ip, check_port)], timeout
+        )
+
+    def probe_targets(
+        self,
+        interface,
+        neighbour_ip: str,
+        dest_mac: str,
+        targets: list[tuple[str, int]],
+        timeout: float = 1,
+        quorum: int = 1,
+    ) -> bool:
+        """Send a SYN to every (ip, port) target via dest_mac at once and
+        report whether quorum targets answered with a SYN-ACK"""
+        return (
+            self._probe_batch(
+                interface, [(neighbour_ip, dest_mac)], targets, timeout, quorum
+            )
+            is not None
+        )
+
+    def probe_many(
+        self,
+        interface,
+        neighbours: list[tuple[str, str]],
+        targets: list[tuple[str, int]],
+        timeout: float = 1,
+        quorum: int = 1,
+        preferred: str | None = None,
+        head_start: float = 0.0,
+    ) -> str | None:
+        """Probe every target via several neighbours at once.
+
+        scapy only returns once every probe is answered or the timeout
+        expires, so unlike the native backend this cannot stop at the first
+        neighbour reaching the quorum. The preferred neighbour is tried alone
+        for head_start seconds first.
+        """
+        if preferred is not None and head_start > 0:
+            for neighbour_ip, dest_mac in neighbours:
+                if neighbour_ip == preferred:
+                    # Missing the head start is not a lost probe, the
+                    # neighbour is probed again with the others below
+                    if self._probe_batch(
+                        interface,
+                        [(neighbour_ip, dest_mac)],
+                        targets,
+                        head_start,
+                        quorum,
+                        record=False,
+                    ):
+                        return neighbour_ip
+                    break
+
+        return self._probe_batch(interface, neighbours, targets, timeout, quorum)
+
+    def _probe_batch(
+        self, interface, neighbours, targets, timeout, quorum, record: bool = True
+    ) -> str | None:
+        """Send every SYN in one batch and return the first neighbour, in
+        the given order, through which quorum targets answered"""
+        sports = random.sample(range(1024, 65536), len(neighbours) * len(targets))
+        by_sport = {}  # Source port → neighbour IP
+        packets = []
+        # Probe from the interface's own address, not from whichever one
+        # scapy's routing table would pick for the target
+        src_ip = scapy.get_if_addr(interface.name)
+        for neighbour_ip, dest_mac in neighbours:
+            for check_ip, check_port in targets:
+                sport = sports[len(packets)]
+                by_sport[sport] = neighbour_ip
+                packets.append(
+                    scapy.Ether(dst=dest_mac)
+                    / scapy.IP(src=src_ip, dst=check_ip)
+                    / scapy.TCP(sport=sport, dport=check_port, flags="S")
+                )
+        try:
+            answered, _ = scapy.srp(
+                packets,
+                timeout=timeout,
+                verbose=0,
+                iface=interface.name,
+                nofilter=True,
+            )
+        except (scapy.Scapy_Exception, AttributeError, IndexError) as e:
+            logger.debug("Connectivity test failed: %s", e, exc_info=True)
+            return None
+
+        passed = {}  # Neighbour IP → SYN-ACKs received
+        for sent, received in answered:
+            neighbour_ip = by_sport.get(sent[scapy.TCP].sport)
+            flags = (
+                int(received[scapy.TCP].flags) if received.haslayer(scapy.TCP) else 0
+            )
+            logger.debug(
+                "TCP response flags from %s via %s: %#04x",
+                sent[scapy.IP].dst,
+                neighbour_ip,
+                flags,
+            )
+            if self.stats is not None:
+                rtt = received.time - sent.sent_time
+                self.stats.record(interface.name, neighbour_ip, rtt)
+            if flags & TCP_SYN_ACK == TCP_SYN_ACK:
+                passed[neighbour_ip] = passed.get(neighbour_ip, 0) + 1
+
+        winner = None
+        for neighbour_ip, _ in neighbours:
+            if passed.get(neighbour_ip, 0) >= quorum:
+                winner = winner or neighbour_ip
+            elif self.stats is not None and record:
+                # One loss per failed neighbour, however many targets it had
+                self.stats.record(interface.name, neighbour_ip, None)
+        return winner
+
+    def forget(self, name: str):
+        """Nothing to release, scapy opens a socket per probe"""
+
+    def close(self):
+        """Nothing to release, scapy opens a socket per probe"""
+
+
+def create_prober(backend: str = "native", stats=None):
+    """Create the probe backend selected in the configuration.
+
+    Args:
+        backend: Probe backend name
+        stats: PathStats to record probe RTT and loss in (optional)
+
+    Raises:
+        ValueError: If the backend name is unknown
+        RuntimeError: If the scapy backend is chosen but scapy is missing
+    """
+    if backend == "native":
+        return NativeProber(stats)
+    if backend == "scapy":
+        return ScapyProber(stats)
+    raise ValueError(
+        f"Invalid probe backend '{backend}'. Must be one of: {', '.join(PROBE_BACKENDS)}"
+    )
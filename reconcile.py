@@ -0,0 +1,249 @@
+"""
+Desired-state route reconciliation.
+
+This module provides a layer between the daemon and a routing backend that:
+- Records the route each interface should have after its latest health check
+- Passes only real changes on to the backend, including changes of an
+  interface's ECMP weight, so a steady-state check cycle costs no routing
+  operations at all
+- Only looks at the interfaces checked since the last flush, so the cost of
+  a flush does not grow with the number of monitored interfaces
+- Periodically compares the backend's tracked routes with the routes actually
+  present in the kernel or FRR and reinstalls any that drifted or were
+  removed by someone else
+- Optionally deletes the conntrack entries of a withdrawn interface's flows
+  once its route is gone
+
+The reconciler exposes the same add_route/remove_route/flush interface as the
+backends, so the daemon can use it wherever it used a routing client.
+
+At startup it adopts the routes a previous run left in the backend, and it can
+keep the last known gateway of every interface in a small JSON state file.
+"""
+
+import json
+import logging
+import os
+import threading
+from time import monotonic
+
+from metrics import BACKEND_OPERATION
+
+logger = logging.getLogger(__name__)
+
+
+class RouteReconciler:
+    """Routing client wrapper that applies the difference between desired
+    and installed routes.
+
+    Attributes:
+        backend: Routing backend (FRRClient, KernelRoutingClient or
+                 NexthopRoutingClient)
+        interval: float - Seconds between checks of the actual routes for
+                          drift (0 disables them)
+        state_file: str - Path of the gateway state file (None disables it)
+        conntrack: ConntrackFlusher run for every withdrawn interface
+                   (optional)
+    """
+
+    def __init__(
+        self,
+        backend,
+        interval: float = 60,
+        state_file: str | None = None,
+        conntrack=None,
+    ):
+        self.backend = backend
+        self.interval = interval
+        self.state_file = state_file
+        self.conntrack = conntrack
+        self._saved = None  # Desired routes last written to the state file
+        self._state_changed = False  # Desired routes changed since last save
+        self._desired = {}  # Interface name → gateway_ip
+        self._dirty = set()  # Interface names updated since the last flush
+        self._interfaces = {}  # Interface name → Interface
+        self._weights = {}  # Interface name → weight last passed to the backend
+        self._lock = threading.Lock()
+        self._next_check = monotonic() + interval
+
+    def adopt(self, interfaces) -> dict:
+        """Take over the routes a previous run left in the backend.
+
+        Adopted routes become the desired state, so they stay in place
+        without a single routing call until a health check says otherwise.
+
+        Returns:
+            dict: Interface name → gateway IP of each adopted route
+        """
+        try:
+            adopted = self._timed("adopt", self.backend.adopt, interfaces)
+        except Exception as e:
+            # As for drift checks, any backend error leaves nothing adopted
+            logger.warning("Failed to adopt existing routes: %s", e, exc_info=True)
+            adopted = {}
+
+        with self._lock:
+            for interface in interfaces:
+                self._interfaces[interface.name] = interface
+                if interface.name in adopted:
+                    self._weights[interface.name] = interface.effective_weight
+            self._desired.update(adopted)
+            self._state_changed = True
+        return adopted
+
+    def load_state(self) -> dict:
+        """Last known gateway of every interface from the state file"""
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file) as f:
+                gateways = json.load(f).get("gateways", {})
+            self._saved = dict(gateways)
+            return gateways
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable state file %s: %s", self.state_file, e)
+            return {}
+
+    def _save_state(self):
+        """Write the desired gateways to the state file if they changed"""
+        if not self.state_file or not self._state_changed:
+            return
+        self._state_changed = False
+        if self._desired == self._saved:
+            return
+        tmp_path = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"gateways": self._desired}, f)
+            os.replace(tmp_path, self.state_file)
+            self._saved = dict(self._desired)
+        except OSError as e:
+            logger.warning("Failed to write state file %s: %s", self.state_file, e)
+
+    def add_route(self, interface, gateway_ip: str):
+        """Record that an interface should be routed via gateway_ip"""
+        with self._lock:
+            if self._desired.get(interface.name) != gateway_ip:
+                self._desired[interface.name] = gateway_ip
+                self._state_changed = True
+            self._interfaces[interface.name] = interface
+            self._dirty.add(interface.name)
+
+    def remove_route(self, interface):
+        """Record that an interface should have no route"""
+        with self._lock:
+            if self._desired.pop(interface.name, None) is not None:
+                self._state_changed = True
+            self._interfaces[interface.name] = interface
+            self._dirty.add(interface.name)
+
+    def forget(self, name: str):
+        """Stop tracking an interface that is no longer monitored.
+
+        Its route must already have been removed and flushed.
+        """
+        with self._lock:
+            if self._desired.pop(name, None) is not None:
+                self._state_changed = True
+            self._interfaces.pop(name, None)
+            self._weights.pop(name, None)
+            self._dirty.discard(name)
+
+    def flush(self):
+        """Apply the changes between desired and installed routes.
+
+        Only interfaces updated since the last flush are compared. When a
+        drift check is due the backend's actual routes are read first, and
+        interfaces whose route has gone missing are reinstalled.
+        """
+        withdrawn = []
+        with self._lock:
+            names, self._dirty = self._dirty, set()
+            drifted = set()
+            if self.interval and monotonic() >= self._next_check:
+                self._next_check = monotonic() + self.interval
+                drifted = self._find_drift()
+                names |= drifted
+
+            installed = self.backend.installed_routes
+            changes = 0
+            for name in names:
+                interface = self._interfaces[name]
+                gateway_ip = self._desired.get(name)
+                if gateway_ip is None:
+                    if name in installed:
+                        self.backend.remove_route(interface)
+                        self._weights.pop(name, None)
+                        withdrawn.append(name)
+                        changes += 1
+                    continue
+
+                weight = interface.effective_weight
+                if name in drifted:
+                    self.backend.forget(name)
+                elif (
+                    installed.get(name) == (gateway_ip, interface.metric)
+                    and self._weights.get(name) == weight
+                ):
+                    continue
+                self.backend.add_route(interface, gateway_ip)
+                self._weights[name] = weight
+                changes += 1
+
+            if changes:
+                logger.debug("Reconciling %d route change(s)", changes)
+                self._timed("flush", self.backend.flush)
+            self._save_state()
+
+        # Outside the lock, so other flushes are not held up meanwhile
+        if self.conntrack is not None:
+            for name in withdrawn:
+                self.conntrack.flush(name)
+
+    def _timed(self, operation: str, call, *args):
+        """Run a backend operation, recording its duration"""
+        started = monotonic()
+        try:
+            return call(*args)
+        finally:
+            BACKEND_OPERATION.observe(
+                monotonic() - started,
+                getattr(self.backend, "name", type(self.backend).__name__),
+                operation,
+            )
+
+    def _find_drift(self) -> set:
+        """Names of interfaces whose installed route is missing in practice.
+
+        Routes are compared on interface, gateway and metric, so a route
+        left in place with another metric or on another interface does not
+        hide a missing one.
+        """
+        try:
+            actual = self._timed("read_routes", self.backend.actual_routes)
+        except Exception as e:
+            # Backends fail with their own errors (netlink or vtysh), none of
+            # which should stop the flush
+            logger.warning(
+                "Failed to read actual routes, skipping drift check: %s",
+                e,
+                exc_info=True,
+            )
+            return set()
+
+        drifted = set()
+        for name, route in self.backend.installed_routes.items():
+            gateway_ip, metric = route
+            if self._desired.get(name) != gateway_ip:
+                continue
+            if route not in actual.get(name, ()):
+                logger.warning(
+                    "Route for %s via %s (metric %s) is missing, reinstalling",
+                    name,
+                    gateway_ip,
+                    metric,
+                )
+                drifted.add(name)
+        return drifted
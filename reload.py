@@ -0,0 +1,316 @@
+"""
+Configuration hot reload and automatic interface membership.
+
+This module re-reads the configuration file while the daemon is running, or
+follows links appearing and disappearing for [interface.auto], and applies
+only the difference to the live interfaces:
+- New interfaces start being probed, and removed ones stop being probed and
+  have their route withdrawn
+- Changed interfaces are updated in place and keep their health, gateway and
+  route. A new metric or weight re-installs the route without withdrawing it
+  first, and new targets or probe settings trigger an immediate check
+- [general] settings that are read at run time take effect at once; those
+  fixed at startup are reported and keep their running value
+- The probe worker pool is resized when max_workers changes, or when it
+  follows the interfaces and their number changes
+
+Interfaces whose settings did not change are not touched at all.
+"""
+
+import logging
+import threading
+
+from config import load_config
+from metrics import CONFIG_RELOADS
+from path_stats import MAX_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+# [general] settings applied to the running daemon on reload
+RUNTIME_SETTINGS = (
+    "log_level",
+    "jitter",
+    "neighbour_probe_mode",
+    "probe_wave_size",
+    "gateway_head_start",
+    "reconcile_interval",
+    "rtt_tolerance_ms",
+    "degraded_loss",
+    "degraded_rtt_ms",
+    "max_workers",
+)
+
+# [general] settings that only take effect after a restart. The default
+# multipath_metric follows the interface metrics, so it is reported when
+# those change it too
+RESTART_SETTINGS = (
+    "routing_backend",
+    "probe_backend",
+    "kernel_route_mode",
+    "multipath_metric",
+    "nexthop_group_id",
+    "route_prefixes",
+    "route_tables",
+    "route_protocol",
+    "state_file",
+    "dynamic_weights",
+    "stats_window",
+    "dampening_half_life",
+    "dampening_penalty",
+    "dampening_suppress_limit",
+    "dampening_reuse_limit",
+    "dampening_max_suppress",
+    "metrics_listen",
+    "conntrack_flush",
+)
+
+# Interface settings that change what a check probes, so the interface is
+# checked again right away
+PROBE_SETTINGS = {
+    "target_ip",
+    "check_port",
+    "targets",
+    "quorum",
+    "targets_per_check",
+    "timeout_ms",
+}
+
+
+class ConfigReloader:
+    """Applies a re-read configuration to the running daemon.
+
+    Attributes:
+        config: Config the daemon is running with, updated in place
+        interfaces: dict - Interface name → Interface being monitored, shared
+                           with the link event handler
+        scheduler: ProbeScheduler the interfaces are checked on
+        routing_client: RouteReconciler in front of the routing backend
+        weight_scale: int - Factor applied to configured weights
+        path_stats: PathStats of the probed paths (optional)
+        dampener: FlapDampener of the interfaces (optional)
+        discovery: LinkDiscovery of the links [interface.auto] applies to
+                   (optional)
+        ranker: GatewayRanker remembering each interface's gateways
+                (optional)
+        engine: ProbeEngine running the checks, resized to the configured
+                worker count (optional)
+        prober: Probe backend holding a socket per interface (optional)
+    """
+
+    def __init__(
+        self,
+        config,
+        interfaces: dict,
+        scheduler,
+        routing_client,
+        weight_scale: int = 1,
+        path_stats=None,
+        dampener=None,
+        discovery=None,
+        ranker=None,
+        engine=None,
+        prober=None,
+    ):
+        self.config = config
+        self.interfaces = interfaces
+        self.scheduler = scheduler
+        self.routing_client = routing_client
+        self.weight_scale = weight_scale
+        self.path_stats = path_stats
+        self.dampener = dampener
+        self.discovery = discovery
+        self.ranker = ranker
+        self.engine = engine
+        self.prober = prober
+        self._requested = threading.Event()
+
+    def request(self, *_):
+        """Ask for a reload at the next scheduler wakeup.
+
+        Usable directly as a signal handler.
+        """
+        self._requested.set()
+        self.scheduler.interrupt()
+
+    def reload_if_requested(self) -> bool:
+        """Reload if a reload was requested, returning whether it was"""
+        if not self._requested.is_set():
+            return False
+        self._requested.clear()
+        self.reload()
+        return True
+
+    def reload(self):
+        """Re-read the configuration file and apply what changed.
+
+        An invalid file is logged and ignored, leaving the running
+        configuration as it was.
+        """
+        logger.info("Reloading configuration")
+        try:
+            new_config = load_config()
+        except (OSError, KeyError, ValueError) as e:
+            CONFIG_RELOADS.inc("failed")
+            logger.error("Keeping the running configuration, reload failed: %s", e)
+            return
+
+        self._apply_general(new_config)
+
+        auto = self.config.auto_interfaces = new_config.auto_interfaces
+        wanted = {interface.name: interface for interface in new_config.interfaces}
+        if auto is not None and self.discovery is not None:
+            for name in auto.select(self.discovery.links(), wanted):
+                wanted[name] = auto.create(name)
+        added, removed, changed = self._apply(wanted)
+
+        CONFIG_RELOADS.inc("applied")
+        logger.info(
+            "Configuration reloaded: %d interface(s) added, %d removed, "
+            "%d changed, %d unchanged",
+            added,
+            removed,
+            changed,
+            len(self.config.interfaces) - added - changed,
+        )
+
+    def sync_links(self):
+        """Start or stop probing automatic interfaces after links appeared
+        or vanished"""
+        auto = self.config.auto_interfaces
+        current = {interface.name: interface for interface in self.config.interfaces}
+        wanted = {
+            name: interface
+            for name, interface in current.items()
+            if not interface.automatic
+        }
+        if auto is not None and self.discovery is not None:
+            for name in auto.select(self.discovery.links(), wanted):
+                wanted[name] = current.get(name) or auto.create(name)
+        if wanted.keys() != current.keys():
+            self._apply(wanted)
+
+    def _apply(self, wanted: dict) -> tuple:
+        """Make the monitored interfaces those of a name → Interface map.
+
+        Returns:
+            tuple: Number of interfaces added, removed and changed
+        """
+        current = {interface.name: interface for interface in self.config.interfaces}
+        removed = [current[name] for name in current if name not in wanted]
+        added = [wanted[name] for name in wanted if name not in current]
+        changed = 0
+        for name, interface in current.items():
+            if name in wanted and self._update(interface, wanted[name]):
+                changed += 1
+        for interface in removed:
+            self._remove(interface)
+        for interface in added:
+            self._add(interface)
+
+        if removed or changed:
+            self.routing_client.flush()
+        for interface in removed:
+            self.routing_client.forget(interface.name)
+            if self.path_stats is not None:
+                self.path_stats.forget(interface.name)
+            if self.dampener is not None:
+                self.dampener.forget(interface.name)
+            if self.ranker is not None:
+                self.ranker.forget(interface.name)
+            if self.prober is not None:
+                self.prober.forget(interface.name)
+        self._resize_engine()
+        return len(added), len(removed), changed
+
+    def _apply_general(self, new_config):
+        """Take over the [general] settings that can change at run time"""
+        for name in RESTART_SETTINGS:
+            if getattr(new_config, name) != getattr(self.config, name):
+                logger.warning(
+                    "Changing %s requires a restart, keeping %r",
+                    name,
+                    getattr(self.config, name),
+                )
+        for name in RUNTIME_SETTINGS:
+            value = getattr(new_config, name)
+            if value != getattr(self.config, name):
+                logger.info(
+                    "Changed %s from %r to %r", name, getattr(self.config, name), value
+                )
+                setattr(self.config, name, value)
+
+        logging.getLogger().setLevel(self.config.log_level)
+        self.scheduler.jitter = self.config.jitter
+        self.routing_client.interval = self.config.reconcile_interval
+        if self.path_stats is not None:
+            self.path_stats.rtt_tolerance_ms = self.config.rtt_tolerance_ms
+            self.path_stats.degraded_loss = self.config.degraded_loss
+            self.path_stats.degraded_rtt_ms = self.config.degraded_rtt_ms
+
+    def _resize_engine(self):
+        """Match the worker pool to max_workers or the interface count"""
+        if self.engine is None:
+            return
+        workers = self.config.worker_count()
+        if workers != self.engine.max_workers:
+            logger.info(
+                "Checking interfaces with up to %d worker(s), was %d",
+                workers,
+                self.engine.max_workers,
+            )
+            self.engine.resize(workers)
+
+    def _full_weight(self, interface) -> int:
+        return min(MAX_WEIGHT, interface.weight * self.weight_scale)
+
+    def _add(self, interface):
+        """Start probing a new interface"""
+        interface.effective_weight = self._full_weight(interface)
+        self.config.interfaces.append(interface)
+        self.interfaces[interface.name] = interface
+        self.scheduler.add(interface)
+        logger.info("Started monitoring %s", interface.name)
+
+    def _remove(self, interface):
+        """Stop probing an interface and withdraw its route"""
+        self.scheduler.remove(interface)
+        with interface.lock:
+            # Makes a check still running on the interface discard its result
+            interface.link_generation += 1
+            if interface.gateway:
+                logger.info(
+                    "Withdrawing route for %s via gateway %s",
+                    interface.name,
+                    interface.gateway,
+                )
+                self.routing_client.remove_route(interface)
+                interface.gateway = None
+                interface.route_changes += 1
+        self.config.interfaces.remove(interface)
+        self.interfaces.pop(interface.name, None)
+        logger.info("Stopped monitoring %s", interface.name)
+
+    def _update(self, interface, new_interface) -> bool:
+        """Apply changed settings to a live interface, returning whether any
+        setting changed"""
+        if new_interface is interface:
+            return False
+        # An interface moved between [interface.auto] and its own section
+        interface.automatic = new_interface.automatic
+        with interface.lock:
+            changed = interface.update_settings(new_interface)
+            if not changed:
+                return False
+            if "weight" in changed:
+                # Dynamic weights adjust this again on the next check
+                interface.effective_weight = self._full_weight(interface)
+            if interface.gateway and changed & {"metric", "weight"}:
+                # Re-installed in place by the backend, never withdrawn
+                self.routing_client.add_route(interface, interface.gateway)
+        logger.info("Updated %s of %s", ", ".join(sorted(changed)), interface.name)
+
+        if changed & PROBE_SETTINGS:
+            self.scheduler.wake(interface)
+        elif changed & interface.SCHEDULE_SETTINGS:
+            self.scheduler.reschedule(interface)
+        return True
@@ -0,0 +1,205 @@
+"""
+Per-interface probe scheduling.
+
+This module provides a deadline scheduler for interface health checks that:
+- Runs every interface on its own interval instead of the fastest one, an
+  interval that adapts to the interface's state (see Interface.next_interval)
+- Spreads probes out with random jitter so they do not all fire at once
+- Hands due interfaces to the caller in batches as their deadlines pass
+- Lets events wake an interface for an immediate check, or only when its
+  next check is far off, so backed-off interfaces can be pulled forward
+- Adds, removes and reschedules interfaces while running, for config reloads.
+  Calls for an Interface object that is no longer the one scheduled under its
+  name, such as a check finishing after a reload replaced its interface, are
+  ignored
+
+Deadlines are kept in a heap keyed on monotonic time, so finding the next
+interface to probe is O(log n) regardless of how many interfaces are monitored.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeScheduler:
+    """Deadline heap that schedules each interface at its own interval.
+
+    Attributes:
+        jitter: float - Fraction of the interval used to randomise deadlines
+                        (0.1 spreads probes over +/-10% of the interval)
+        last_lag: float - Seconds the most recent batch started past its deadline
+    """
+
+    def __init__(self, jitter: float = 0.1):
+        self.jitter = jitter
+        self.last_lag = 0.0
+        self._heap = []  # (deadline, seq, interface)
+        self._interfaces = {}  # Interface name → Interface being scheduled
+        self._tokens = {}  # Interface name → seq of its live heap entry
+        self._deadlines = {}  # Interface name → deadline of its live heap entry
+        self._in_flight = set()  # Names handed out by pop_due() not yet rescheduled
+        self._woken = set()  # In-flight names to re-check as soon as they finish
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._interrupted = False
+
+    def add(self, interface):
+        """Start scheduling an interface, first probe within its jitter window"""
+        delay = random.uniform(0, interface.check_interval * self.jitter)
+        with self._cond:
+            self._interfaces[interface.name] = interface
+            self._push(interface, delay)
+
+    def schedule(self, interface, delay: float | None = None):
+        """Schedule the next probe of an interface.
+
+        Without an explicit delay the interface's next interval is used,
+        randomised by the configured jitter, unless the interface was woken
+        while its check was running. Interfaces removed or replaced in the
+        meantime are not scheduled again.
+        """
+        with self._cond:
+            if not self._current(interface):
+                return
+            self._in_flight.discard(interface.name)
+            if interface.name in self._woken:
+                self._woken.discard(interface.name)
+                delay = 0
+            elif delay is None:
+                delay = self._jittered(interface.next_interval())
+            self._push(interface, delay)
+        logger.debug("Next check of %s in %.3fs", interface.name, delay)
+
+    def wake(self, interface):
+        """Check an interface immediately, or right after its running check"""
+        with self._cond:
+            if not self._current(interface):
+                return
+            if interface.name in self._in_flight:
+                self._woken.add(interface.name)
+            elif interface.name in self._tokens:
+                self._push(interface, 0)
+        logger.debug("Woke %s for an immediate check", interface.name)
+
+    def hasten(self, interface, within: float) -> bool:
+        """Check a waiting interface now if its next check is more than
+        within seconds away, returning whether it was woken"""
+        with self._cond:
+            deadline = self._deadlines.get(interface.name)
+            if (
+                not self._current(interface)
+                or deadline is None
+                or deadline - monotonic() <= within
+            ):
+                return False
+            self._push(interface, 0)
+        logger.debug("Woke backed-off %s for an immediate check", interface.name)
+        return True
+
+    def reschedule(self, interface):
+        """Move the next check of a waiting interface to its next interval
+        from now, after the interval changed. In-flight interfaces use the
+        new interval once their check finishes."""
+        with self._cond:
+            if not self._current(interface) or interface.name not in self._tokens:
+                return
+            delay = self._jittered(interface.next_interval())
+            self._push(interface, delay)
+        logger.debug("Next check of %s moved to %.3fs", interface.name, delay)
+
+    def remove(self, interface):
+        """Stop scheduling an interface (its heap entry is discarded lazily)"""
+        with self._cond:
+            if not self._current(interface):
+                return
+            del self._interfaces[interface.name]
+            self._tokens.pop(interface.name, None)
+            self._deadlines.pop(interface.name, None)
+            self._in_flight.discard(interface.name)
+            self._woken.discard(interface.name)
+
+    def _current(self, interface) -> bool:
+        """Whether an interface is the one scheduled under its name"""
+        return self._interfaces.get(interface.name) is interface
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, interface, delay: float):
+        seq = next(self._counter)
+        deadline = monotonic() + delay
+        self._tokens[interface.name] = seq
+        self._deadlines[interface.name] = deadline
+        heapq.heappush(self._heap, (deadline, seq, interface))
+        self._cond.notify()
+
+    def stop(self):
+        """Wake any waiter in pop_due() and make it return an empty batch"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def interrupt(self):
+        """Make pop_due() return an empty batch once, without stopping.
+
+        Safe to call from a signal handler running on the waiting thread.
+        """
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def pop_due(self) -> list:
+        """Block until at least one interface is due and return all due ones.
+
+        Returned interfaces are no longer scheduled; the caller reschedules
+        each of them once its check has finished, so an interface is never
+        probed twice concurrently. An empty batch is returned once the
+        scheduler is stopped or interrupted.
+        """
+        with self._cond:
+            while not self._stopped:
+                if self._interrupted:
+                    self._interrupted = False
+                    return []
+                self._discard_stale()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                now = monotonic()
+                deadline = self._heap[0][0]
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    continue
+
+                self.last_lag = now - deadline
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, seq, interface = heapq.heappop(self._heap)
+                    if self._tokens.get(interface.name) == seq:
+                        del self._tokens[interface.name]
+                        del self._deadlines[interface.name]
+                        self._in_flight.add(interface.name)
+                        due.append(interface)
+                if due:
+                    return due
+            return []
+
+    def _discard_stale(self):
+        """Drop heap entries superseded by a later schedule() or remove()"""
+        while self._heap:
+            _, seq, interface = self._heap[0]
+            if self._tokens.get(interface.name) == seq:
+                return
+            heapq.heappop(self._heap)
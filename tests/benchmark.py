@@ -0,0 +1,801 @@
+"""
+Benchmark and failover-time harness for ECMP Manager.
+
+This script builds a throwaway topology out of network namespaces and
+measures the daemon against it:
+- One "host" namespace holding an uplink veth per scripted gateway, so the
+  routes the daemon installs never touch the machine's own routing table
+- One namespace per gateway with the check target on its loopback. Gateways
+  are healthy, dead (target missing), slow (netem delay, when the kernel
+  has sch_netem) or flapping (target toggled during the flapping phase)
+- A stub vtysh (tests/stub/vtysh) standing in for FRR
+
+It reports, for each probe backend, probes per second and CPU time per probe,
+and for each routing backend (kernel, frr) the time to the first and to all
+routes at startup, the daemon's CPU time per probe, steady-state routing
+operations per check cycle, the time from an injected failure to the route's
+withdrawal and back, and the route changes caused by flapping gateways.
+Results are printed (or written with --output) as a single JSON document so
+they can be compared between runs.
+
+Must be run as root from a checkout, with the daemon's requirements
+installed:
+
+    sudo python tests/benchmark.py --uplinks 8 --output results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_DIR = os.path.join(REPO_DIR, "tests", "stub")
+sys.path.insert(0, REPO_DIR)
+
+from pyroute2 import IPRoute, netns
+
+from config.interfaces import Interface
+
+RESULTS_VERSION = 1
+
+HOST_NS = "ecmpbench"
+GATEWAY_NS = "ecmpbench-gw{}"
+UPLINK = "eb{}"
+TARGET_IP = "198.51.100.1"
+TARGET_PORT = 80
+SLOW_DELAY_MS = 50
+METRICS_PORT = 9181
+PROBE_BACKENDS = ("native", "scapy")
+ROUTING_BACKENDS = ("kernel", "frr")
+PROBE_WORKERS = 32  # Threads probing in parallel, as many as the daemon's pool
+
+# Scaling target checked by --scale-target, see "Benchmarks" in the README.
+# Thresholds are relative to the check interval so they hold for any
+# interval the target is run with.
+SCALE_TARGET = {
+    "uplinks": 1000,
+    "check_interval": 5,
+    # 99% of check batches start within a tenth of the interval of their
+    # deadline
+    "scheduler_lag_p99_fraction": 0.1,
+    # Nothing is sent to the routing backend while nothing changes
+    "routing_operations_per_cycle": 0,
+    # Threads stay bounded by the worker pool, not the number of uplinks
+    "max_threads": 64,
+    # A failed uplink is withdrawn within two intervals of the failure
+    "withdrawal_fraction": 2,
+}
+
+# Accepts connections on the check port so probes are answered with SYN-ACKs
+LISTENER = """
+import socket, time
+sock = socket.socket()
+sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+sock.bind(("0.0.0.0", {port}))
+sock.listen(4096)
+while True:
+    time.sleep(3600)
+"""
+
+
+def _run(command: str, check=True):
+    return subprocess.run(command.split(), check=check, capture_output=True, text=True)
+
+
+def _batch(namespace: str, commands: list):
+    """Run ip commands in a namespace through a single ip -batch process"""
+    subprocess.run(
+        ["ip", "-n", namespace, "-batch", "-"],
+        input="\n".join(commands) + "\n",
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def _host_ip(index: int) -> str:
+    return f"10.{128 + (index >> 8)}.{index & 0xFF}.1"
+
+
+def _gateway_ip(index: int) -> str:
+    return f"10.{128 + (index >> 8)}.{index & 0xFF}.254"
+
+
+def _roles(args) -> list:
+    """Role of every uplink, healthy ones first"""
+    scripted = (
+        ["slow"] * args.slow + ["flapping"] * args.flapping + ["dead"] * args.dead
+    )
+    return ["healthy"] * (args.uplinks - len(scripted)) + scripted
+
+
+class Topology:
+    """Host and gateway namespaces connected by one veth pair per uplink"""
+
+    def __init__(self, roles: list):
+        self.roles = roles
+        self.macs = {}  # Uplink index → gateway MAC
+        self.slow_applied = False
+        self._listeners = []
+
+    def _add_gateway(self, gateway_ns: str):
+        """Create a gateway namespace answering probes on the check port"""
+        _run(f"ip netns add {gateway_ns}")
+        _run(f"ip -n {gateway_ns} link set lo up")
+        _run(f"ip -n {gateway_ns} addr add {TARGET_IP}/32 dev lo")
+        # Keep the target address out of ARP, so it never shows up as a
+        # neighbour of the uplink, and answer every SYN with a cookie so the
+        # half-open connections left by earlier probes never hold state a
+        # later probe from the same source port runs into
+        for setting in (
+            "conf.all.arp_announce=2",
+            "conf.all.arp_ignore=1",
+            "tcp_syncookies=2",
+        ):
+            _run(f"ip netns exec {gateway_ns} sysctl -qw net.ipv4.{setting}")
+        self._listeners.append(
+            subprocess.Popen(
+                ["ip", "netns", "exec", gateway_ns, sys.executable, "-c"]
+                + [LISTENER.format(port=TARGET_PORT)]
+            )
+        )
+
+    def build(self):
+        self.destroy()
+        _run(f"ip netns add {HOST_NS}")
+        _run(f"ip -n {HOST_NS} link set lo up")
+        for index, role in enumerate(self.roles):
+            gateway_ns = GATEWAY_NS.format(index)
+            uplink = UPLINK.format(index)
+            self._add_gateway(gateway_ns)
+            _run(
+                f"ip -n {HOST_NS} link add {uplink} type veth "
+                f"peer name gw netns {gateway_ns}"
+            )
+            _run(f"ip -n {HOST_NS} addr add {_host_ip(index)}/24 dev {uplink}")
+            _run(f"ip -n {HOST_NS} link set {uplink} up")
+            _run(f"ip -n {gateway_ns} addr add {_gateway_ip(index)}/24 dev gw")
+            _run(f"ip -n {gateway_ns} link set gw up")
+            if role == "dead":
+                self.set_target(index, False)
+            if role == "slow":
+                result = _run(
+                    f"tc -n {gateway_ns} qdisc add dev gw root "
+                    f"netem delay {SLOW_DELAY_MS}ms",
+                    check=False,
+                )
+                self.slow_applied = result.returncode == 0
+                if not self.slow_applied:
+                    print(
+                        f"warning: netem unavailable, {uplink} is not slowed down",
+                        file=sys.stderr,
+                    )
+            link = json.loads(_run(f"ip -n {gateway_ns} -json link show gw").stdout)
+            self.macs[index] = link[0]["address"]
+            # Pin the gateway so the daemon finds it in the neighbour table
+            _run(
+                f"ip -n {HOST_NS} neigh replace {_gateway_ip(index)} "
+                f"lladdr {self.macs[index]} dev {uplink} nud permanent"
+            )
+
+    def set_target(self, index: int, present: bool):
+        """Add or remove the check target of a gateway"""
+        action = "add" if present else "del"
+        _run(
+            f"ip -n {GATEWAY_NS.format(index)} addr {action} {TARGET_IP}/32 dev lo",
+            check=False,
+        )
+
+    def destroy(self):
+        for listener in self._listeners:
+            listener.kill()
+            listener.wait()
+        self._listeners = []
+        for name in _run("ip netns list").stdout.split("\n"):
+            name = name.split(" ", 1)[0]
+            if name == HOST_NS or name.startswith(GATEWAY_NS.format("")):
+                _run(f"ip netns del {name}", check=False)
+
+
+class SharedGatewayTopology(Topology):
+    """One veth pair per uplink, all ending in a single gateway namespace,
+    so thousands of uplinks need no more than one namespace and listener.
+
+    A gateway is made unreachable by removing its address on the gateway
+    side: the uplink keeps its carrier, but the gateway has no route back
+    for its answers. Slow gateways are not supported.
+    """
+
+    # Uplink addresses are 10.128.0.0/9 split into /24s
+    MAX_UPLINKS = 128 * 256
+
+    def build(self):
+        self.destroy()
+        gateway_ns = GATEWAY_NS.format(0)
+        _run(f"ip netns add {HOST_NS}")
+        _run(f"ip -n {HOST_NS} link set lo up")
+        self._add_gateway(gateway_ns)
+
+        pairs, host, gateway = [], [], []
+        for index, role in enumerate(self.roles):
+            uplink = UPLINK.format(index)
+            pairs.append(
+                f"link add {uplink} type veth peer name gw{index} netns {gateway_ns}"
+            )
+            host += [
+                f"addr add {_host_ip(index)}/24 dev {uplink}",
+                f"link set {uplink} up",
+            ]
+            gateway.append(f"link set gw{index} up")
+            if role != "dead":
+                gateway.append(f"addr add {_gateway_ip(index)}/24 dev gw{index}")
+        _batch(HOST_NS, pairs + host)
+        _batch(gateway_ns, gateway)
+
+        links = json.loads(_run(f"ip -n {gateway_ns} -json link show").stdout)
+        macs = {link["ifname"]: link.get("address") for link in links}
+        # Pin the gateways so the daemon finds them in the neighbour table
+        neighbours = []
+        for index in range(len(self.roles)):
+            self.macs[index] = macs[f"gw{index}"]
+            neighbours.append(
+                f"neigh replace {_gateway_ip(index)} lladdr {self.macs[index]} "
+                f"dev {UPLINK.format(index)} nud permanent"
+            )
+        _batch(HOST_NS, neighbours)
+
+    def set_target(self, index: int, present: bool):
+        """Add or remove the gateway's address on its end of the uplink"""
+        action = "add" if present else "del"
+        _run(
+            f"ip -n {GATEWAY_NS.format(0)} addr {action} "
+            f"{_gateway_ip(index)}/24 dev gw{index}",
+            check=False,
+        )
+
+
+class Flapper(threading.Thread):
+    """Toggles the targets of the flapping gateways every period seconds"""
+
+    def __init__(self, topology: Topology, indexes: list, period: float):
+        super().__init__(daemon=True)
+        self.topology = topology
+        self.indexes = indexes
+        self.period = period
+        self.stopped = threading.Event()
+
+    def run(self):
+        present = True
+        while not self.stopped.wait(self.period):
+            present = not present
+            for index in self.indexes:
+                self.topology.set_target(index, present)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        for index in self.indexes:
+            self.topology.set_target(index, True)
+
+
+def bench_prober(backend: str, topology: Topology, duration: float) -> dict:
+    """Probe every healthy uplink back to back for duration seconds"""
+    # Imported only once inside the host namespace, as scapy reads the
+    # interface list when it is first imported
+    from prober import create_prober
+
+    # Without a default route in the namespace scapy warns on every probe
+    logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
+
+    indexes = [i for i, role in enumerate(topology.roles) if role == "healthy"]
+    prober = create_prober(backend)
+    counts = {"probes": 0, "answered": 0}
+    lock = threading.Lock()
+    deadline = monotonic() + duration
+    workers = min(len(indexes), PROBE_WORKERS)
+
+    def probe_uplinks(worker):
+        uplinks = [
+            (
+                Interface(UPLINK.format(index), 100, 1, TARGET_IP),
+                (_gateway_ip(index), topology.macs[index]),
+            )
+            for index in indexes[worker::workers]
+        ]
+        probes = answered = 0
+        while monotonic() < deadline:
+            interface, neighbour = uplinks[probes % len(uplinks)]
+            winner = prober.probe_many(
+                interface, [neighbour], [(TARGET_IP, TARGET_PORT)], timeout=1
+            )
+            probes += 1
+            answered += winner is not None
+        with lock:
+            counts["probes"] += probes
+            counts["answered"] += answered
+
+    cpu_started = time.process_time()
+    started = monotonic()
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(probe_uplinks, range(workers)))
+    finally:
+        prober.close()
+    elapsed = monotonic() - started
+    cpu = time.process_time() - cpu_started
+
+    probes = counts["probes"]
+    return {
+        "uplinks": len(indexes),
+        "probes": probes,
+        "answered": counts["answered"],
+        "probes_per_second": round(probes / elapsed, 1),
+        "cpu_per_probe_us": round(cpu / probes * 1e6, 1) if probes else None,
+    }
+
+
+def _scrape() -> dict:
+    """Daemon metrics as (name, sorted label pairs) → value"""
+    url = f"http://127.0.0.1:{METRICS_PORT}/metrics"
+    with urllib.request.urlopen(url, timeout=2) as response:
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, labels = series.partition("{")
+        pairs = tuple(
+            sorted(
+                tuple(pair.split("=", 1))
+                for pair in labels.rstrip("}").replace('"', "").split(",")
+                if pair
+            )
+        )
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+def _total(samples: dict, name: str, **labels) -> float:
+    """Sum of the samples of a metric matching all the given labels"""
+    wanted = set(labels.items())
+    return sum(
+        value
+        for (sample_name, pairs), value in samples.items()
+        if sample_name == name and wanted <= set(pairs)
+    )
+
+
+def _histogram_quantile(before: dict, after: dict, name: str, quantile: float):
+    """Upper bucket bound of a quantile of the observations between scrapes"""
+    counts = {}
+    for (sample_name, pairs), value in after.items():
+        if sample_name == f"{name}_bucket":
+            bound = float(dict(pairs)["le"].replace("+Inf", "inf"))
+            counts[bound] = (
+                counts.get(bound, 0) + value - before.get((sample_name, pairs), 0)
+            )
+    total = counts.get(float("inf"), 0)
+    if not total:
+        return None
+    for bound in sorted(counts):
+        if counts[bound] >= quantile * total:
+            return bound
+
+
+def _process_stats(pid: int) -> dict:
+    """Threads, resident memory and open file descriptors of a process"""
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()
+    return {
+        "threads": int(status["Threads"][0]),
+        "rss_mib": round(int(status["VmRSS"][0]) / 1024, 1),
+        "open_fds": len(os.listdir(f"/proc/{pid}/fd")),
+    }
+
+
+def _cpu_seconds(pid: int) -> float:
+    """User plus system CPU time of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Daemon:
+    """The daemon running against the benchmark topology"""
+
+    def __init__(self, backend: str, topology: Topology, args, workdir: str):
+        self.backend = backend
+        self.topology = topology
+        self.workdir = workdir
+        self.stub_state = os.path.join(workdir, "vtysh-state.json")
+        self.stub_log = os.path.join(workdir, "vtysh-log.jsonl")
+        self.log_path = os.path.join(workdir, f"daemon-{backend}.log")
+        self.config_path = os.path.join(workdir, f"config-{backend}.toml")
+        self._ipr = IPRoute()
+        self._write_config(args)
+        self.process = None
+
+    def _write_config(self, args):
+        lines = []
+        for index in range(len(self.topology.roles)):
+            lines += [
+                f"[interface.{UPLINK.format(index)}]",
+                f"check_interval = {args.check_interval}",
+                f"timeout_ms = {args.timeout_ms}",
+                f'target_ip = "{TARGET_IP}"',
+                f"metric = {100 + index}",
+                "",
+            ]
+        lines += [
+            "[general]",
+            f'backend = "{self.backend}"',
+            'log_level = "INFO"',
+            f'metrics_listen = "127.0.0.1:{METRICS_PORT}"',
+        ]
+        with open(self.config_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def start(self):
+        for path in (self.stub_state, self.stub_log):
+            if os.path.exists(path):
+                os.remove(path)
+        env = dict(
+            os.environ,
+            ECMP_CONFIG_PATH=self.config_path,
+            PATH=STUB_DIR + os.pathsep + os.environ.get("PATH", ""),
+            VTYSH_STUB_STATE=self.stub_state,
+            VTYSH_STUB_LOG=self.stub_log,
+        )
+        self.started = monotonic()
+        # The daemon writes to its own copy of the log file descriptor
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                # Through ip netns exec, which also mounts the namespace's
+                # /sys the daemon reads interface states from
+                ["ip", "netns", "exec", HOST_NS, sys.executable, "-u", "daemon.py"],
+                cwd=REPO_DIR,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+        # Routes are left in place for warm restarts, clear them for the
+        # next backend
+        _run("ip route flush exact 0.0.0.0/0", check=False)
+
+    def log_tail(self, lines: int = 20) -> str:
+        with open(self.log_path) as f:
+            return "".join(f.readlines()[-lines:])
+
+    def routed(self) -> set:
+        """Indexes of the uplinks currently holding a default route"""
+        if self.backend == "frr":
+            try:
+                with open(self.stub_state) as f:
+                    gateways = {route["gateway"] for route in json.load(f)}
+            except (FileNotFoundError, ValueError):
+                return set()
+        else:
+            gateways = set()
+            for route in self._ipr.get_routes(family=2, table=254, dst_len=0):
+                gateways.add(route.get_attr("RTA_GATEWAY"))
+                for nexthop in route.get_attr("RTA_MULTIPATH") or ():
+                    gateways.add(nexthop.get_attr("RTA_GATEWAY"))
+        return {
+            index
+            for index in range(len(self.topology.roles))
+            if _gateway_ip(index) in gateways
+        }
+
+    def wait_for(self, condition, timeout: float, poll: float = 0.005):
+        """Seconds until condition(routed) held, or None on timeout"""
+        started = monotonic()
+        while monotonic() - started < timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"Daemon exited with code {self.process.returncode}:\n"
+                    + self.log_tail()
+                )
+            if condition(self.routed()):
+                return monotonic() - started
+            time.sleep(poll)
+        return None
+
+    def routing_operations(self, samples: dict) -> float:
+        """Routing operations sent to the backend so far"""
+        if self.backend == "frr":
+            # Every vtysh session changing the configuration
+            try:
+                with open(self.stub_log) as f:
+                    return sum(
+                        json.loads(line)["command"].startswith("configure")
+                        for line in f
+                    )
+            except FileNotFoundError:
+                return 0
+        return _total(
+            samples, "ecmp_backend_operation_seconds_count", operation="flush"
+        )
+
+
+def bench_daemon(backend: str, topology: Topology, args, workdir: str) -> dict:
+    roles = topology.roles
+    routable = {i for i, role in enumerate(roles) if role != "dead"}
+    daemon = Daemon(backend, topology, args, workdir)
+    result = {}
+    daemon.start()
+    try:
+        # Startup
+        first = daemon.wait_for(bool, args.route_timeout)
+        first_at = monotonic() - daemon.started
+        everything = daemon.wait_for(lambda r: r >= routable, args.route_timeout)
+        result["startup"] = {
+            "first_route_s": round(first_at, 3) if first is not None else None,
+            "all_routes_s": (
+                round(monotonic() - daemon.started, 3)
+                if everything is not None
+                else None
+            ),
+            "daemon_reported_first_route_s": _scrape().get(
+                ("ecmp_startup_first_route_seconds", ())
+            ),
+        }
+        if everything is None:
+            raise RuntimeError(
+                f"Routes via {sorted(routable - daemon.routed())} never appeared:\n"
+                + daemon.log_tail()
+            )
+
+        # Steady state
+        before = _scrape()
+        cpu_before = _cpu_seconds(daemon.process.pid)
+        time.sleep(args.duration)
+        after = _scrape()
+        cpu = _cpu_seconds(daemon.process.pid) - cpu_before
+        cycles = _total(after, "ecmp_check_cycle_seconds_count") - _total(
+            before, "ecmp_check_cycle_seconds_count"
+        )
+        probes = _total(after, "ecmp_probes_total") - _total(
+            before, "ecmp_probes_total"
+        )
+        operations = daemon.routing_operations(after) - daemon.routing_operations(
+            before
+        )
+        checks = _total(after, "ecmp_checks_total") - _total(
+            before, "ecmp_checks_total"
+        )
+        result["steady_state"] = {
+            "seconds": args.duration,
+            "checks_per_second": round(checks / args.duration, 1),
+            "check_cycles": int(cycles),
+            "scheduler_lag_p99_s": _histogram_quantile(
+                before, after, "ecmp_scheduler_lag_seconds", 0.99
+            ),
+            "probes": int(probes),
+            "daemon_cpu_per_probe_us": round(cpu / probes * 1e6, 1) if probes else None,
+            "daemon_cpu_percent": round(cpu / args.duration * 100, 2),
+            "routing_operations": int(operations),
+            "routing_operations_per_cycle": (
+                round(operations / cycles, 4) if cycles else None
+            ),
+            **_process_stats(daemon.process.pid),
+        }
+
+        # Failover
+        healthy = [i for i, role in enumerate(roles) if role == "healthy"]
+        withdrawals, restores = [], []
+        for trial in range(args.failures):
+            index = healthy[trial % len(healthy)]
+            topology.set_target(index, False)
+            withdrawals.append(
+                daemon.wait_for(lambda r, i=index: i not in r, args.route_timeout)
+            )
+            topology.set_target(index, True)
+            restores.append(
+                daemon.wait_for(lambda r, i=index: i in r, args.route_timeout)
+            )
+            time.sleep(random.uniform(0, args.check_interval))
+        result["failover"] = {
+            "failure_to_withdrawal_s": _summarise(withdrawals),
+            "recovery_to_install_s": _summarise(restores),
+        }
+
+        # Flapping gateways
+        flapping = [i for i, role in enumerate(roles) if role == "flapping"]
+        if flapping:
+            before = _scrape()
+            flapper = Flapper(topology, flapping, args.flap_period)
+            flapper.start()
+            time.sleep(args.duration)
+            flapper.stop()
+            after = _scrape()
+            changes = sum(
+                _total(after, "ecmp_route_changes_total", interface=UPLINK.format(i))
+                - _total(before, "ecmp_route_changes_total", interface=UPLINK.format(i))
+                for i in flapping
+            )
+            result["flapping"] = {
+                "seconds": args.duration,
+                "flap_period_s": args.flap_period,
+                "route_changes": int(changes),
+            }
+
+        withdrawal = _total(after, "ecmp_failure_to_withdrawal_seconds_sum")
+        count = _total(after, "ecmp_failure_to_withdrawal_seconds_count")
+        result["failover"]["daemon_reported_mean_s"] = (
+            round(withdrawal / count, 3) if count else None
+        )
+    finally:
+        daemon.stop()
+    return result
+
+
+def _summarise(values: list) -> dict:
+    measured = [value for value in values if value is not None]
+    return {
+        "samples": [round(value, 3) if value is not None else None for value in values],
+        "median": round(statistics.median(measured), 3) if measured else None,
+        "max": round(max(measured), 3) if measured else None,
+    }
+
+
+def _check_scale_target(results: dict, args) -> dict:
+    """Compare each daemon's results with SCALE_TARGET"""
+    target = SCALE_TARGET
+    checks = {}
+    for backend, result in results["daemon"].items():
+        steady = result["steady_state"]
+        lag = steady["scheduler_lag_p99_s"]
+        withdrawal = result["failover"]["failure_to_withdrawal_s"]["max"]
+        checks[backend] = {
+            "scheduler_lag": lag is not None
+            and lag <= target["scheduler_lag_p99_fraction"] * args.check_interval,
+            "routing_operations": steady["routing_operations_per_cycle"]
+            == target["routing_operations_per_cycle"],
+            "threads": steady["threads"] <= target["max_threads"],
+            "withdrawal": withdrawal is not None
+            and withdrawal <= target["withdrawal_fraction"] * args.check_interval,
+        }
+    return {
+        "target": target,
+        "checks": checks,
+        "met": all(all(c.values()) for c in checks.values()),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uplinks", type=int, default=4)
+    parser.add_argument(
+        "--shared-gateway",
+        action="store_true",
+        help="connect every uplink to a single gateway namespace, for large "
+        "numbers of uplinks",
+    )
+    parser.add_argument("--dead", type=int, default=1)
+    parser.add_argument("--slow", type=int, default=0)
+    parser.add_argument("--flapping", type=int, default=1)
+    parser.add_argument(
+        "--probe-backends", default=",".join(PROBE_BACKENDS), help="comma separated"
+    )
+    parser.add_argument(
+        "--routing-backends", default=",".join(ROUTING_BACKENDS), help="comma separated"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="seconds per measurement"
+    )
+    parser.add_argument("--check-interval", type=float, default=1)
+    parser.add_argument("--timeout-ms", type=int, default=200)
+    parser.add_argument("--failures", type=int, default=5, help="failover trials")
+    parser.add_argument("--flap-period", type=float, default=2)
+    parser.add_argument("--route-timeout", type=float, default=30)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument(
+        "--scale-target",
+        action="store_true",
+        help="run the documented scaling target and exit 1 if it is missed",
+    )
+    args = parser.parse_args()
+
+    if args.scale_target:
+        args.uplinks = SCALE_TARGET["uplinks"]
+        args.check_interval = SCALE_TARGET["check_interval"]
+        args.shared_gateway = True
+        args.slow = 0
+        args.probe_backends = ""
+        args.duration = max(args.duration, 4 * args.check_interval)
+        # Startup on this many interfaces is slow, see "startup" for how slow
+        args.route_timeout = max(args.route_timeout, 300)
+
+    roles = _roles(args)
+    if "healthy" not in roles:
+        parser.error("at least one uplink must be healthy")
+    maximum = SharedGatewayTopology.MAX_UPLINKS
+    if args.shared_gateway and args.slow:
+        parser.error("slow gateways are not supported with --shared-gateway")
+    if args.shared_gateway and args.uplinks > maximum:
+        parser.error(f"at most {maximum} uplinks with --shared-gateway")
+    if os.geteuid() != 0:
+        parser.error("must be run as root")
+
+    topology = SharedGatewayTopology(roles) if args.shared_gateway else Topology(roles)
+    results = {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {
+            "kernel": platform.release(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "topology": {
+            "uplinks": args.uplinks,
+            "shared_gateway": args.shared_gateway,
+            "healthy": roles.count("healthy"),
+            "dead": args.dead,
+            "slow": args.slow,
+            "slow_delay_ms": SLOW_DELAY_MS if args.slow else None,
+            "flapping": args.flapping,
+            "check_interval": args.check_interval,
+            "timeout_ms": args.timeout_ms,
+        },
+        "probe": {},
+        "daemon": {},
+    }
+    try:
+        topology.build()
+        results["topology"]["slow_applied"] = topology.slow_applied
+        # Everything from here on runs inside the host namespace
+        netns.setns(HOST_NS)
+        for backend in filter(None, args.probe_backends.split(",")):
+            print(f"Benchmarking {backend} prober", file=sys.stderr)
+            results["probe"][backend] = bench_prober(backend, topology, args.duration)
+        with tempfile.TemporaryDirectory(prefix="ecmpbench-") as workdir:
+            for backend in filter(None, args.routing_backends.split(",")):
+                print(f"Benchmarking daemon with {backend} backend", file=sys.stderr)
+                results["daemon"][backend] = bench_daemon(
+                    backend, topology, args, workdir
+                )
+    finally:
+        topology.destroy()
+
+    if args.scale_target:
+        results["scale_target"] = _check_scale_target(results, args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if results.get("scale_target", {}).get("met", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
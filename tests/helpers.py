@@ -0,0 +1,19 @@
+"""
+Helpers shared by the unit tests.
+"""
+
+import os
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pop_due(scheduler, timeout: float = 1) -> list:
+    """ProbeScheduler.pop_due(), giving up with an empty batch after timeout
+    seconds"""
+    timer = threading.Timer(timeout, scheduler.interrupt)
+    timer.start()
+    try:
+        return scheduler.pop_due()
+    finally:
+        timer.cancel()
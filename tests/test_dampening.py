@@ -0,0 +1,201 @@
+"""
+Rise/fall hysteresis and route flap dampening of check results.
+"""
+
+import logging
+import unittest
+from unittest import mock
+
+from config.interfaces import Interface
+from daemon import _apply_check_result
+from dampening import FlapDampener
+
+GATEWAY = "10.0.0.1"
+logger = logging.getLogger(__name__)
+
+
+class RoutingClient:
+    """Routing client recording route changes as ("add"/"del", gateway)"""
+
+    def __init__(self):
+        self.changes = []
+
+    def add_route(self, interface, gateway_ip: str):
+        self.changes.append(("add", gateway_ip))
+
+    def remove_route(self, interface):
+        self.changes.append(("del", interface.gateway))
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CheckResultTest(unittest.TestCase):
+    def setUp(self):
+        self.routing_client = RoutingClient()
+        self.dampener = None
+
+    def make_interface(self, **options) -> Interface:
+        return Interface(
+            "eth0", metric=100, check_interval=1, target_ip="192.0.2.1", **options
+        )
+
+    def check(self, interface, passed: bool):
+        _apply_check_result(
+            interface,
+            self.routing_client,
+            logger,
+            passed,
+            GATEWAY if passed else None,
+            dampener=self.dampener,
+        )
+
+
+class RiseFallTest(CheckResultTest):
+    def setUp(self):
+        super().setUp()
+        self.interface = self.make_interface(detect_multiplier=3, rise=2)
+
+    def bring_up(self):
+        for _ in range(self.interface.rise):
+            self.check(self.interface, True)
+        self.assertTrue(self.interface.healthy)
+        self.routing_client.changes.clear()
+
+    def test_rise(self):
+        self.check(self.interface, True)
+        self.assertFalse(self.interface.healthy)
+        self.assertEqual(self.routing_client.changes, [])
+        self.check(self.interface, True)
+        self.assertTrue(self.interface.healthy)
+        self.assertEqual(self.routing_client.changes, [("add", GATEWAY)])
+
+    def test_failed_check_restarts_rise(self):
+        self.check(self.interface, True)
+        self.check(self.interface, False)
+        self.check(self.interface, True)
+        self.assertFalse(self.interface.healthy)
+        self.assertEqual(self.routing_client.changes, [])
+
+    def test_fall(self):
+        self.bring_up()
+        for _ in range(self.interface.detect_multiplier - 1):
+            self.check(self.interface, False)
+        self.assertTrue(self.interface.healthy)
+        self.assertEqual(self.routing_client.changes, [])
+        self.check(self.interface, False)
+        self.assertFalse(self.interface.healthy)
+        self.assertEqual(self.routing_client.changes, [("del", GATEWAY)])
+
+    def test_passed_check_restarts_fall(self):
+        self.bring_up()
+        self.check(self.interface, False)
+        self.check(self.interface, False)
+        self.check(self.interface, True)
+        self.check(self.interface, False)
+        self.check(self.interface, False)
+        self.assertTrue(self.interface.healthy)
+        self.assertNotIn(("del", GATEWAY), self.routing_client.changes)
+
+
+class FlapDampenerTest(unittest.TestCase):
+    """Penalties of a dampener with a 60s half-life"""
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("dampening.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dampener = FlapDampener(
+            half_life=60,
+            penalty=1000,
+            suppress_limit=2000,
+            reuse_limit=750,
+            max_suppress=120,
+        )
+
+    def test_suppressed_at_suppress_limit(self):
+        self.dampener.record_flap("eth0")
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+        self.dampener.record_flap("eth0")
+        self.assertTrue(self.dampener.is_suppressed("eth0"))
+
+    def test_penalty_decays(self):
+        self.dampener.record_flap("eth0")
+        self.clock.now += 60
+        self.assertAlmostEqual(self.dampener.current_penalty("eth0"), 500)
+        self.dampener.record_flap("eth0")
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+
+    def test_reused_below_reuse_limit(self):
+        self.dampener.record_flap("eth0")
+        self.dampener.record_flap("eth0")
+        # 2000 decays to 750 after 60 * log2(2000 / 750) = 84.9s
+        self.clock.now += 84
+        self.assertTrue(self.dampener.is_suppressed("eth0"))
+        self.clock.now += 1
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+        # Not suppressed again until the suppress limit is reached again
+        self.dampener.record_flap("eth0")
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+
+    def test_penalty_cap(self):
+        for _ in range(10):
+            self.dampener.record_flap("eth0")
+        # The cap decays to the reuse limit in max_suppress seconds
+        self.assertAlmostEqual(self.dampener.current_penalty("eth0"), 750 * 2**2)
+        self.clock.now += 119
+        self.assertTrue(self.dampener.is_suppressed("eth0"))
+        self.clock.now += 2
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+
+    def test_forget(self):
+        self.dampener.record_flap("eth0")
+        self.dampener.record_flap("eth0")
+        self.dampener.forget("eth0")
+        self.assertFalse(self.dampener.is_suppressed("eth0"))
+        self.assertEqual(self.dampener.current_penalty("eth0"), 0)
+
+
+class DampenedCheckResultTest(CheckResultTest):
+    """A flapping interface stays withdrawn until its penalty decays"""
+
+    def setUp(self):
+        super().setUp()
+        self.clock = Clock()
+        patcher = mock.patch("dampening.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dampener = FlapDampener(
+            half_life=60, penalty=1000, suppress_limit=2000, reuse_limit=750
+        )
+        self.interface = self.make_interface()
+
+    def test_flapping_route_is_suppressed(self):
+        for _ in range(2):
+            self.check(self.interface, True)
+            self.check(self.interface, False)
+        self.routing_client.changes.clear()
+
+        self.check(self.interface, True)
+        self.assertTrue(self.interface.healthy)
+        self.assertIsNone(self.interface.gateway)
+        self.assertEqual(self.routing_client.changes, [])
+
+        self.clock.now += 85
+        self.check(self.interface, True)
+        self.assertEqual(self.interface.gateway, GATEWAY)
+        self.assertEqual(self.routing_client.changes, [("add", GATEWAY)])
+
+    def test_failures_while_down_add_no_penalty(self):
+        self.check(self.interface, True)
+        for _ in range(5):
+            self.check(self.interface, False)
+        self.assertEqual(self.dampener.current_penalty("eth0"), 1000)
@@ -0,0 +1,105 @@
+"""
+Automatic interfaces across links vanishing and reappearing.
+"""
+
+import unittest
+from types import SimpleNamespace
+
+from helpers import pop_due
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+
+from config.interfaces import AutoInterfaces
+from discovery import LinkDiscovery
+from reload import ConfigReloader
+from scheduler import ProbeScheduler
+
+
+def link_event(event: str, index: int, name: str) -> ifinfmsg:
+    msg = ifinfmsg()
+    msg["index"] = index
+    msg["event"] = event
+    msg["attrs"] = [("IFLA_IFNAME", name)]
+    return msg
+
+
+class RoutingClient:
+    """Routing client recording the routes withdrawn"""
+
+    def __init__(self):
+        self.removed = []
+
+    def add_route(self, interface, gateway_ip: str):
+        pass
+
+    def remove_route(self, interface):
+        self.removed.append(interface)
+
+    def flush(self):
+        pass
+
+    def forget(self, name: str):
+        pass
+
+
+class Prober:
+    """Probe backend recording the interfaces forgotten"""
+
+    def __init__(self):
+        self.forgotten = []
+
+    def forget(self, name: str):
+        self.forgotten.append(name)
+
+
+class LinkChurnTest(unittest.TestCase):
+    """A PPPoE link reconnects while its interface is being checked"""
+
+    def setUp(self):
+        auto = AutoInterfaces(
+            metric=100, check_interval=0.01, target_ip="192.0.2.1", include=["ppp*"]
+        )
+        self.config = SimpleNamespace(interfaces=[], auto_interfaces=auto)
+        self.interfaces = {}
+        self.scheduler = ProbeScheduler(jitter=0)
+        self.routing_client = RoutingClient()
+        self.discovery = LinkDiscovery()
+        self.prober = Prober()
+        self.reloader = ConfigReloader(
+            self.config,
+            self.interfaces,
+            self.scheduler,
+            self.routing_client,
+            discovery=self.discovery,
+            prober=self.prober,
+        )
+
+    def link_changed(self, event: str, index: int):
+        """Deliver a link event and sync, as the daemon's main loop does"""
+        self.discovery._update(link_event(event, index, "ppp0"))
+        self.assertTrue(self.discovery.take_changed())
+        self.reloader.sync_links()
+
+    def test_recreated_link_is_probed(self):
+        self.link_changed("RTM_NEWLINK", 5)
+        old = self.interfaces["ppp0"]
+        self.assertEqual(pop_due(self.scheduler), [old])  # Check running
+        old.gateway = "10.0.0.1"
+
+        self.link_changed("RTM_DELLINK", 5)
+        self.assertNotIn("ppp0", self.interfaces)
+        self.assertEqual(self.routing_client.removed, [old])
+        # The probe socket of the vanished link is closed
+        self.assertEqual(self.prober.forgotten, ["ppp0"])
+
+        self.link_changed("RTM_NEWLINK", 6)
+        new = self.interfaces["ppp0"]
+        self.assertIsNot(new, old)
+        self.assertEqual(self.config.interfaces, [new])
+
+        # The check of the vanished link finishes
+        self.scheduler.schedule(old)
+        for _ in range(3):
+            due = pop_due(self.scheduler)
+            self.assertEqual(len(due), 1)
+            self.assertIs(due[0], new)
+            self.scheduler.schedule(new)
@@ -0,0 +1,108 @@
+"""
+FRR route changes through the stub vtysh (tests/stub/vtysh).
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from helpers import REPO_DIR
+
+from frr import FRRClient
+
+STUB_DIR = os.path.join(REPO_DIR, "tests", "stub")
+METRIC = 10
+TAG = 236
+
+
+def session(*routes: str) -> str:
+    """vtysh session adding ("+") or removing ("-") our routes via gateways"""
+    commands = ["configure terminal"]
+    for route in routes:
+        command = f"ip route 0.0.0.0/0 {route[1:]} {METRIC} tag {TAG}"
+        commands.append(command if route[0] == "+" else f"no {command}")
+    return "\n".join(commands)
+
+
+class PartialBatchTest(unittest.TestCase):
+    """A vtysh session where some commands apply and others fail"""
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.state_path = os.path.join(workdir.name, "state.json")
+        self.log_path = os.path.join(workdir.name, "log.jsonl")
+        environ = mock.patch.dict(
+            os.environ,
+            PATH=f"{STUB_DIR}{os.pathsep}{os.environ['PATH']}",
+            VTYSH_STUB_STATE=self.state_path,
+            VTYSH_STUB_LOG=self.log_path,
+        )
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        self.client = FRRClient(tag=TAG)
+        self.eth0 = SimpleNamespace(name="eth0", metric=METRIC)
+        self.eth1 = SimpleNamespace(name="eth1", metric=METRIC)
+        self.client.add_route(self.eth0, "192.0.2.1")
+        self.client.add_route(self.eth1, "198.51.100.1")
+        self.client.flush()
+        os.remove(self.log_path)
+
+    def routes(self) -> set:
+        with open(self.state_path) as f:
+            return {(route["gateway"], route["distance"]) for route in json.load(f)}
+
+    def commands(self) -> list:
+        with open(self.log_path) as f:
+            return [json.loads(line)["command"] for line in f]
+
+    def test_applied_commands_are_not_replayed(self):
+        # The route of eth1 disappears behind our back, so removing it fails
+        self.client.forget("eth0")
+        self.client.add_route(self.eth0, "192.0.2.2")
+        self.client.remove_route(self.eth1)
+        with open(self.state_path, "w") as f:
+            json.dump([{"gateway": "192.0.2.1", "distance": METRIC, "tag": TAG}], f)
+
+        with self.assertNoLogs("frr", level="ERROR"):
+            self.client.flush()
+        self.assertEqual(self.routes(), {("192.0.2.1", METRIC), ("192.0.2.2", METRIC)})
+        self.assertEqual(
+            self.commands(),
+            [session("+192.0.2.2", "-198.51.100.1"), "show ip route static json"],
+        )
+
+    def test_unapplied_commands_are_replayed(self):
+        # The session dies before applying anything
+        self.client.add_route(self.eth0, "192.0.2.2")
+        self.client.remove_route(self.eth1)
+        execute = self.client._execute_vty_command
+
+        def fail_once(command):
+            if patched.call_count == 1:
+                raise subprocess.CalledProcessError(1, "vtysh")
+            execute(command)
+
+        with (
+            mock.patch.object(
+                self.client, "_execute_vty_command", side_effect=fail_once
+            ) as patched,
+            self.assertNoLogs("frr", level="ERROR"),
+        ):
+            self.client.flush()
+        self.assertEqual(self.routes(), {("192.0.2.2", METRIC)})
+        self.assertEqual(
+            self.commands(),
+            [
+                "show ip route static json",
+                session("+192.0.2.2"),
+                session("-192.0.2.1"),
+                session("-198.51.100.1"),
+            ],
+        )
+        self.assertEqual(self.client.installed_routes, {"eth0": ("192.0.2.2", METRIC)})
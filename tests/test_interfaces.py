@@ -0,0 +1,94 @@
+"""
+Adaptive check intervals of monitored interfaces.
+"""
+
+import logging
+import unittest
+
+from config.interfaces import Interface
+from daemon import _apply_check_result
+
+GATEWAY = "10.0.0.1"
+logger = logging.getLogger(__name__)
+
+
+class RoutingClient:
+    def add_route(self, interface, gateway_ip: str):
+        pass
+
+    def remove_route(self, interface):
+        pass
+
+
+def make_interface(**options) -> Interface:
+    options = {"suspect_interval": 0.25, "max_down_interval": 8, **options}
+    return Interface(
+        "eth0", metric=100, check_interval=1, target_ip="192.0.2.1", **options
+    )
+
+
+def check(interface, passed: bool):
+    _apply_check_result(
+        interface, RoutingClient(), logger, passed, GATEWAY if passed else None
+    )
+
+
+class NextIntervalTest(unittest.TestCase):
+    def test_unchecked_interface(self):
+        self.assertEqual(make_interface().next_interval(), 1)
+
+    def test_healthy_interface(self):
+        interface = make_interface()
+        check(interface, True)
+        self.assertEqual(interface.next_interval(), 1)
+
+    def test_suspect_interface(self):
+        interface = make_interface(detect_multiplier=3)
+        check(interface, True)
+        for _ in range(2):
+            check(interface, False)
+            self.assertTrue(interface.healthy)
+            self.assertEqual(interface.next_interval(), 0.25)
+        check(interface, True)
+        self.assertEqual(interface.next_interval(), 1)
+
+    def test_suspect_interval_never_exceeds_check_interval(self):
+        interface = make_interface(detect_multiplier=3, suspect_interval=5)
+        check(interface, True)
+        check(interface, False)
+        self.assertEqual(interface.next_interval(), 1)
+
+    def test_down_interface_backs_off(self):
+        for detect_multiplier in (1, 3):
+            with self.subTest(detect_multiplier=detect_multiplier):
+                interface = make_interface(detect_multiplier=detect_multiplier)
+                check(interface, True)
+                intervals = []
+                for _ in range(detect_multiplier + 5):
+                    check(interface, False)
+                    if interface.healthy is False:
+                        intervals.append(interface.next_interval())
+                # The check that took the interface down keeps the interval
+                self.assertEqual(intervals, [1, 2, 4, 8, 8, 8])
+
+    def test_backoff_without_detect_multiplier(self):
+        interface = make_interface(detect_multiplier=0)
+        check(interface, True)
+        check(interface, False)
+        self.assertFalse(interface.healthy)
+        self.assertEqual(interface.next_interval(), 1)
+        check(interface, False)
+        self.assertEqual(interface.next_interval(), 2)
+
+    def test_backoff_disabled(self):
+        interface = make_interface(max_down_interval=0)
+        for _ in range(5):
+            check(interface, False)
+        self.assertEqual(interface.next_interval(), 1)
+
+    def test_passed_check_ends_backoff(self):
+        interface = make_interface()
+        for _ in range(5):
+            check(interface, False)
+        check(interface, True)
+        self.assertEqual(interface.next_interval(), 1)
@@ -0,0 +1,85 @@
+"""
+ECMP weights derived from the RTT and loss of probed paths.
+"""
+
+import unittest
+from types import SimpleNamespace
+
+from path_stats import MAX_WEIGHT, PathStats
+
+GATEWAY = "10.0.0.1"
+
+
+class WeightTest(unittest.TestCase):
+    """Weights of a path with a window of 10 results and a weight scale of 8"""
+
+    def setUp(self):
+        self.stats = PathStats(
+            window=10,
+            rtt_tolerance_ms=10,
+            degraded_loss=0.2,
+            degraded_rtt_ms=200,
+            weight_scale=8,
+            min_samples=5,
+        )
+        self.interface = SimpleNamespace(name="eth0", weight=1)
+
+    def record(self, *rtts_ms):
+        """Record probe results, None for a lost probe"""
+        for rtt_ms in rtts_ms:
+            rtt = None if rtt_ms is None else rtt_ms / 1000
+            self.stats.record("eth0", GATEWAY, rtt)
+
+    def weight(self) -> int:
+        return self.stats.weight(self.interface, GATEWAY)
+
+    def test_full_weight_until_min_samples(self):
+        self.assertEqual(self.weight(), 8)
+        self.record(None, None, None, None)
+        self.assertEqual(self.weight(), 8)
+        self.record(None)
+        self.assertEqual(self.weight(), 1)
+
+    def test_full_weight_is_capped(self):
+        self.interface.weight = 100
+        self.assertEqual(self.weight(), MAX_WEIGHT)
+
+    def test_healthy_path_keeps_full_weight(self):
+        self.record(10, 12, 15, 11, 18, 10)
+        self.assertEqual(self.weight(), 8)
+
+    def test_queueing_delay_lowers_weight(self):
+        # Base RTT 10ms plus 10ms tolerance against a median of 40ms
+        self.record(10, 40, 40, 40, 40, 40)
+        self.assertEqual(self.weight(), 4)
+
+    def test_loss_lowers_weight(self):
+        self.record(10, 10, 10, 10, 10, 10, 10, 10, 10, None)
+        self.assertEqual(self.weight(), 7)
+
+    def test_loss_demotes_path(self):
+        self.record(10, 10, 10, 10, 10, 10, 10, 10, None, None)
+        with self.assertLogs("path_stats", level="WARNING"):
+            self.assertEqual(self.weight(), 1)
+
+    def test_rtt_demotes_path(self):
+        self.record(10, 10, 10, 10, 10, 10, 10, 10, 10, 250)
+        self.assertEqual(self.weight(), 1)
+
+    def test_recovery_needs_half_the_loss(self):
+        self.record(None, None, 10, 10, 10, 10, 10, 10, 10, 10)
+        self.assertEqual(self.weight(), 1)
+        # 10% loss would not demote the path, but does not recover it either
+        self.record(10)
+        self.assertEqual(self.weight(), 1)
+        self.record(10)
+        with self.assertLogs("path_stats", level="INFO"):
+            self.assertEqual(self.weight(), 8)
+
+    def test_forget(self):
+        self.record(None, None, None, None, None)
+        self.assertEqual(self.weight(), 1)
+        self.stats.forget("eth0")
+        self.assertIsNone(self.stats.summary("eth0", GATEWAY))
+        self.record(10, 10, 10, 10, 10)
+        self.assertEqual(self.weight(), 8)
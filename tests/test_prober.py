@@ -0,0 +1,144 @@
+"""
+Native prober SYN frames and reply matching, without touching the network.
+"""
+
+import socket
+import struct
+import threading
+import unittest
+from types import SimpleNamespace
+
+from prober import (
+    _TCP_OFFSET,
+    TCP_RST,
+    TCP_SYN,
+    TCP_SYN_ACK,
+    NativeProber,
+    _checksum_words,
+    _fold,
+    _PendingProbe,
+    _SynTemplate,
+)
+
+SRC_MAC = bytes.fromhex("020000000001")
+DST_MAC = bytes.fromhex("020000000002")
+SRC_IP = socket.inet_aton("192.0.2.10")
+TARGET_IP = socket.inet_aton("198.51.100.1")
+TARGET_PORT = 443
+
+
+class SynTemplateTest(unittest.TestCase):
+    """Incrementally finished checksums match a full recompute"""
+
+    def setUp(self):
+        self.template = _SynTemplate(SRC_MAC, DST_MAC, SRC_IP, TARGET_IP, TARGET_PORT)
+
+    def test_ip_header_checksum(self):
+        ip_header = self.template.frame[14:_TCP_OFFSET]
+        self.assertEqual(_fold(_checksum_words(ip_header)), 0)
+
+    def test_tcp_checksum(self):
+        for sport, seq in (
+            (61000, 0),
+            (65535, 0xFFFFFFFF),
+            (61234, 0x0001FFFF),
+            (62000, 0xDEADBEEF),
+            (64000, 0xFFFF0000),
+        ):
+            with self.subTest(sport=sport, seq=seq):
+                frame = self.template.build(sport, seq)
+                segment = bytes(frame[_TCP_OFFSET:])
+                self.assertEqual(
+                    struct.unpack_from("!HHI", segment), (sport, TARGET_PORT, seq)
+                )
+                self.assertEqual(segment[13], TCP_SYN)
+                pseudo_header = struct.pack(
+                    "!4s4sBBH",
+                    SRC_IP,
+                    TARGET_IP,
+                    0,
+                    socket.IPPROTO_TCP,
+                    len(segment),
+                )
+                # A correct checksum makes the covered words sum to 0xFFFF
+                self.assertEqual(_fold(_checksum_words(pseudo_header + segment)), 0)
+
+
+def reply_frame(sport: int, dport: int, ack: int, flags: int, src_ip=TARGET_IP):
+    """Ethernet/IPv4/TCP reply from src_ip:sport to our dport"""
+    ip_header = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        40,
+        0,
+        0x4000,
+        64,
+        socket.IPPROTO_TCP,
+        0,
+        src_ip,
+        SRC_IP,
+    )
+    tcp_header = struct.pack(
+        "!HHIIBBHHH", sport, dport, 12345, ack, 5 << 4, flags, 64240, 0, 0
+    )
+    return SRC_MAC + DST_MAC + struct.pack("!H", 0x0800) + ip_header + tcp_header
+
+
+class DrainTest(unittest.TestCase):
+    """Replies read from a channel complete only the probe they answer"""
+
+    SEQ = 0x12345678
+
+    def setUp(self):
+        self.prober = NativeProber()
+        self.addCleanup(self.prober.close)
+        receiver, self.sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        self.addCleanup(self.sender.close)
+        receiver.setblocking(False)
+        self.channel = SimpleNamespace(name="eth0", sock=receiver)
+
+        self.notify = threading.Event()
+        self.pending = _PendingProbe(TARGET_IP, TARGET_PORT, self.SEQ, self.notify)
+        self.sport = self.prober._register(self.pending)
+
+    def drain(self, *frames):
+        for frame in frames:
+            self.sender.send(frame)
+        self.prober._drain(self.channel, bytearray(2048))
+
+    def test_syn_ack_completes_probe(self):
+        self.drain(reply_frame(TARGET_PORT, self.sport, self.SEQ + 1, TCP_SYN_ACK))
+        self.assertTrue(self.pending.done.is_set())
+        self.assertTrue(self.notify.is_set())
+        self.assertEqual(self.pending.flags, TCP_SYN_ACK)
+
+    def test_rst_completes_probe(self):
+        self.drain(reply_frame(TARGET_PORT, self.sport, self.SEQ + 1, TCP_RST))
+        self.assertTrue(self.pending.done.is_set())
+        self.assertEqual(self.pending.flags, TCP_RST)
+
+    def test_unrelated_frames_are_ignored(self):
+        self.drain(
+            reply_frame(TARGET_PORT, self.sport, self.SEQ, TCP_SYN_ACK),  # Wrong ack
+            reply_frame(TARGET_PORT + 1, self.sport, self.SEQ + 1, TCP_SYN_ACK),
+            reply_frame(TARGET_PORT, self.sport + 1, self.SEQ + 1, TCP_SYN_ACK),
+            reply_frame(
+                TARGET_PORT,
+                self.sport,
+                self.SEQ + 1,
+                TCP_SYN_ACK,
+                src_ip=socket.inet_aton("198.51.100.2"),
+            ),
+            reply_frame(TARGET_PORT, self.sport, self.SEQ + 1, TCP_SYN_ACK)[:40],
+        )
+        self.assertFalse(self.pending.done.is_set())
+        self.assertFalse(self.notify.is_set())
+
+    def test_reply_after_unrelated_frames(self):
+        self.drain(
+            reply_frame(TARGET_PORT, self.sport, self.SEQ + 2, TCP_SYN_ACK),
+            reply_frame(TARGET_PORT, self.sport, self.SEQ + 1, TCP_SYN_ACK),
+        )
+        self.assertTrue(self.pending.done.is_set())
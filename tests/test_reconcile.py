@@ -0,0 +1,121 @@
+"""
+Route reconciliation against the kernel routing backend.
+
+These tests install routes in a throwaway network namespace, so they must be
+run as root:
+
+    sudo python -m pytest tests
+"""
+
+import os
+import subprocess
+import time
+import unittest
+from types import SimpleNamespace
+
+from pyroute2 import netns
+
+from kernel import KernelRoutingClient
+from reconcile import RouteReconciler
+
+NAMESPACE = f"ecmptest-{os.getpid()}"
+PROTOCOL = 236
+METRIC = 10
+UPLINKS = {"t0": "10.0.0.2", "t1": "10.0.1.2"}  # Interface → gateway
+
+
+def _run(command: str):
+    subprocess.run(command.split(), check=True, capture_output=True)
+
+
+def _default_routes() -> set:
+    """(interface, gateway, metric) of the namespace's default routes"""
+    output = subprocess.run(
+        ["ip", "-n", NAMESPACE, "route", "show", "default"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    routes = set()
+    for line in output.splitlines():
+        words = line.split()
+        routes.add(
+            (
+                words[words.index("dev") + 1],
+                words[words.index("via") + 1],
+                int(words[words.index("metric") + 1]),
+            )
+        )
+    return routes
+
+
+@unittest.skipUnless(os.geteuid() == 0, "needs root to create a network namespace")
+class SameMetricTest(unittest.TestCase):
+    """Uplinks sharing a metric, as every [interface.auto] interface does"""
+
+    def setUp(self):
+        _run(f"ip netns add {NAMESPACE}")
+        self.addCleanup(_run, f"ip netns del {NAMESPACE}")
+        for index, name in enumerate(UPLINKS):
+            _run(f"ip -n {NAMESPACE} link add {name} type veth peer {name}p")
+            _run(f"ip -n {NAMESPACE} addr add 10.0.{index}.1/24 dev {name}")
+            _run(f"ip -n {NAMESPACE} link set {name}p up")
+            _run(f"ip -n {NAMESPACE} link set {name} up")
+        netns.pushns(NAMESPACE)
+        self.addCleanup(netns.popns)
+
+        self.backend = KernelRoutingClient(protocol=PROTOCOL)
+        self.addCleanup(self.backend._reset_session)
+        self.reconciler = RouteReconciler(self.backend, interval=0.01)
+        self.interfaces = {
+            name: SimpleNamespace(name=name, metric=METRIC, effective_weight=1)
+            for name in UPLINKS
+        }
+        for name, gateway_ip in UPLINKS.items():
+            self.reconciler.add_route(self.interfaces[name], gateway_ip)
+        self.reconciler.flush()
+
+    def expected(self) -> set:
+        return {(name, gateway_ip, METRIC) for name, gateway_ip in UPLINKS.items()}
+
+    def drift_check(self):
+        time.sleep(self.reconciler.interval)
+        self.reconciler.flush()
+
+    def test_routes_coexist(self):
+        self.assertEqual(_default_routes(), self.expected())
+        self.assertEqual(
+            self.backend.installed_routes,
+            {name: (gateway_ip, METRIC) for name, gateway_ip in UPLINKS.items()},
+        )
+
+    def test_drift_check_leaves_routes_alone(self):
+        for _ in range(3):
+            self.drift_check()
+            self.assertEqual(self.reconciler._find_drift(), set())
+            self.assertEqual(_default_routes(), self.expected())
+
+    def test_drift_check_reinstalls_only_missing_route(self):
+        _run(f"ip -n {NAMESPACE} route del default via {UPLINKS['t1']} dev t1")
+        self.drift_check()
+        self.assertEqual(_default_routes(), self.expected())
+        self.drift_check()
+        self.assertEqual(_default_routes(), self.expected())
+
+    def test_drift_check_notices_changed_metric(self):
+        gateway_ip = UPLINKS["t1"]
+        _run(f"ip -n {NAMESPACE} route del default via {gateway_ip} dev t1")
+        _run(
+            f"ip -n {NAMESPACE} route add default via {gateway_ip} dev t1 "
+            f"proto {PROTOCOL} metric {METRIC + 1}"
+        )
+        self.drift_check()
+        self.assertIn(("t1", gateway_ip, METRIC), _default_routes())
+
+    def test_gateway_change_keeps_other_route(self):
+        self.reconciler.add_route(self.interfaces["t0"], "10.0.0.3")
+        self.reconciler.flush()
+        self.assertEqual(
+            _default_routes(),
+            {("t0", "10.0.0.3", METRIC), ("t1", UPLINKS["t1"], METRIC)},
+        )
@@ -0,0 +1,56 @@
+"""
+Probe scheduling across interface removal and re-addition.
+"""
+
+import unittest
+
+from helpers import pop_due
+
+from config.interfaces import Interface
+from scheduler import ProbeScheduler
+
+
+def make_interface(name: str = "eth0") -> Interface:
+    return Interface(name, metric=100, check_interval=0.01, target_ip="192.0.2.1")
+
+
+class ReplacedInterfaceTest(unittest.TestCase):
+    """A reload removes an interface while its check runs, then adds a new
+    Interface object with the same name"""
+
+    def setUp(self):
+        self.scheduler = ProbeScheduler(jitter=0)
+        self.old = make_interface()
+        self.scheduler.add(self.old)
+        self.assertEqual(pop_due(self.scheduler), [self.old])  # Check running
+
+        self.scheduler.remove(self.old)
+        self.new = make_interface()
+        self.scheduler.add(self.new)
+
+    def test_finished_check_does_not_take_over(self):
+        self.scheduler.schedule(self.old)
+        for _ in range(3):
+            due = pop_due(self.scheduler)
+            self.assertEqual(len(due), 1)
+            self.assertIs(due[0], self.new)
+            self.scheduler.schedule(self.new)
+
+    def test_finished_check_after_new_one_started(self):
+        self.assertEqual(pop_due(self.scheduler), [self.new])
+        self.scheduler.schedule(self.old)
+        self.scheduler.schedule(self.new)
+        self.assertEqual(pop_due(self.scheduler), [self.new])
+
+    def test_stale_object_cannot_wake_or_remove(self):
+        self.assertEqual(pop_due(self.scheduler), [self.new])
+        self.scheduler.wake(self.old)
+        self.scheduler.remove(self.old)
+        self.scheduler.schedule(self.new)
+        self.assertEqual(pop_due(self.scheduler), [self.new])
+
+    def test_removed_interface_is_not_scheduled(self):
+        self.scheduler.remove(self.new)
+        self.scheduler.schedule(self.old)
+        self.scheduler.schedule(self.new)
+        self.assertEqual(pop_due(self.scheduler, timeout=0.1), [])